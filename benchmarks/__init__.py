@@ -0,0 +1,3 @@
+"""
+Paquete con los benchmarks de rendimiento de la aplicación.
+"""
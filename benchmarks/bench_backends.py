@@ -0,0 +1,131 @@
+"""
+Compara los backends de inferencia: latencia, memoria residente y arranque en frío.
+
+Cada backend se mide en un proceso nuevo para que la memoria y el tiempo de
+arranque incluyan la importación de las bibliotecas.
+
+Uso:
+    python -m benchmarks.bench_backends
+    python -m benchmarks.bench_backends --model models/conv_MLP_84.h5 --batch-size 8
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.common import current_rss_mb
+
+
+def measure(backend: str, path: str, batch_size: int, repeat: int) -> dict:
+    """
+    Mide un backend dentro del proceso actual, que debe ser nuevo.
+    
+    Args:
+        backend (str): 'keras', 'keras-predict' o 'tflite'.
+        path (str): Archivo del modelo.
+        batch_size (int): Imágenes por llamada.
+        repeat (int): Llamadas medidas tras la primera.
+    
+    Returns:
+        dict: Arranque en frío, latencia por lote y memoria residente.
+    """
+    start = time.perf_counter()
+    from src.integrator import PneumoniaDetector
+    
+    detector = PneumoniaDetector(path, backend="tflite" if backend == "tflite" else "keras")
+    batch = np.random.default_rng(0).random((batch_size, 512, 512, 1), dtype=np.float32)
+    if backend == "keras-predict":
+        def infer():
+            return detector.model.predict(batch, verbose=0)
+    else:
+        # Con Keras incluye los gradientes de Grad-CAM
+        def infer():
+            return detector._infer(batch)
+    infer()
+    cold_start = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for _ in range(repeat):
+        infer()
+    latency = (time.perf_counter() - start) * 1000 / repeat
+    return {
+        "backend": backend,
+        "cold_start_s": cold_start,
+        "latency_ms": latency,
+        "rss_mb": current_rss_mb(),
+        "tensorflow_imported": "tensorflow" in sys.modules,
+    }
+
+
+def export_artifacts(model_path, directory: Path) -> dict:
+    """
+    Guarda el modelo y sus versiones TFLite en un directorio.
+    
+    Args:
+        model_path: Modelo ``.h5``; None para usar el modelo sustituto.
+        directory (Path): Directorio de destino.
+    
+    Returns:
+        dict: Nombre del backend -> (backend del detector, ruta).
+    """
+    from src.load_model import ModelLoader
+    from src.tflite_backend import export_tflite
+    
+    if model_path is None:
+        from benchmarks.common import build_stand_in_model
+        model_path = directory / "stand_in.h5"
+        build_stand_in_model().save(str(model_path))
+    model = ModelLoader().load_model(Path(model_path).resolve())
+    
+    calibration = np.random.default_rng(1).random((16, 512, 512, 1), dtype=np.float32)
+    artifacts = {"keras": ("keras", model_path), "keras-predict": ("keras-predict", model_path)}
+    for quantization in (None, "float16", "int8"):
+        name = f"tflite-{quantization or 'float32'}"
+        path = export_tflite(model, directory / f"{name}.tflite", quantization,
+                             calibration if quantization == "int8" else None)
+        artifacts[name] = ("tflite", path)
+    return artifacts
+
+
+def main():
+    """Función principal del benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", type=Path, help="Modelo .h5; por defecto el sustituto.")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", type=Path, help="Guardar los resultados en JSON.")
+    parser.add_argument("--child", nargs=2, metavar=("BACKEND", "PATH"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        print(json.dumps(measure(args.child[0], args.child[1], args.batch_size, args.repeat)))
+        return
+    
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        artifacts = export_artifacts(args.model, Path(tmp))
+        for name, (backend, path) in artifacts.items():
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_backends", "--child", backend,
+                 str(path), "--batch-size", str(args.batch_size), "--repeat", str(args.repeat)],
+                check=True, capture_output=True, text=True).stdout
+            row = json.loads(output.strip().splitlines()[-1])
+            row["backend"] = name
+            rows.append(row)
+            print(f"{name:<16} arranque {row['cold_start_s']:6.2f} s  "
+                  f"lote {row['latency_ms']:8.2f} ms  RSS {row['rss_mb']:7.1f} MB  "
+                  f"TensorFlow {'sí' if row['tensorflow_imported'] else 'no'}")
+    
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Memoria pico y tiempo por lectura DICOM en los distintos modos del lector.
+
+Uso:
+    python -m benchmarks.bench_dicom_memory --size 3000
+"""
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pydicom
+
+from benchmarks.common import write_synthetic_dicom
+from src.read_img import DicomReader
+
+
+def read_legacy(path: str) -> np.ndarray:
+    """
+    Reproduce la lectura anterior: float64, tres pasadas de mínimo y máximo y RGB.
+    
+    Args:
+        path (str): Ruta del archivo DICOM.
+        
+    Returns:
+        numpy.ndarray: Imagen RGB uint8.
+    """
+    img_array = pydicom.dcmread(path).pixel_array.astype(float)
+    if img_array.max() != img_array.min():
+        img_array = ((img_array - img_array.min()) * 255.0 /
+                     (img_array.max() - img_array.min()))
+    img_array = img_array.astype(np.uint8)
+    return np.repeat(img_array[:, :, None], 3, axis=2)
+
+
+def measure(function, path: str) -> tuple:
+    """
+    Mide la memoria pico asignada y el tiempo de una lectura.
+    
+    Args:
+        function: Función de lectura que recibe la ruta.
+        path (str): Ruta del archivo DICOM.
+        
+    Returns:
+        tuple: (memoria pico en MB, milisegundos)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(path)
+    elapsed = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20, elapsed
+
+
+def main():
+    """Función principal del benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=3000)
+    parser.add_argument("--bits", type=int, default=16, choices=(8, 16))
+    args = parser.parse_args()
+    
+    modes = {
+        "anterior (float64 + RGB)": read_legacy,
+        "read (LUT + RGB + PIL)": lambda p: DicomReader().read(p),
+        "read_grayscale": lambda p: DicomReader().read_grayscale(p),
+        "read_grayscale + ventana": lambda p: DicomReader(apply_window=True).read_grayscale(p),
+        "read_grayscale max_size=1024": lambda p: DicomReader(max_size=1024).read_grayscale(p),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "estudio.dcm")
+        write_synthetic_dicom(path, shape=(args.size, args.size), bits=args.bits)
+        print(f"{args.size}x{args.size}, {args.bits} bits")
+        for name, function in modes.items():
+            peak, elapsed = measure(function, path)
+            print(f"{name:<30} pico {peak:8.1f} MB  {elapsed:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Suite de benchmarks de la cadena lectura → preprocesamiento → predicción → Grad-CAM.
+
+Usa DICOM sintéticos de varios tamaños y profundidades de bits y el modelo
+sustituto de ``benchmarks.common``, por lo que no necesita ``conv_MLP_84.h5``.
+Los resultados se guardan en JSON para compararlos entre commits.
+
+Uso:
+    python -m benchmarks.bench_pipeline --output base.json
+    python -m benchmarks.bench_pipeline --output nuevo.json --compare base.json
+    python -m benchmarks.bench_pipeline --quick --filter read.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+import cv2
+import numpy as np
+
+from benchmarks.common import build_stand_in_model, write_synthetic_dicom
+
+# Parámetros por defecto y los de --quick
+SIZES = (512, 1024, 2048, 3000)
+BITS = (8, 16)
+BATCH_SIZES = (1, 8)
+QUICK_SIZES = (512, 1024)
+QUICK_BATCH_SIZES = (1,)
+
+
+def time_samples(function: Callable[[], object], repeat: int, warmup: int = 1) -> List[float]:
+    """
+    Mide varias ejecuciones de una función sin argumentos.
+    
+    Args:
+        function: Función a medir.
+        repeat (int): Ejecuciones medidas.
+        warmup (int): Ejecuciones previas que no se miden.
+    
+    Returns:
+        list: Milisegundos de cada ejecución medida.
+    """
+    for _ in range(warmup):
+        function()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(name: str, samples: List[float], **params) -> dict:
+    """
+    Resume las muestras de un caso.
+    
+    Args:
+        name (str): Nombre del caso, por ejemplo ``read.dicom.1024.16bit``.
+        samples (list): Milisegundos por ejecución.
+        **params: Parámetros del caso que se guardan con el resultado.
+    
+    Returns:
+        dict: Estadísticas en milisegundos.
+    """
+    ordered = sorted(samples)
+    return {
+        "name": name,
+        "params": params,
+        "rounds": len(samples),
+        "mean_ms": statistics.fmean(samples),
+        "median_ms": statistics.median(samples),
+        "min_ms": ordered[0],
+        "p95_ms": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+        "stdev_ms": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def environment() -> dict:
+    """
+    Describe el entorno de la ejecución para poder comparar resultados.
+    
+    Returns:
+        dict: Commit, versiones y fecha.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], check=True,
+                                capture_output=True, text=True,
+                                cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import tensorflow as tf
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "tensorflow": tf.__version__,
+    }
+
+
+def run_suite(directory: Path, sizes: Iterable[int] = SIZES, bits: Iterable[int] = BITS,
+              batch_sizes: Iterable[int] = BATCH_SIZES, repeat: int = 10,
+              name_filter: Optional[str] = None, model=None) -> List[dict]:
+    """
+    Ejecuta todos los casos de la suite.
+    
+    Args:
+        directory (Path): Directorio para los archivos sintéticos.
+        sizes (iterable): Lados de las imágenes.
+        bits (iterable): Bits por píxel de los DICOM (8 o 16).
+        batch_sizes (iterable): Tamaños de lote de la predicción.
+        repeat (int): Ejecuciones medidas por caso.
+        name_filter (str, optional): Ejecutar solo los casos cuyo nombre lo contenga.
+        model (tf.keras.Model, optional): Modelo con ``conv10_thisone``; por
+            defecto el sustituto.
+    
+    Returns:
+        list: Un resumen por caso (ver ``summarize``).
+    """
+    from src.grad_cam import GradCAM
+    from src.preprocess_img import XRayPreprocessor
+    from src.read_img import DicomReader, JpgReader
+    
+    def wanted(name: str) -> bool:
+        return name_filter is None or name_filter in name
+    
+    results = []
+    dicom_reader, jpg_reader = DicomReader(), JpgReader()
+    preprocessor = XRayPreprocessor()
+    model = model if model is not None else build_stand_in_model()
+    grad_cam = GradCAM(model)
+    
+    for size in sizes:
+        image = None
+        for depth in bits:
+            path = directory / f"{size}_{depth}.dcm"
+            write_synthetic_dicom(path, shape=(size, size), bits=depth)
+            name = f"read.dicom.{size}.{depth}bit"
+            if wanted(name):
+                samples = time_samples(lambda: dicom_reader.read(str(path)), repeat)
+                results.append(summarize(name, samples, size=size, bits=depth))
+            if image is None:
+                image = dicom_reader.read(str(path))[0]
+        
+        jpg_path = directory / f"{size}.jpg"
+        cv2.imwrite(str(jpg_path), image[:, :, ::-1])
+        name = f"read.jpg.{size}"
+        if wanted(name):
+            samples = time_samples(lambda: jpg_reader.read(str(jpg_path)), repeat)
+            results.append(summarize(name, samples, size=size))
+        
+        name = f"preprocess.{size}"
+        if wanted(name):
+            samples = time_samples(lambda: preprocessor.preprocess(image), repeat)
+            results.append(summarize(name, samples, size=size))
+        
+        name = f"grad_cam.generate_heatmap.{size}"
+        if wanted(name):
+            batch = preprocessor.preprocess(image)
+            samples = time_samples(lambda: grad_cam.generate_heatmap(batch, image), repeat)
+            results.append(summarize(name, samples, size=size))
+    
+    rng = np.random.default_rng(0)
+    for batch_size in batch_sizes:
+        batch = rng.random((batch_size, 512, 512, 1), dtype=np.float32)
+        name = f"predict.batch{batch_size}"
+        if wanted(name):
+            samples = time_samples(lambda: model.predict(batch, verbose=0), repeat)
+            results.append(summarize(name, samples, batch_size=batch_size))
+        name = f"grad_cam.explain.batch{batch_size}"
+        if wanted(name):
+            samples = time_samples(lambda: grad_cam.explain(batch), repeat)
+            results.append(summarize(name, samples, batch_size=batch_size))
+    return results
+
+
+def compare(current: List[dict], baseline: List[dict], threshold: float = 0.10) -> List[dict]:
+    """
+    Compara las medianas con las de una ejecución anterior.
+    
+    Args:
+        current (list): Resultados de esta ejecución.
+        baseline (list): Resultados de referencia.
+        threshold (float): Aumento relativo a partir del cual un caso es regresión.
+    
+    Returns:
+        list: Por cada caso común, nombre, medianas, cociente y si es regresión.
+    """
+    previous = {result["name"]: result for result in baseline}
+    rows = []
+    for result in current:
+        if result["name"] not in previous:
+            continue
+        before = previous[result["name"]]["median_ms"]
+        ratio = result["median_ms"] / before if before > 0 else float("inf")
+        rows.append({"name": result["name"], "baseline_ms": before,
+                     "current_ms": result["median_ms"], "ratio": ratio,
+                     "regression": ratio > 1 + threshold})
+    return rows
+
+
+def main(argv=None) -> int:
+    """
+    Función principal del benchmark.
+    
+    Returns:
+        int: 1 si ``--compare`` encontró regresiones, 0 en otro caso.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", "-o", type=Path, help="Guardar los resultados en JSON.")
+    parser.add_argument("--compare", type=Path, help="JSON de una ejecución anterior.")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Aumento relativo de la mediana considerado regresión.")
+    parser.add_argument("--repeat", type=int, default=10, help="Ejecuciones por caso.")
+    parser.add_argument("--sizes", type=int, nargs="+", help="Lados de las imágenes.")
+    parser.add_argument("--bits", type=int, nargs="+", choices=(8, 16), default=list(BITS))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", help="Lotes de predicción.")
+    parser.add_argument("--filter", help="Solo los casos cuyo nombre contenga este texto.")
+    parser.add_argument("--quick", action="store_true",
+                        help="Tamaños y lotes reducidos, para comprobaciones rápidas.")
+    args = parser.parse_args(argv)
+    
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES)
+    batch_sizes = args.batch_sizes or (QUICK_BATCH_SIZES if args.quick else BATCH_SIZES)
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run_suite(Path(tmp), sizes, args.bits, batch_sizes, args.repeat, args.filter)
+    
+    for result in results:
+        print(f"{result['name']:<36} mediana {result['median_ms']:9.2f} ms  "
+              f"p95 {result['p95_ms']:9.2f} ms")
+    
+    if args.output:
+        args.output.write_text(json.dumps({"environment": environment(), "results": results},
+                                          indent=2))
+    
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())["results"]
+        rows = compare(results, baseline, args.threshold)
+        print()
+        for row in rows:
+            flag = "  REGRESIÓN" if row["regression"] else ""
+            print(f"{row['name']:<36} {row['baseline_ms']:9.2f} → {row['current_ms']:9.2f} ms  "
+                  f"x{row['ratio']:.2f}{flag}")
+        return int(any(row["regression"] for row in rows))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
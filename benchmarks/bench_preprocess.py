@@ -0,0 +1,65 @@
+"""
+Micro-benchmark de lectura y preprocesamiento: RGB frente a un solo canal.
+
+Uso:
+    python -m benchmarks.bench_preprocess --repeat 20
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from benchmarks.common import write_synthetic_dicom
+from src.preprocess_img import XRayPreprocessor
+from src.read_img import ImageReaderFactory
+
+
+def time_call(function, repeat: int) -> float:
+    """
+    Mide el tiempo medio de una función sin argumentos.
+    
+    Args:
+        function: Función a medir.
+        repeat (int): Número de repeticiones.
+        
+    Returns:
+        float: Milisegundos por llamada.
+    """
+    function()  # calentamiento
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    """Función principal del benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    
+    preprocessor = XRayPreprocessor()
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (1024, 2048, 3000):
+            dcm = Path(tmp) / f"{size}.dcm"
+            write_synthetic_dicom(dcm, shape=(size, size))
+            png = Path(tmp) / f"{size}.png"
+            gray = ImageReaderFactory.get_reader("dcm").read_grayscale(str(dcm))
+            cv2.imwrite(str(png), cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR))
+            
+            for path in (dcm, png):
+                reader = ImageReaderFactory.get_reader(path.suffix[1:])
+                rgb = time_call(lambda: preprocessor.preprocess(reader.read(str(path))[0]),
+                                args.repeat)
+                single = time_call(lambda: preprocessor.preprocess(reader.read_grayscale(str(path))),
+                                   args.repeat)
+                print(f"{size}x{size} {path.suffix[1:]:>3}: RGB {rgb:7.2f} ms  "
+                      f"un canal {single:7.2f} ms  aceleración x{rgb / single:.2f}")
+
+
+if __name__ == "__main__":
+    main()
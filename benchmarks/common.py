@@ -0,0 +1,101 @@
+"""
+Utilidades compartidas por los benchmarks y las pruebas.
+"""
+
+import os
+import resource
+import sys
+
+import numpy as np
+
+
+def build_stand_in_model(input_size: int = 512, filters: int = 8):
+    """
+    Construye un modelo Keras pequeño con la capa ``conv10_thisone``.
+    
+    Permite medir Grad-CAM y el detector sin el modelo ``conv_MLP_84.h5``.
+    
+    Args:
+        input_size (int): Tamaño de la imagen de entrada.
+        filters (int): Número de filtros de la capa convolucional.
+        
+    Returns:
+        tf.keras.Model: Modelo con salida softmax de 3 clases.
+    """
+    # Importar grad_cam primero para trabajar en el mismo modo de ejecución
+    import src.grad_cam  # noqa: F401
+    import tensorflow as tf
+    
+    tf.keras.utils.set_random_seed(0)
+    inputs = tf.keras.Input(shape=(input_size, input_size, 1))
+    x = tf.keras.layers.AveragePooling2D(pool_size=16)(inputs)
+    x = tf.keras.layers.Conv2D(filters, 3, padding="same", activation="relu",
+                               name="conv10_thisone")(x)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    outputs = tf.keras.layers.Dense(3, activation="softmax")(x)
+    return tf.keras.Model(inputs, outputs)
+
+
+def current_rss_mb() -> float:
+    """
+    Retorna la memoria residente actual del proceso en MB.
+    
+    Usa ``/proc/self/statm`` cuando existe; en otros sistemas retorna el
+    pico reportado por ``resource``.
+    
+    Returns:
+        float: Memoria residente en MB.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS reporta bytes, Linux kilobytes
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def write_synthetic_dicom(path, shape: tuple = (1024, 1024), bits: int = 16,
+                          seed: int = 0) -> None:
+    """
+    Escribe un archivo DICOM de un canal con una imagen suave aleatoria.
+    
+    Args:
+        path: Ruta del archivo a crear.
+        shape (tuple): Tamaño de la imagen (alto, ancho).
+        bits (int): Bits por píxel (8 o 16).
+        seed (int): Semilla del generador aleatorio.
+    """
+    import pydicom
+    from pydicom.dataset import FileDataset, FileMetaDataset
+    from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+    
+    rng = np.random.default_rng(seed)
+    dtype = np.uint8 if bits == 8 else np.uint16
+    # Gradiente más ruido para que la imagen no sea constante
+    rows = np.linspace(0, 1, shape[0])[:, None]
+    cols = np.linspace(0, 1, shape[1])[None, :]
+    pixels = (rows * cols + 0.1 * rng.random(shape)) / 1.1
+    pixels = (pixels * (2 ** bits - 1)).astype(dtype)
+    
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = pydicom.uid.SecondaryCaptureImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    
+    ds = FileDataset(str(path), {}, file_meta=meta, preamble=b"\0" * 128)
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Modality = "CR"
+    ds.Rows, ds.Columns = shape
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = bits
+    ds.BitsStored = bits
+    ds.HighBit = bits - 1
+    ds.PixelRepresentation = 0
+    ds.PixelData = pixels.tobytes()
+    ds.is_little_endian = True
+    ds.is_implicit_VR = False
+    ds.save_as(str(path), write_like_original=False)
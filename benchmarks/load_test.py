@@ -0,0 +1,150 @@
+"""
+Prueba de carga del servidor de inferencia: latencia p50/p99 frente a rendimiento.
+
+Uso:
+    python -m benchmarks.load_test --url http://127.0.0.1:8765 --image estudio.dcm
+    python -m benchmarks.load_test --stand-in --concurrency 1 4 16
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+def synthetic_png(size: int = 1024, seed: int = 0) -> bytes:
+    """
+    Genera una radiografía sintética codificada como PNG.
+    
+    Args:
+        size (int): Lado de la imagen.
+        seed (int): Semilla del generador aleatorio.
+    
+    Returns:
+        bytes: Contenido del archivo PNG.
+    """
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 256, (size, size), dtype=np.uint8)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+def post(url: str, data: bytes) -> float:
+    """
+    Envía un estudio y retorna la latencia de la respuesta.
+    
+    Args:
+        url (str): URL completa de ``/predict``.
+        data (bytes): Contenido del estudio.
+    
+    Returns:
+        float: Milisegundos hasta recibir la respuesta completa.
+    """
+    start = time.perf_counter()
+    request = urllib.request.Request(url, data=data, method="POST")
+    with urllib.request.urlopen(request) as response:
+        json.loads(response.read())
+    return (time.perf_counter() - start) * 1000
+
+
+def run_level(url: str, payloads: list, concurrency: int, requests: int) -> dict:
+    """
+    Ejecuta una ronda de solicitudes con una concurrencia fija.
+    
+    Args:
+        url (str): URL completa de ``/predict``.
+        payloads (list): Estudios que se envían de forma rotativa.
+        concurrency (int): Solicitudes simultáneas.
+        requests (int): Total de solicitudes.
+    
+    Returns:
+        dict: Rendimiento y percentiles de latencia.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(lambda i: post(url, payloads[i % len(payloads)]),
+                                  range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "throughput_rps": requests / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def start_stand_in_server(max_batch_size: int, max_wait_ms: float):
+    """
+    Inicia en este proceso un servidor con el modelo sustituto.
+    
+    Returns:
+        InferenceServer: Servidor ya atendiendo en un puerto libre.
+    """
+    from benchmarks.common import build_stand_in_model
+    from src.integrator import PneumoniaDetector
+    from src.server import InferenceServer
+    
+    detector = PneumoniaDetector(model=build_stand_in_model())
+    detector.warm_up()
+    server = InferenceServer(detector, port=0, max_batch_size=max_batch_size,
+                             max_wait_ms=max_wait_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    """Función principal de la prueba de carga."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8765",
+                        help="URL base del servidor.")
+    parser.add_argument("--image", type=Path, action="append",
+                        help="Estudio a enviar; por defecto PNG sintéticos.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--heatmap", action="store_true", help="Pedir el heatmap.")
+    parser.add_argument("--stand-in", action="store_true",
+                        help="Iniciar un servidor local con el modelo sustituto.")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--json", type=Path, help="Guardar los resultados en JSON.")
+    args = parser.parse_args()
+    
+    server = None
+    base_url = args.url
+    if args.stand_in:
+        server = start_stand_in_server(args.max_batch_size, args.max_wait_ms)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    url = f"{base_url}/predict" + ("?heatmap=1" if args.heatmap else "")
+    
+    # Imágenes distintas para que la caché del servidor no responda por el modelo
+    if args.image:
+        payloads = [path.read_bytes() for path in args.image]
+    else:
+        payloads = [synthetic_png(seed=seed) for seed in range(args.requests)]
+    
+    rows = []
+    try:
+        post(url, payloads[0])  # calentamiento
+        for concurrency in args.concurrency:
+            row = run_level(url, payloads, concurrency, args.requests)
+            rows.append(row)
+            print(f"concurrencia {concurrency:>3}: {row['throughput_rps']:7.1f} sol/s  "
+                  f"p50 {row['p50_ms']:7.1f} ms  p99 {row['p99_ms']:7.1f} ms")
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            print(f"Tamaño medio de lote: {server.batcher.items / max(server.batcher.batches, 1):.2f}")
+    
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Prueba de resistencia de Grad-CAM: latencia y memoria a lo largo de muchas llamadas.
+
+Uso:
+    python -m benchmarks.soak_grad_cam --calls 10000 --window 500
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import build_stand_in_model, current_rss_mb
+from src.grad_cam import GradCAM
+
+
+def run_soak(calls: int, window: int) -> list:
+    """
+    Ejecuta Grad-CAM repetidamente y mide cada ventana de llamadas.
+    
+    Args:
+        calls (int): Número total de llamadas.
+        window (int): Número de llamadas por ventana de medición.
+        
+    Returns:
+        list: Diccionarios con latencia media y RSS por ventana.
+    """
+    model = build_stand_in_model()
+    batch = np.random.rand(1, 512, 512, 1).astype(np.float32)
+    original = np.random.randint(0, 256, (512, 512, 3), dtype=np.uint8)
+    
+    windows = []
+    start = time.perf_counter()
+    for call in range(1, calls + 1):
+        # Un detector nuevo por llamada no debe reconstruir el grafo
+        GradCAM(model).generate_heatmap(batch, original)
+        if call % window == 0:
+            elapsed = time.perf_counter() - start
+            windows.append({
+                "calls": call,
+                "latency_ms": elapsed * 1000 / window,
+                "rss_mb": current_rss_mb(),
+            })
+            start = time.perf_counter()
+    return windows
+
+
+def main():
+    """Función principal del benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=10000)
+    parser.add_argument("--window", type=int, default=500)
+    args = parser.parse_args()
+    
+    windows = run_soak(args.calls, args.window)
+    for row in windows:
+        print(f"{row['calls']:>7} llamadas  {row['latency_ms']:8.2f} ms/llamada  "
+              f"{row['rss_mb']:8.1f} MB")
+    
+    first, last = windows[0], windows[-1]
+    print(f"Variación de latencia: {last['latency_ms'] - first['latency_ms']:+.2f} ms")
+    print(f"Variación de RSS: {last['rss_mb'] - first['rss_mb']:+.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
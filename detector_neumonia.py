@@ -17,6 +17,7 @@ import tensorflow as tf
 tf.compat.v1.disable_eager_execution()
 tf.compat.v1.experimental.output_all_intermediates(True)
 import cv2
+from src.heatmap import compute_cam
 
 
 
@@ -32,12 +33,9 @@ def grad_cam(array):
     pooled_grads = K.mean(grads, axis=(0, 1, 2))
     iterate = K.function([model.input], [pooled_grads, last_conv_layer.output[0]])
     pooled_grads_value, conv_layer_output_value = iterate(img)
-    for filters in range(64):
-        conv_layer_output_value[:, :, filters] *= pooled_grads_value[filters]
-    # creating the heatmap
-    heatmap = np.mean(conv_layer_output_value, axis=-1)
-    heatmap = np.maximum(heatmap, 0)  # ReLU
-    heatmap /= np.max(heatmap)  # normalize
+    # weighting all channels at once (any number of filters) and normalizing
+    # without NaN when the heatmap has no positive values
+    heatmap = compute_cam(conv_layer_output_value, pooled_grads_value)
     heatmap = cv2.resize(heatmap, (img.shape[1], img.shape[2]))
     heatmap = np.uint8(255 * heatmap)
     heatmap = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
@@ -1,12 +1,41 @@
 """
 Paquete principal para la aplicación de detección de neumonía.
+
+Las clases se importan al primer uso para que importar el paquete no cargue
+TensorFlow (ver ``__getattr__``).
 """
 
-from .read_img import ImageReaderFactory
-from .preprocess_img import XRayPreprocessor
-from .load_model import ModelLoader
-from .grad_cam import GradCAM
-from .integrator import PneumoniaDetector
+import importlib
 
 __version__ = '1.0.0'
-__author__ = 'David Plaza'
\ No newline at end of file
+__author__ = 'David Plaza'
+
+# Nombre exportado -> submódulo que lo define
+_EXPORTS = {
+    'ImageReaderFactory': '.read_img',
+    'XRayPreprocessor': '.preprocess_img',
+    'ModelLoader': '.load_model',
+    'GradCAM': '.grad_cam',
+    'PneumoniaDetector': '.integrator',
+    'DetectionResult': '.integrator',
+    'ResultCache': '.cache',
+    'ResultStore': '.results_store',
+    'PreparedDataset': '.dataset',
+    'AsyncPneumoniaDetector': '.async_detector',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    """Importa el submódulo de un nombre exportado la primera vez que se usa."""
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """Incluye los nombres exportados aunque todavía no se hayan importado."""
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,176 @@
+"""
+Interfaz asíncrona (asyncio) del detector de neumonía.
+
+Permite que un solo bucle de eventos mantenga cientos de estudios en curso:
+la lectura y el preprocesamiento se ejecutan en un conjunto fijo de hilos y
+las esperas concurrentes se agrupan en lotes para el modelo con MicroBatcher.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+import numpy as np
+
+from .batching import MicroBatcher
+
+
+class AsyncPneumoniaDetector:
+    """Envoltorio asíncrono de PneumoniaDetector con lotes y concurrencia acotada."""
+    
+    def __init__(self, detector, max_batch_size: int = 8, max_wait_ms: float = 5.0,
+                 max_concurrency: int = 256, decode_workers: int = 4,
+                 timeout: Optional[float] = None, heatmap: bool = True):
+        """
+        Inicializa el detector asíncrono.
+        
+        Args:
+            detector (PneumoniaDetector): Detector que ejecuta el modelo.
+            max_batch_size (int): Estudios máximos por llamada al modelo.
+            max_wait_ms (float): Espera máxima para completar un lote.
+            max_concurrency (int): Estudios en curso como máximo; el resto
+                espera su turno sin ocupar hilos ni memoria de preprocesamiento.
+            decode_workers (int): Hilos para leer y preprocesar las imágenes.
+            timeout (float, optional): Segundos máximos por estudio, incluida la
+                espera en cola. None para no limitar.
+            heatmap (bool): Calcular los heatmaps. Con False los resultados
+                traen un heatmap diferido (ver ``DetectionResult.get_heatmap``).
+        
+        Raises:
+            ValueError: Si max_concurrency o decode_workers no son positivos
+        """
+        if max_concurrency < 1 or decode_workers < 1:
+            raise ValueError("max_concurrency y decode_workers deben ser positivos")
+        
+        self.detector = detector
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.heatmap = heatmap
+        self._executor = ThreadPoolExecutor(max_workers=decode_workers,
+                                            thread_name_prefix="async-detector")
+        self._batcher = MicroBatcher(self._process_batch, max_batch_size=max_batch_size,
+                                     max_wait_ms=max_wait_ms)
+        # El semáforo pertenece al bucle de eventos que lo usa
+        self._semaphore = None
+        self._semaphore_loop = None
+    
+    @property
+    def batcher(self) -> MicroBatcher:
+        """Agrupador de las llamadas al modelo, para diagnóstico."""
+        return self._batcher
+    
+    def _process_batch(self, items: list) -> list:
+        """
+        Ejecuta el modelo sobre un lote de estudios ya preprocesados.
+        
+        Args:
+            items (list): Tuplas (tensor, imagen original, identificador).
+        
+        Returns:
+            list: Un DetectionResult por estudio
+        """
+        tensors, originals, sources = zip(*items)
+        return self.detector.process_preprocessed(np.stack(tensors), list(originals),
+                                                  list(sources), self.heatmap)
+    
+    def _prepare(self, image_input: Union[str, np.ndarray]) -> tuple:
+        """Lee y preprocesa una imagen. Se ejecuta en el conjunto de hilos."""
+        image_array = self.detector._read_image(image_input)
+        return self.detector.preprocessor.preprocess(image_array)[0], image_array
+    
+    async def _predict(self, image_input: Union[str, np.ndarray], source):
+        """Lee, preprocesa y espera el resultado del lote de un estudio."""
+        from .integrator import DetectionResult
+        
+        loop = asyncio.get_running_loop()
+        try:
+            tensor, image_array = await loop.run_in_executor(
+                self._executor, self._prepare, image_input)
+        except Exception as e:
+            return DetectionResult(source=source, error=str(e))
+        return await asyncio.wrap_future(
+            self._batcher.submit((tensor, image_array, source)))
+    
+    async def predict(self, image_input: Union[str, Path, np.ndarray], source=None,
+                      timeout: Optional[float] = None):
+        """
+        Procesa un estudio.
+        
+        Los errores de lectura o del modelo se reportan en el resultado, como
+        en ``PneumoniaDetector.process_batch``.
+        
+        Args:
+            image_input: Ruta a la imagen o array numpy con la imagen.
+            source: Identificador del resultado. Por defecto la ruta, o 0 para arrays.
+            timeout (float, optional): Segundos máximos para este estudio,
+                incluida la espera de turno. Por defecto el timeout del detector.
+        
+        Returns:
+            DetectionResult: Resultado del estudio
+        
+        Raises:
+            asyncio.TimeoutError: Si el estudio no termina a tiempo
+        """
+        if isinstance(image_input, Path):
+            image_input = str(image_input)
+        if source is None:
+            source = image_input if isinstance(image_input, str) else 0
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        timeout = self.timeout if timeout is None else timeout
+        
+        async def run():
+            async with self._semaphore:
+                return await self._predict(image_input, source)
+        
+        # El timeout incluye la espera del semáforo. Al cancelar se cancela
+        # también la solicitud al agrupador, que la descarta si todavía no
+        # entró a un lote
+        return await asyncio.wait_for(run(), timeout)
+    
+    async def predict_many(self, inputs: Iterable[Union[str, Path, np.ndarray]],
+                           timeout: Optional[float] = None) -> List:
+        """
+        Procesa varios estudios de forma concurrente.
+        
+        Args:
+            inputs: Rutas o arrays con las imágenes.
+            timeout (float, optional): Segundos máximos por estudio.
+        
+        Returns:
+            list: Un DetectionResult por entrada, en el mismo orden. Los estudios
+            que superan el timeout se reportan con error.
+        """
+        from .integrator import DetectionResult
+        
+        inputs = list(inputs)
+        sources = [str(image_input) if isinstance(image_input, (str, Path)) else i
+                   for i, image_input in enumerate(inputs)]
+        outcomes = await asyncio.gather(
+            *(self.predict(image_input, source, timeout)
+              for image_input, source in zip(inputs, sources)),
+            return_exceptions=True)
+        results = []
+        for source, outcome in zip(sources, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                outcome = DetectionResult(source=source,
+                                          error=f"Tiempo de espera agotado: {source}")
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            results.append(outcome)
+        return results
+    
+    def close(self) -> None:
+        """Termina los lotes pendientes y libera los hilos."""
+        self._batcher.close()
+        self._executor.shutdown(wait=True)
+    
+    async def __aenter__(self):
+        """Permite usar el detector con ``async with``."""
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        """Cierra el detector sin bloquear el bucle de eventos."""
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
@@ -0,0 +1,114 @@
+"""
+Este módulo agrupa solicitudes concurrentes en lotes para el modelo.
+
+Las solicitudes que llegan con pocos milisegundos de diferencia se procesan
+con una sola llamada al modelo, lo que aprovecha mejor el hardware que
+atenderlas una a una.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Sequence
+
+
+class MicroBatcher:
+    """Acumula solicitudes de varios hilos y las procesa en lotes."""
+    
+    def __init__(self, process_batch: Callable[[List], Sequence],
+                 max_batch_size: int = 8, max_wait_ms: float = 5.0):
+        """
+        Inicializa el agrupador e inicia su hilo.
+        
+        Args:
+            process_batch (callable): Función que recibe una lista de elementos
+                y retorna un resultado por elemento, en el mismo orden.
+            max_batch_size (int): Número máximo de elementos por lote.
+            max_wait_ms (float): Tiempo máximo que espera el primer elemento de
+                un lote a que lleguen otros.
+        
+        Raises:
+            ValueError: Si max_batch_size no es positivo o max_wait_ms es negativo
+        """
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size debe ser positivo: {max_batch_size}")
+        if max_wait_ms < 0:
+            raise ValueError(f"max_wait_ms no puede ser negativo: {max_wait_ms}")
+        
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._closed = False
+        # Contadores para diagnóstico: tamaño medio = items / batches
+        self.batches = 0
+        self.items = 0
+        self._thread = threading.Thread(target=self._run, name="micro-batcher",
+                                        daemon=True)
+        self._thread.start()
+    
+    def submit(self, item) -> Future:
+        """
+        Encola un elemento.
+        
+        Args:
+            item: Elemento que se pasará a ``process_batch``.
+        
+        Returns:
+            concurrent.futures.Future: Se completa con el resultado del elemento.
+        
+        Raises:
+            RuntimeError: Si el agrupador ya se cerró
+        """
+        if self._closed:
+            raise RuntimeError("El agrupador está cerrado")
+        future = Future()
+        self._queue.put((item, future))
+        return future
+    
+    def close(self) -> None:
+        """Procesa los elementos pendientes y detiene el hilo."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+    
+    def _collect(self, first) -> List:
+        """Completa un lote hasta llenarlo o agotar el tiempo de espera."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=timeout) if timeout > 0 else \
+                    self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # Reencolar la señal de cierre para el bucle principal
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+    
+    def _run(self) -> None:
+        """Bucle del hilo de fondo."""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [(item, future) for item, future in self._collect(first)
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            try:
+                results = self.process_batch([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,214 @@
+"""
+Este módulo implementa la caché de resultados del detector.
+
+Los resultados se indexan por el hash de los píxeles decodificados y la
+identidad del modelo, de modo que un cambio en el archivo del modelo
+invalida automáticamente las entradas anteriores.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from pathlib import Path
+from typing import Optional, Union
+import numpy as np
+
+
+def hash_file(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    """
+    Calcula el SHA-256 de un archivo leyéndolo por bloques.
+    
+    Args:
+        path: Ruta del archivo.
+        chunk_size (int): Tamaño de cada bloque leído.
+    
+    Returns:
+        str: Hash en hexadecimal.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_weights(model) -> str:
+    """
+    Calcula un hash de los pesos de un modelo que no proviene de un archivo.
+    
+    Args:
+        model (tf.keras.Model): Modelo cargado.
+    
+    Returns:
+        str: Hash en hexadecimal.
+    """
+    digest = hashlib.sha256()
+    for weights in model.get_weights():
+        digest.update(np.ascontiguousarray(weights).tobytes())
+    return digest.hexdigest()
+
+
+def hash_image(image: np.ndarray, model_id: str) -> str:
+    """
+    Construye la clave de caché de una imagen para un modelo.
+    
+    Args:
+        image (numpy.ndarray): Píxeles decodificados.
+        model_id (str): Identidad del modelo.
+    
+    Returns:
+        str: Clave en hexadecimal.
+    """
+    digest = hashlib.sha256()
+    digest.update(model_id.encode())
+    digest.update(f"{image.shape}{image.dtype}".encode())
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+
+def hash_source(sha256: str, model_id: str) -> str:
+    """
+    Construye la clave de caché de un estudio de un conjunto preparado.
+    
+    Se basa en el hash del archivo de origen guardado en el índice del
+    conjunto, porque los píxeles decodificados ya no están disponibles. Por
+    eso no coincide con la clave de ``hash_image`` para el mismo estudio.
+    
+    Args:
+        sha256 (str): Hash del archivo de origen (ver ``hash_file``).
+        model_id (str): Identidad del modelo.
+    
+    Returns:
+        str: Clave en hexadecimal.
+    """
+    digest = hashlib.sha256()
+    digest.update(model_id.encode())
+    digest.update(b'preparado')
+    digest.update(sha256.encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Caché LRU en memoria con un nivel opcional en disco."""
+    
+    def __init__(self, max_entries: int = 128, max_bytes: int = 512 * 2**20,
+                 directory: Optional[Union[str, Path]] = None):
+        """
+        Inicializa la caché.
+        
+        Args:
+            max_entries (int): Número máximo de resultados en memoria.
+            max_bytes (int): Memoria máxima ocupada por los mapas y probabilidades en memoria.
+            directory (str o Path, optional): Directorio donde persistir los
+                resultados como archivos ``.npz``. Sin él, solo hay caché en memoria.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = Path(directory) if directory is not None else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _size(result) -> int:
+        """Retorna los bytes ocupados por los arrays de un resultado."""
+        return sum(array.nbytes for array in (result.cam, result.probabilities)
+                   if array is not None)
+    
+    def _path(self, key: str) -> Path:
+        """Retorna la ruta del archivo en disco de una clave."""
+        return self.directory / f"{key}.npz"
+    
+    def _remember(self, key: str, result) -> None:
+        """Agrega un resultado a la memoria y descarta los menos usados."""
+        if key in self._entries:
+            self._bytes -= self._size(self._entries.pop(key))
+        self._entries[key] = result
+        self._bytes += self._size(result)
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= self._size(evicted)
+    
+    def get(self, key: str, source=None):
+        """
+        Busca un resultado en memoria y, si no está, en disco.
+        
+        Args:
+            key (str): Clave de la imagen.
+            source: Identificador que se asigna al resultado retornado.
+        
+        Returns:
+            DetectionResult o None: Copia del resultado, o None si no existe.
+        """
+        from .integrator import DetectionResult
+        
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+        
+        if result is None and self.directory is not None:
+            try:
+                with np.load(self._path(key), allow_pickle=False) as data:
+                    result = DetectionResult(
+                        source=None,
+                        label=str(data['label']),
+                        probability=float(data['probability']),
+                        probabilities=data['probabilities'],
+                        cam=data['cam'] if data['cam'].size else None,
+                    )
+            except (OSError, KeyError, ValueError):
+                result = None
+            if result is not None:
+                with self._lock:
+                    self._remember(key, result)
+        
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return replace(result, source=source)
+    
+    def put(self, key: str, result) -> None:
+        """
+        Guarda un resultado sin errores en memoria y, si aplica, en disco.
+        
+        Args:
+            key (str): Clave de la imagen.
+            result (DetectionResult): Resultado a guardar.
+        """
+        if not result.ok:
+            return
+        # Solo se guarda el mapa de baja resolución: el heatmap se vuelve a
+        # renderizar a partir de él y el diferido retiene activaciones
+        stored = replace(result, source=None, heatmap=None, deferred_heatmap=None)
+        with self._lock:
+            self._remember(key, stored)
+        
+        if self.directory is not None:
+            # Escribir en un archivo temporal y renombrar para no dejar
+            # archivos a medias si el proceso se interrumpe
+            tmp_path = self.directory / f".{key}.{os.getpid()}.{threading.get_ident()}.npz"
+            cam = result.cam if result.cam is not None else np.empty(0, np.uint8)
+            np.savez(tmp_path, label=np.str_(result.label),
+                     probability=np.float64(result.probability),
+                     probabilities=np.asarray(result.probabilities), cam=cam)
+            os.replace(tmp_path, self._path(key))
+    
+    def clear(self) -> None:
+        """Vacía la caché en memoria; los archivos en disco se conservan."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def __len__(self) -> int:
+        """Número de resultados en memoria."""
+        return len(self._entries)
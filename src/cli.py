@@ -0,0 +1,367 @@
+"""
+Interfaz de línea de comandos para ejecutar el detector sin interfaz gráfica.
+
+Uso:
+    python -m src.cli score <directorio> --output resultados.csv
+    python -m src.cli prepare <directorio> --output preparado/
+    python -m src.cli score preparado/ --output resultados.csv
+    python -m src.cli report historial.db --output-dir reportes/
+    python -m src.cli export-tflite --output models/conv_MLP_84.tflite --quantization float16
+"""
+
+import argparse
+import csv
+import json
+import sys
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, List, Set
+
+from . import instrumentation
+from .dataset import PreparedDataset, is_prepared, prepare_dataset
+from .pipeline import PreprocessPipeline, run_pipeline
+from .read_img import ImageReaderFactory
+
+
+def iter_studies(root: Path) -> Iterator[Path]:
+    """
+    Recorre un directorio y retorna las imágenes soportadas en orden estable.
+    
+    Args:
+        root (Path): Directorio raíz a recorrer.
+    
+    Yields:
+        Path: Ruta de cada imagen encontrada.
+    """
+    extensions = ImageReaderFactory.supported_extensions()
+    for path in sorted(root.rglob('*')):
+        if path.is_file() and path.suffix[1:].lower() in extensions:
+            yield path
+
+
+class ResultWriter:
+    """Escribe resultados en CSV o JSONL a medida que se producen."""
+    
+    FIELDS = ['path', 'label', 'probability', 'bacteriana', 'normal', 'viral', 'error']
+    
+    def __init__(self, output: Path):
+        """
+        Inicializa el escritor en modo de anexado.
+        
+        Args:
+            output (Path): Archivo de salida; ``.jsonl`` usa JSON Lines, otro CSV.
+        """
+        self.output = output
+        self.jsonl = output.suffix.lower() == '.jsonl'
+        is_new = not output.exists() or output.stat().st_size == 0
+        self._file = open(output, 'a', newline='', encoding='utf-8')
+        if not self.jsonl:
+            self._writer = csv.DictWriter(self._file, fieldnames=self.FIELDS)
+            if is_new:
+                self._writer.writeheader()
+    
+    @classmethod
+    def completed(cls, output: Path) -> Set[str]:
+        """
+        Lee un archivo de salida previo y retorna las rutas ya procesadas.
+        
+        Los estudios que terminaron con error no se consideran completos para
+        que se reintenten al reanudar.
+        
+        Args:
+            output (Path): Archivo de salida de una ejecución anterior.
+        
+        Returns:
+            set: Rutas procesadas sin error.
+        """
+        if not output.exists():
+            return set()
+        with open(output, newline='', encoding='utf-8') as f:
+            if output.suffix.lower() == '.jsonl':
+                rows = []
+                for line in f:
+                    try:
+                        rows.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Última línea truncada por una interrupción
+                        continue
+            else:
+                rows = csv.DictReader(f)
+            return {row['path'] for row in rows if not row.get('error')}
+    
+    def write(self, results: List) -> None:
+        """
+        Escribe un grupo de resultados y fuerza su escritura a disco.
+        
+        Args:
+            results (list): DetectionResult a escribir.
+        """
+        for result in results:
+            row = {'path': str(result.source), 'label': result.label,
+                   'probability': result.probability, 'error': result.error}
+            if result.probabilities is not None:
+                for idx, name in enumerate(('bacteriana', 'normal', 'viral')):
+                    row[name] = float(result.probabilities[idx])
+            if self.jsonl:
+                self._file.write(json.dumps(row, ensure_ascii=False) + '\n')
+            else:
+                self._writer.writerow(row)
+        self._file.flush()
+    
+    def close(self) -> None:
+        """Cierra el archivo de salida."""
+        self._file.close()
+
+
+def score_directory(detector, root: Path, output: Path, workers: int = 4,
+                    batch_size: int = 16, resume: bool = True, prefetch: int = 2,
+                    store=None, store_cam: bool = False, shared_memory: bool = True) -> int:
+    """
+    Procesa todas las imágenes de un directorio y escribe los resultados.
+    
+    La lectura y el preprocesamiento se ejecutan en ``workers`` procesos
+    mientras el modelo procesa los lotes ya preparados. Si ``root`` es un
+    conjunto preparado con ``prepare``, los lotes se leen directamente de él.
+    
+    Args:
+        detector (PneumoniaDetector): Detector a usar.
+        root (Path): Directorio con los estudios o conjunto preparado.
+        output (Path): Archivo CSV o JSONL de salida.
+        workers (int): Número de procesos de lectura.
+        batch_size (int): Número de imágenes por llamada al modelo.
+        resume (bool): Omitir los estudios ya presentes en ``output``.
+        prefetch (int): Lotes que se preparan por adelantado.
+        store (ResultStore, optional): Historial donde se guardan también los
+            resultados, con la versión del modelo.
+        store_cam (bool): Calcular el mapa Grad-CAM de cada estudio y
+            guardarlo en ``store`` para generar los reportes con heatmap.
+        shared_memory (bool): Entregar los lotes por memoria compartida (ver
+            ``PreprocessPipeline``).
+        
+    Returns:
+        int: Número de estudios procesados en esta ejecución.
+    """
+    done = ResultWriter.completed(output) if resume else set()
+    writer = ResultWriter(output)
+    model_version = detector.model_id if store is not None else None
+    processed = 0
+    
+    try:
+        # La salida solo tiene etiqueta y probabilidades: no se calculan heatmaps
+        if is_prepared(root):
+            dataset = PreparedDataset(root)
+            entries = [entry for entry in dataset.entries if entry.source not in done]
+            results = detector.process_dataset(dataset, batch_size, heatmap=False,
+                                               entries=entries)
+        else:
+            pending = (path for path in iter_studies(root) if str(path) not in done)
+            pipeline = PreprocessPipeline(workers=workers, batch_size=batch_size,
+                                          prefetch=prefetch, preprocessor=detector.preprocessor,
+                                          grayscale=detector.fast_preprocess,
+                                          shared_memory=shared_memory, originals=False)
+            results = run_pipeline(detector, pending, pipeline, heatmap=False)
+        while True:
+            chunk = list(islice(results, batch_size))
+            if not chunk:
+                break
+            writer.write(chunk)
+            if store is not None:
+                if store_cam:
+                    for result in chunk:
+                        if result.cam is None and result.deferred_heatmap is not None:
+                            result.cam = result.deferred_heatmap.get_cam()
+                store.add_many(chunk, model_version=model_version)
+            processed += len(chunk)
+            print(f"Procesados: {processed}", file=sys.stderr)
+    finally:
+        writer.close()
+        if store is not None:
+            store.flush()
+    
+    return processed
+
+
+def calibration_tensors(root: Path, limit: int = 100) -> Iterator:
+    """
+    Lee y preprocesa imágenes para calibrar la cuantización int8.
+    
+    Args:
+        root (Path): Directorio con estudios representativos.
+        limit (int): Número máximo de imágenes.
+    
+    Yields:
+        numpy.ndarray: Tensor preprocesado de forma (alto, ancho, 1).
+    """
+    from .preprocess_img import XRayPreprocessor
+    
+    preprocessor = XRayPreprocessor()
+    for path in islice(iter_studies(root), limit):
+        reader = ImageReaderFactory.get_reader_for_file(str(path))
+        yield preprocessor.preprocess(reader.read_grayscale(str(path)))[0]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Construye el analizador de argumentos de la línea de comandos.
+    
+    Returns:
+        argparse.ArgumentParser: Analizador configurado.
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m src.cli',
+        description='Detector de neumonía sin interfaz gráfica.'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    score = subparsers.add_parser('score', help='Procesa un directorio de estudios.')
+    score.add_argument('directory', type=Path,
+                       help='Directorio con imágenes DICOM/JPG/PNG/TIFF o preparado con prepare.')
+    score.add_argument('--output', '-o', type=Path, default=Path('resultados.csv'),
+                       help='Archivo de salida (.csv o .jsonl).')
+    score.add_argument('--model', default='conv_MLP_84.h5', help='Archivo del modelo.')
+    score.add_argument('--workers', type=int, default=4, help='Procesos de lectura.')
+    score.add_argument('--batch-size', type=int, default=16, help='Imágenes por lote.')
+    score.add_argument('--prefetch', type=int, default=2,
+                       help='Lotes preparados por adelantado.')
+    score.add_argument('--fast-preprocess', action='store_true',
+                       help='Leer las imágenes directamente en escala de grises.')
+    score.add_argument('--cache-dir', type=Path,
+                       help='Directorio de la caché de resultados en disco.')
+    score.add_argument('--no-resume', action='store_true',
+                       help='Procesar de nuevo los estudios ya presentes en la salida.')
+    score.add_argument('--backend', choices=('keras', 'tflite'), default='keras',
+                       help='Backend de inferencia; con tflite, --model es un archivo .tflite.')
+    score.add_argument('--no-shared-memory', action='store_true',
+                       help='Enviar los lotes serializados en lugar de por memoria compartida '
+                            '(por ejemplo, si /dev/shm es pequeño).')
+    score.add_argument('--store', type=Path,
+                       help='Base de datos SQLite del historial donde se añaden los resultados.')
+    score.add_argument('--store-cam', action='store_true',
+                       help='Guardar también el mapa Grad-CAM en el historial '
+                            '(para los reportes).')
+    score.add_argument('--trace', type=Path,
+                       help='Archivo JSONL con la duración de cada etapa de cada estudio.')
+    score.add_argument('--metrics', type=Path,
+                       help='Archivo de métricas por etapa en formato de Prometheus.')
+    score.add_argument('--trace-memory', action='store_true',
+                       help='Medir también la memoria pico de cada etapa.')
+    
+    prepare = subparsers.add_parser(
+        'prepare', help='Preprocesa un directorio una vez para evaluarlo de nuevo más rápido.')
+    prepare.add_argument('directory', type=Path,
+                         help='Directorio con imágenes DICOM/JPG/PNG/TIFF.')
+    prepare.add_argument('--output', '-o', type=Path, required=True,
+                         help='Directorio del conjunto preparado; se actualiza si existe.')
+    prepare.add_argument('--shard-size', type=int, default=4096, help='Imágenes por fragmento.')
+    prepare.add_argument('--workers', type=int, default=4, help='Procesos de lectura.')
+    prepare.add_argument('--fast-preprocess', action='store_true',
+                         help='Leer las imágenes directamente en escala de grises.')
+    
+    report = subparsers.add_parser('report', help='Genera los reportes PDF de un historial.')
+    report.add_argument('store', type=Path, help='Base de datos SQLite del historial.')
+    report.add_argument('--output-dir', '-o', type=Path, default=Path('reportes'),
+                        help='Directorio de los reportes.')
+    report.add_argument('--patient-id', help='Solo los resultados de este paciente.')
+    report.add_argument('--limit', type=int, help='Número máximo de reportes.')
+    report.add_argument('--workers', type=int, default=4, help='Procesos de generación.')
+    
+    export = subparsers.add_parser('export-tflite',
+                                   help='Convierte el modelo de Keras a TFLite.')
+    export.add_argument('--model', default='conv_MLP_84.h5', help='Modelo de Keras.')
+    export.add_argument('--output', '-o', type=Path, required=True,
+                        help='Archivo .tflite de salida.')
+    export.add_argument('--quantization', choices=('none', 'float16', 'int8'),
+                        default='none', help='Cuantización posterior al entrenamiento.')
+    export.add_argument('--calibration-dir', type=Path,
+                        help='Estudios representativos para la cuantización int8.')
+    export.add_argument('--calibration-samples', type=int, default=100,
+                        help='Número máximo de estudios de calibración.')
+    return parser
+
+
+def main(argv=None) -> int:
+    """
+    Función principal de la línea de comandos.
+    
+    Args:
+        argv (list, optional): Argumentos; por defecto los del proceso.
+    
+    Returns:
+        int: Código de salida.
+    """
+    args = build_parser().parse_args(argv)
+    
+    if args.command == 'score':
+        if not args.directory.is_dir():
+            print(f"No se encontró el directorio: {args.directory}", file=sys.stderr)
+            return 1
+        
+        from .cache import ResultCache
+        from .integrator import PneumoniaDetector
+        from .results_store import ResultStore
+        # Sin opciones se usan las variables de entorno NEUMONIA_TRACE/NEUMONIA_METRICS
+        if args.trace or args.metrics or args.trace_memory:
+            instrumentation.enable(args.trace, args.metrics, args.trace_memory)
+        else:
+            instrumentation.configure_from_env()
+        store = ResultStore(args.store) if args.store else None
+        try:
+            cache = ResultCache(directory=args.cache_dir) if args.cache_dir else None
+            detector = PneumoniaDetector(args.model, fast_preprocess=args.fast_preprocess,
+                                         cache=cache, backend=args.backend)
+            score_directory(detector, args.directory, args.output, workers=args.workers,
+                            batch_size=args.batch_size, resume=not args.no_resume,
+                            prefetch=args.prefetch, store=store, store_cam=args.store_cam,
+                            shared_memory=not args.no_shared_memory)
+        finally:
+            if store is not None:
+                store.close()
+            recorder = instrumentation.disable()
+            if recorder is not None:
+                print(recorder.format_summary(), file=sys.stderr)
+    
+    elif args.command == 'prepare':
+        if not args.directory.is_dir():
+            print(f"No se encontró el directorio: {args.directory}", file=sys.stderr)
+            return 1
+        
+        added = prepare_dataset(iter_studies(args.directory), args.output, root=args.directory,
+                                shard_size=args.shard_size, workers=args.workers,
+                                grayscale=args.fast_preprocess)
+        print(f"Estudios preparados: {added}", file=sys.stderr)
+    
+    elif args.command == 'report':
+        if not args.store.is_file():
+            print(f"No se encontró el historial: {args.store}", file=sys.stderr)
+            return 1
+        
+        from .report import generate_reports
+        from .results_store import ResultStore
+        with ResultStore(args.store) as store:
+            outcomes = generate_reports(store.query(args.patient_id, limit=args.limit),
+                                        args.output_dir, workers=args.workers)
+        failed = sum(error is not None for _, _, error in outcomes)
+        print(f"Reportes generados: {len(outcomes) - failed}, con error: {failed}",
+              file=sys.stderr)
+        return 1 if failed else 0
+    
+    elif args.command == 'export-tflite':
+        quantization = None if args.quantization == 'none' else args.quantization
+        if quantization == 'int8' and args.calibration_dir is None:
+            print("La cuantización int8 requiere --calibration-dir", file=sys.stderr)
+            return 1
+        
+        from .load_model import ModelLoader
+        from .tflite_backend import export_tflite
+        representative_data = None
+        if args.calibration_dir is not None:
+            representative_data = calibration_tensors(args.calibration_dir,
+                                                      args.calibration_samples)
+        path = export_tflite(ModelLoader().load_model(args.model), args.output,
+                             quantization, representative_data)
+        print(f"Modelo exportado: {path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
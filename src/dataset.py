@@ -0,0 +1,314 @@
+"""
+Este módulo implementa el formato de estudios ya preprocesados.
+
+El paso de preparación lee cada estudio una sola vez, aplica el
+redimensionamiento y CLAHE de ``XRayPreprocessor.enhance`` y guarda la
+imagen uint8 resultante en archivos ``.npy`` (fragmentos) que se leen con
+``numpy.memmap``. Un índice CSV relaciona cada estudio con su fragmento, su
+posición y el hash del archivo de origen. Volver a evaluar el archivo con
+otro modelo solo lee los fragmentos en orden y normaliza al cargar.
+"""
+
+import csv
+import json
+import multiprocessing
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import numpy as np
+
+from .cache import hash_file
+from .preprocess_img import XRayPreprocessor
+from .read_img import ImageReaderFactory
+
+MANIFEST = 'manifest.json'
+INDEX = 'index.csv'
+FORMAT_VERSION = 1
+
+
+@dataclass
+class DatasetEntry:
+    """Estudio guardado en un conjunto preparado."""
+    
+    study_id: str
+    source: str
+    sha256: str
+    shard: int
+    offset: int
+
+
+def is_prepared(directory: Union[str, Path]) -> bool:
+    """Indica si un directorio contiene un conjunto preparado."""
+    return (Path(directory) / MANIFEST).is_file()
+
+
+# Configuración propia de cada proceso de trabajo
+_preprocessor = None
+_grayscale = False
+
+
+def _init_worker(preprocessor: XRayPreprocessor, grayscale: bool) -> None:
+    """Inicializa el estado de un proceso de preparación."""
+    global _preprocessor, _grayscale
+    _preprocessor = preprocessor
+    _grayscale = grayscale
+
+
+def _prepare_study(path: str, known_sha256: Optional[str]) -> tuple:
+    """
+    Calcula el hash de un estudio y, si cambió, lo preprocesa.
+    
+    Se ejecuta dentro de un proceso de trabajo.
+    
+    Args:
+        path (str): Ruta de la imagen.
+        known_sha256 (str, optional): Hash guardado en una preparación anterior.
+    
+    Returns:
+        tuple: (hash, imagen uint8 o None si no cambió, mensaje de error o None).
+    """
+    try:
+        sha256 = hash_file(path)
+        if sha256 == known_sha256:
+            return sha256, None, None
+        reader = ImageReaderFactory.get_reader_for_file(path)
+        image = reader.read_grayscale(path) if _grayscale else reader.read(path)[0]
+        return sha256, _preprocessor.enhance(image), None
+    except Exception as e:
+        return None, None, str(e)
+
+
+def _read_index(directory: Path) -> List[DatasetEntry]:
+    """Lee el índice completo, incluidas las entradas reemplazadas."""
+    path = directory / INDEX
+    if not path.exists():
+        return []
+    with open(path, newline='', encoding='utf-8') as f:
+        return [DatasetEntry(row['study_id'], row['source'], row['sha256'],
+                             int(row['shard']), int(row['offset']))
+                for row in csv.DictReader(f)]
+
+
+def prepare_dataset(paths: Iterable[Union[str, Path]], output: Union[str, Path],
+                    root: Optional[Union[str, Path]] = None, shard_size: int = 4096,
+                    workers: Optional[int] = None,
+                    preprocessor: Optional[XRayPreprocessor] = None,
+                    grayscale: bool = False, start_method: Optional[str] = None) -> int:
+    """
+    Preprocesa estudios y los añade a un conjunto preparado.
+    
+    Los estudios cuyo archivo no cambió desde una preparación anterior (mismo
+    identificador y hash) se omiten; los que cambiaron se añaden de nuevo y
+    reemplazan a la entrada anterior. Cada ejecución escribe fragmentos
+    nuevos, y las entradas de un fragmento se añaden al índice cuando el
+    fragmento se ha escrito en disco.
+    
+    Args:
+        paths: Rutas de las imágenes.
+        output: Directorio del conjunto; se crea si no existe.
+        root (optional): Directorio base. El identificador de cada estudio es
+            su ruta relativa a ``root`` o, si falta, la ruta completa.
+        shard_size (int): Imágenes por fragmento.
+        workers (int, optional): Procesos de lectura. Por defecto, los núcleos disponibles.
+        preprocessor (XRayPreprocessor, optional): Preprocesador a usar.
+        grayscale (bool): Leer las imágenes directamente en un solo canal.
+        start_method (str, optional): Método de inicio de multiprocessing;
+            por defecto ``forkserver`` si está disponible, si no ``spawn``.
+    
+    Returns:
+        int: Número de estudios añadidos.
+    
+    Raises:
+        ValueError: Si shard_size no es positivo o el conjunto existente se
+            preparó con otra configuración
+    """
+    if shard_size < 1:
+        raise ValueError(f"shard_size debe ser positivo: {shard_size}")
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    preprocessor = preprocessor or XRayPreprocessor()
+    width, height = preprocessor.target_size
+    manifest = {'version': FORMAT_VERSION, 'shape': [height, width], 'dtype': 'uint8',
+                'shard_size': shard_size, 'grayscale': grayscale}
+    manifest_path = output / MANIFEST
+    if manifest_path.exists():
+        existing = json.loads(manifest_path.read_text())
+        for key in ('version', 'shape', 'grayscale'):
+            if existing[key] != manifest[key]:
+                raise ValueError(f"El conjunto {output} se preparó con {key}={existing[key]}")
+    else:
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+    
+    entries = _read_index(output)
+    known = {entry.study_id: entry.sha256 for entry in entries}
+    next_shard = max((entry.shard for entry in entries), default=-1) + 1
+    is_new_index = not (output / INDEX).exists()
+    
+    if start_method is None:
+        methods = multiprocessing.get_all_start_methods()
+        start_method = 'forkserver' if 'forkserver' in methods else 'spawn'
+    workers = workers or os.cpu_count() or 1
+    
+    def study_id(path: Path) -> str:
+        return str(path.relative_to(root)) if root is not None else str(path)
+    
+    shard = None
+    pending_rows = []
+    added = 0
+    index_file = open(output / INDEX, 'a', newline='', encoding='utf-8')
+    index = csv.writer(index_file)
+    if is_new_index:
+        index.writerow(['study_id', 'source', 'sha256', 'shard', 'offset'])
+    
+    def finish_shard() -> None:
+        # Escribir la imagen antes que su entrada del índice
+        if shard is not None:
+            shard.flush()
+        index.writerows(pending_rows)
+        index_file.flush()
+        pending_rows.clear()
+    
+    paths = (Path(path) for path in paths)
+    in_flight = deque()
+    
+    def submit(pool, path: Path) -> None:
+        identifier = study_id(path)
+        in_flight.append((path, identifier,
+                          pool.submit(_prepare_study, str(path), known.get(identifier))))
+    
+    try:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context(start_method),
+                                 initializer=_init_worker,
+                                 initargs=(preprocessor, grayscale)) as pool:
+            for path in islice(paths, 4 * workers):
+                submit(pool, path)
+            while in_flight:
+                path, identifier, future = in_flight.popleft()
+                sha256, image, error = future.result()
+                for next_path in islice(paths, 1):
+                    submit(pool, next_path)
+                if error is not None:
+                    print(f"No se pudo preparar {path}: {error}", file=sys.stderr)
+                    continue
+                if image is None:
+                    continue
+                
+                if shard is None or added % shard_size == 0:
+                    finish_shard()
+                    shard_number = next_shard + added // shard_size
+                    shard = np.lib.format.open_memmap(
+                        output / f"shard_{shard_number:05d}.npy", mode='w+',
+                        dtype=np.uint8, shape=(shard_size, height, width))
+                offset = added % shard_size
+                shard[offset] = image
+                pending_rows.append([identifier, str(path), sha256,
+                                     next_shard + added // shard_size, offset])
+                known[identifier] = sha256
+                added += 1
+    finally:
+        finish_shard()
+        shard = None
+        index_file.close()
+    return added
+
+
+class PreparedDataset:
+    """Conjunto preparado con ``prepare_dataset``, leído con memoria mapeada."""
+    
+    def __init__(self, directory: Union[str, Path]):
+        """
+        Abre un conjunto preparado.
+        
+        Args:
+            directory: Directorio del conjunto.
+        
+        Raises:
+            FileNotFoundError: Si el directorio no contiene un conjunto preparado
+            ValueError: Si la versión del formato no está soportada
+        """
+        self.directory = Path(directory)
+        if not is_prepared(self.directory):
+            raise FileNotFoundError(f"No se encontró un conjunto preparado en {directory}")
+        manifest = json.loads((self.directory / MANIFEST).read_text())
+        if manifest['version'] != FORMAT_VERSION:
+            raise ValueError(f"Versión de formato no soportada: {manifest['version']}")
+        self.shape = tuple(manifest['shape'])
+        self.grayscale = manifest['grayscale']
+        
+        # La última entrada de cada estudio reemplaza a las anteriores
+        latest: Dict[str, DatasetEntry] = {}
+        for entry in _read_index(self.directory):
+            latest.pop(entry.study_id, None)
+            latest[entry.study_id] = entry
+        # Orden de los fragmentos, para leerlos secuencialmente
+        self.entries = sorted(latest.values(), key=lambda entry: (entry.shard, entry.offset))
+        self._shards: Dict[int, np.ndarray] = {}
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def _shard(self, number: int) -> np.ndarray:
+        """Retorna un fragmento mapeado en memoria, abriéndolo una sola vez."""
+        if number not in self._shards:
+            self._shards[number] = np.load(self.directory / f"shard_{number:05d}.npy",
+                                           mmap_mode='r')
+        return self._shards[number]
+    
+    def image(self, entry: DatasetEntry) -> np.ndarray:
+        """
+        Retorna la imagen uint8 preprocesada de un estudio.
+        
+        Args:
+            entry (DatasetEntry): Entrada del índice.
+        
+        Returns:
+            numpy.ndarray: Vista de solo lectura (alto, ancho).
+        """
+        return self._shard(entry.shard)[entry.offset]
+    
+    def batches(self, batch_size: int = 16, entries: Optional[List[DatasetEntry]] = None
+                ) -> Iterator[Tuple[np.ndarray, List[DatasetEntry]]]:
+        """
+        Recorre el conjunto en lotes listos para el modelo.
+        
+        Las imágenes se normalizan a float32 en un tensor que se reutiliza,
+        por lo que cada lote solo es válido hasta pedir el siguiente.
+        
+        Args:
+            batch_size (int): Número máximo de estudios por lote.
+            entries (list, optional): Subconjunto de ``entries`` a recorrer.
+        
+        Yields:
+            tuple: (tensor de forma (N, alto, ancho, 1), entradas del lote).
+        
+        Raises:
+            ValueError: Si batch_size no es positivo
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size debe ser positivo: {batch_size}")
+        entries = self.entries if entries is None else entries
+        tensor = np.empty((batch_size,) + self.shape + (1,), dtype=np.float32)
+        for start in range(0, len(entries), batch_size):
+            chunk = entries[start:start + batch_size]
+            position = 0
+            # Agrupar las entradas consecutivas de un mismo fragmento
+            while position < len(chunk):
+                shard = chunk[position].shard
+                end = position
+                while end < len(chunk) and chunk[end].shard == shard:
+                    end += 1
+                offsets = [entry.offset for entry in chunk[position:end]]
+                if offsets == list(range(offsets[0], offsets[0] + len(offsets))):
+                    images = self._shard(shard)[offsets[0]:offsets[0] + len(offsets)]
+                else:
+                    images = self._shard(shard)[offsets]
+                np.multiply(images, np.float32(1 / 255.0),
+                            out=tensor[position:end, :, :, 0], casting='unsafe')
+                position = end
+            yield tensor[:len(chunk)], chunk
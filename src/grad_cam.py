@@ -2,18 +2,27 @@
 Este módulo implementa el algoritmo Grad-CAM para visualización.
 """
 
+import threading
+import weakref
+from typing import Optional, Tuple
 import numpy as np
-import cv2
 import tensorflow as tf
 
 # Desactivar ejecución eager
 tf.compat.v1.disable_eager_execution()
 from tensorflow.keras import backend as K
 
+from .heatmap import compute_cam, render_overlay
+
 
 class GradCAM:
     """Implementación del algoritmo Grad-CAM."""
     
+    # Funciones compiladas por modelo y (capa, tipo, clase) para no agregar
+    # operaciones al grafo global en cada llamada
+    _FUNCTION_CACHE = weakref.WeakKeyDictionary()
+    _FUNCTION_LOCK = threading.Lock()
+    
     def __init__(self, model: tf.keras.Model, layer_name: str = "conv10_thisone"):
         """
         Inicializa el visualizador Grad-CAM.
@@ -34,54 +43,163 @@ class GradCAM:
             for layer in self.model.layers:
                 print(f"- {layer.name}")
             raise
+        
+        # Grafo y sesión del modelo. Keras guarda la sesión por hilo, por lo
+        # que sin fijarlos las llamadas desde otros hilos (interfaz, servidor)
+        # no encuentran los tensores del modelo
+        self._graph = self.model.output.graph
+        self._session = tf.compat.v1.keras.backend.get_session()
     
-    def generate_heatmap(self, processed_image: np.ndarray, original_image: np.ndarray) -> np.ndarray:
+    def _pooled_gradients(self, class_idx: Optional[int] = None):
         """
-        Genera un mapa de calor usando Grad-CAM.
+        Construye el tensor de gradientes promediados por canal.
+        
+        Args:
+            class_idx (int, optional): Clase de interés. None usa la predicha.
+        
+        Returns:
+            Tensor de forma (N, canales).
+        """
+        conv_output = self.layer.output
+        if class_idx is None:
+            class_idx = K.argmax(self.model.output, axis=-1)
+            class_output = tf.gather(self.model.output, class_idx, axis=1, batch_dims=1)
+        else:
+            class_output = self.model.output[:, class_idx]
+        
+        # Cada muestra solo depende de su propia salida, por lo que el gradiente
+        # de la suma equivale al gradiente individual de cada imagen
+        grads = K.gradients(K.sum(class_output), conv_output)[0]
+        return K.mean(grads, axis=(1, 2))
+    
+    def _build_function(self, kind: str, class_idx: Optional[int] = None):
+        """
+        Construye una de las funciones de Keras del modelo.
+        
+        - ``explain``: imagen -> (predicciones, activaciones, gradientes). Si no
+          se indica la clase, se usa el argmax de la salida del propio modelo,
+          por lo que las tres salidas se obtienen con una sola pasada.
+        - ``predict``: imagen -> (predicciones, activaciones), sin gradientes.
+        - ``gradients``: activaciones -> gradientes. Se alimenta directamente
+          el tensor de la capa, por lo que solo se ejecuta la parte del modelo
+          posterior a ella.
+        
+        Args:
+            kind (str): 'explain', 'predict' o 'gradients'.
+            class_idx (int, optional): Clase de interés. None usa la predicha.
+        
+        Returns:
+            Función de Keras.
+        """
+        conv_output = self.layer.output
+        if kind == 'predict':
+            return K.function([self.model.input], [self.model.output, conv_output])
+        pooled_grads = self._pooled_gradients(class_idx)
+        if kind == 'gradients':
+            return K.function([conv_output], [pooled_grads])
+        return K.function([self.model.input],
+                          [self.model.output, conv_output, pooled_grads])
+    
+    def _get_function(self, kind: str, class_idx: Optional[int] = None):
+        """
+        Retorna una función compilada, construyéndola una sola vez.
+        
+        Args:
+            kind (str): 'explain', 'predict' o 'gradients'.
+            class_idx (int, optional): Clase de interés. None usa la predicha.
+        
+        Returns:
+            Función de Keras (ver ``_build_function``).
+        """
+        with self._FUNCTION_LOCK:
+            functions = self._FUNCTION_CACHE.setdefault(self.model, {})
+            key = (self.layer_name, kind, class_idx)
+            if key not in functions:
+                functions[key] = self._build_function(kind, class_idx)
+            return functions[key]
+    
+    def explain(self, processed_image: np.ndarray,
+                class_idx: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Calcula predicción, activaciones y gradientes en una sola pasada.
         
         Args:
             processed_image (numpy.ndarray): Imagen preprocesada en formato batch.
-            original_image (numpy.ndarray): Imagen original para superposición.
-            
+            class_idx (int, optional): Clase a explicar. Por defecto la predicha.
+        
         Returns:
-            numpy.ndarray: Imagen con el mapa de calor superpuesto.
+            tuple: (predicciones, activaciones de la capa, gradientes promediados)
+        """
+        with self._graph.as_default(), self._session.as_default():
+            explain_fn = self._get_function('explain', class_idx)
+            preds, conv_outputs, pooled_grads = explain_fn([processed_image])
+        return preds, conv_outputs, pooled_grads
+    
+    def predict(self, processed_image: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """
-        # Obtener predicción
-        preds = self.model.predict(processed_image)
-        class_idx = np.argmax(preds[0])
+        Calcula la predicción y captura las activaciones, sin gradientes.
         
-        # Obtener la salida de la última capa convolucional
-        last_conv_layer = self.model.get_layer(self.layer_name)
+        Cuesta lo mismo que una pasada hacia adelante; el heatmap se puede
+        obtener después con ``gradients`` y ``overlay_heatmap``.
         
-        # Obtener los gradientes de la clase con respecto a la última capa convolucional
-        class_output = self.model.output[:, class_idx]
-        grads = K.gradients(class_output, last_conv_layer.output)[0]
-        pooled_grads = K.mean(grads, axis=(0, 1, 2))
+        Args:
+            processed_image (numpy.ndarray): Imagen preprocesada en formato batch.
         
-        # Función para obtener valores
-        iterate = K.function([self.model.input],
-                           [pooled_grads, last_conv_layer.output[0]])
-        pooled_grads_value, conv_layer_output_value = iterate(processed_image)
+        Returns:
+            tuple: (predicciones, activaciones de la capa)
+        """
+        with self._graph.as_default(), self._session.as_default():
+            preds, conv_outputs = self._get_function('predict')([processed_image])
+        return preds, conv_outputs
+    
+    def gradients(self, conv_outputs: np.ndarray,
+                  class_idx: Optional[int] = None) -> np.ndarray:
+        """
+        Calcula los gradientes promediados a partir de activaciones ya capturadas.
         
-        # Aplicar pesos a los mapas de características
-        for i in range(pooled_grads_value.shape[0]):
-            conv_layer_output_value[:, :, i] *= pooled_grads_value[i]
+        Args:
+            conv_outputs (numpy.ndarray): Activaciones de la capa (N, alto, ancho, canales).
+            class_idx (int, optional): Clase a explicar. Por defecto la predicha.
         
-        # Generar mapa de calor
-        heatmap = np.mean(conv_layer_output_value, axis=-1)
-        heatmap = np.maximum(heatmap, 0)  # ReLU
-        heatmap /= np.max(heatmap)  # normalizar
+        Returns:
+            numpy.ndarray: Gradientes promediados de forma (N, canales).
+        """
+        with self._graph.as_default(), self._session.as_default():
+            return self._get_function('gradients', class_idx)([conv_outputs])[0]
+    
+    def overlay_heatmap(self, conv_output: np.ndarray, pooled_grads: np.ndarray,
+                        original_image: np.ndarray,
+                        size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """
+        Construye el mapa de calor a partir de activaciones ya calculadas.
         
-        # Redimensionar y aplicar colormap
-        heatmap = cv2.resize(heatmap, (original_image.shape[1], original_image.shape[0]))
-        heatmap = np.uint8(255 * heatmap)
-        heatmap = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
+        Args:
+            conv_output (numpy.ndarray): Activaciones de la capa (alto, ancho, canales).
+            pooled_grads (numpy.ndarray): Gradientes promediados por canal.
+            original_image (numpy.ndarray): Imagen original para superposición.
+            size (tuple, optional): Tamaño (ancho, alto) del resultado. Por
+                defecto, el de la imagen original.
         
-        # Superponer heatmap en la imagen original
-        if len(original_image.shape) == 2:  # Si es imagen en escala de grises
-            original_image = cv2.cvtColor(original_image, cv2.COLOR_GRAY2BGR)
+        Returns:
+            numpy.ndarray: Imagen con el mapa de calor superpuesto.
+        """
+        return render_overlay(compute_cam(conv_output, pooled_grads), original_image, size)
+    
+    def generate_heatmap(self, processed_image: np.ndarray, original_image: np.ndarray,
+                         class_idx: Optional[int] = None,
+                         size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """
+        Genera un mapa de calor usando Grad-CAM.
         
-        alpha = 0.5  # Factor de mezcla
-        superimposed = cv2.addWeighted(original_image, 1-alpha, heatmap, alpha, 0)
+        Args:
+            processed_image (numpy.ndarray): Imagen preprocesada en formato batch.
+            original_image (numpy.ndarray): Imagen original para superposición.
+            class_idx (int, optional): Clase a explicar. Por defecto la predicha.
+            size (tuple, optional): Tamaño (ancho, alto) del resultado. Por
+                defecto, el de la imagen original.
         
-        return superimposed[:, :, ::-1]  # Convertir BGR a RGB
\ No newline at end of file
+        Returns:
+            numpy.ndarray: Imagen con el mapa de calor superpuesto.
+        """
+        _, conv_outputs, pooled_grads = self.explain(processed_image, class_idx)
+        return self.overlay_heatmap(conv_outputs[0], pooled_grads[0], original_image, size)
@@ -2,17 +2,43 @@
 Módulo principal de la interfaz gráfica para la detección de neumonía.
 """
 
+import sys
+import time
 import tkinter as tk
 from tkinter import ttk, font, filedialog
 from tkinter.messagebox import askokcancel, showinfo, WARNING
 from pathlib import Path
 from abc import ABC, abstractmethod
-import csv
+from dataclasses import replace
 from PIL import ImageTk, Image
-import tkcap
 
-from src.integrator import PneumoniaDetector
+from src import instrumentation
+from src.cache import ResultCache
 from src.read_img import ImageReaderFactory  # Añadimos esta importación
+from src.report import write_report
+from src.results_store import ResultStore
+from src.gui.worker import PredictionWorker
+
+# Referencia para las métricas de arranque
+_START_TIME = time.perf_counter()
+
+# Tamaño (ancho, alto) con el que se muestran las imágenes
+DISPLAY_SIZE = (250, 250)
+
+# Historial de resultados guardados con el botón "Guardar"
+HISTORY_PATH = "historial.db"
+
+
+def build_detector():
+    """
+    Construye el detector con caché de resultados.
+    
+    Los heatmaps se renderizan directamente al tamaño en pantalla. Importa
+    TensorFlow, por lo que se llama desde el hilo de fondo.
+    """
+    from src.integrator import PneumoniaDetector
+    
+    return PneumoniaDetector(cache=ResultCache(), heatmap_size=DISPLAY_SIZE)
 
 
 class UIComponent(ABC):
@@ -74,7 +100,9 @@ class ImageDisplay(UIComponent):
         else:
             # Convertir y mostrar la imagen
             img = Image.fromarray(image)
-            img = img.resize((250, 250), Image.Resampling.LANCZOS)
+            # El detector ya entrega los heatmaps a este tamaño
+            if img.size != DISPLAY_SIZE:
+                img = img.resize(DISPLAY_SIZE, Image.Resampling.LANCZOS)
             self.image = ImageTk.PhotoImage(img)
             self.display.image_create(tk.END, image=self.image)
     
@@ -140,6 +168,9 @@ class ResultDisplay(UIComponent):
 class PneumoniaDetectorGUI:
     """Clase principal de la interfaz gráfica."""
     
+    # Intervalo de consulta de los resultados del trabajador
+    POLL_INTERVAL_MS = 100
+    
     def __init__(self):
         """Inicializa la aplicación GUI."""
         self.root = tk.Tk()
@@ -147,9 +178,6 @@ class PneumoniaDetectorGUI:
         self.root.geometry("815x560")
         self.root.resizable(0, 0)
         
-        # Inicializar el detector
-        self.detector = PneumoniaDetector()
-        
         # Inicializar componentes
         self._create_components()
         self._create_buttons()
@@ -157,6 +185,34 @@ class PneumoniaDetectorGUI:
         # Variables de estado
         self.current_image_path = None
         self.report_id = 0
+        # Último resultado mostrado, el que guarda el botón "Guardar"
+        self.last_result = None
+        self.store = None
+        # Trabajo cuyo resultado corresponde a la imagen mostrada
+        self._current_job = None
+        self._busy = False
+        self._predict_started = None
+        # Segundos desde el inicio: time_to_window, time_to_model_ready y
+        # time_to_first_prediction (de pulsar "Predecir" al resultado)
+        self.startup_metrics = {}
+        
+        # El modelo se carga en segundo plano cuando la ventana ya es visible
+        self.worker = None
+        self.root.after(0, self._on_window_shown)
+    
+    def _on_window_shown(self):
+        """Registra el tiempo de arranque e inicia la carga del modelo."""
+        self._record_metric('time_to_window', time.perf_counter() - _START_TIME)
+        # Las predicciones se ejecutan en segundo plano para no congelar la ventana
+        self.worker = PredictionWorker(build_detector)
+        self._update_progress()
+        self.root.after(self.POLL_INTERVAL_MS, self._poll_worker)
+    
+    def _record_metric(self, name, seconds):
+        """Guarda una métrica de arranque y la reporta por stderr."""
+        if name not in self.startup_metrics:
+            self.startup_metrics[name] = seconds
+            print(f"Arranque: {name}={seconds:.2f} s", file=sys.stderr)
     
     def _create_components(self):
         """Crea los componentes principales de la interfaz."""
@@ -181,6 +237,12 @@ class PneumoniaDetectorGUI:
         self.id_label.place(x=65, y=350)
         self.id_entry = ttk.Entry(self.root, width=10)
         self.id_entry.place(x=200, y=350)
+        
+        # Progreso de las predicciones en curso
+        self.progress = ttk.Progressbar(self.root, mode="indeterminate", length=200)
+        self.progress.place(x=65, y=405)
+        self.status_label = ttk.Label(self.root, text="")
+        self.status_label.place(x=65, y=430)
     
     def _create_buttons(self):
         """Crea los botones de la interfaz."""
@@ -199,6 +261,9 @@ class PneumoniaDetectorGUI:
         self.clear_button = ttk.Button(
             self.root, text="Borrar", command=self._clear_all
         )
+        self.cancel_button = ttk.Button(
+            self.root, text="Cancelar", command=self._cancel, state="disabled"
+        )
         
         # Posicionar botones
         self.load_button.place(x=70, y=460)
@@ -206,6 +271,7 @@ class PneumoniaDetectorGUI:
         self.save_button.place(x=370, y=460)
         self.pdf_button.place(x=520, y=460)
         self.clear_button.place(x=670, y=460)
+        self.cancel_button.place(x=280, y=402)
     
     def load_img_file(self):
         """Maneja la carga de una imagen."""
@@ -217,25 +283,30 @@ class PneumoniaDetectorGUI:
                 ("JPEG", "*.jpeg"),
                 ("jpg files", "*.jpg"),
                 ("png files", "*.png"),
+                ("TIFF", "*.tif *.tiff"),
             ),
         )
         if filepath:
             try:
-                # Obtener la extensión del archivo
-                file_extension = Path(filepath).suffix[1:]
-                
-                # Usar el factory para obtener el lector apropiado
-                reader = ImageReaderFactory.get_reader(file_extension)
+                # Usar el factory para obtener el lector según la firma del archivo
+                reader = ImageReaderFactory.get_reader_for_file(filepath)
                 self.array, img2show = reader.read(filepath)
+                self.current_image_path = filepath
                 
                 # Limpiar imagen anterior si existe
                 self.original_display.clear()
                 
                 # Redimensionar y mostrar la nueva imagen
-                self.img1 = img2show.resize((250, 250), Image.Resampling.LANCZOS)
+                self.img1 = img2show.resize(DISPLAY_SIZE, Image.Resampling.LANCZOS)
                 self.img1 = ImageTk.PhotoImage(self.img1)
                 self.original_display.show_image(self.img1)
                 
+                # Los resultados pendientes de la imagen anterior ya no se muestran
+                self._current_job = None
+                self.last_result = None
+                self.result_display.clear()
+                self.heatmap_display.clear()
+                
                 # Habilitar botón de predicción
                 self.predict_button["state"] = "enabled"
                 
@@ -244,56 +315,104 @@ class PneumoniaDetectorGUI:
                 self.predict_button["state"] = "disabled"
     
     def _predict(self):
-        """Realiza la predicción usando el detector."""
-        try:
-            if hasattr(self, 'array') and self.array is not None:
-                # Usar el array de la imagen cargada
-                label, prob, heatmap = self.detector.process_image(self.array)
-                
-                # Mostrar resultados
-                self.result_display.show_results(label, prob)
-                
-                # Limpiar heatmap anterior si existe
-                self.heatmap_display.clear()
-                
-                # Mostrar nuevo heatmap
-                self.heatmap_display.show_image(heatmap)
+        """Encola la predicción de la imagen cargada sin bloquear la ventana."""
+        if hasattr(self, 'array') and self.array is not None:
+            if self._predict_started is None:
+                self._predict_started = time.perf_counter()
+            self._current_job = self.worker.submit(self.array)
+            self._update_progress()
+        else:
+            showinfo("Error", "Por favor cargue una imagen primero.")
+    
+    def _poll_worker(self):
+        """Muestra los resultados terminados y vuelve a programarse."""
+        if self.worker.ready.is_set() and 'time_to_model_ready' not in self.startup_metrics:
+            self._record_metric('time_to_model_ready', time.perf_counter() - _START_TIME)
+            if self.worker.startup_error is not None:
+                showinfo("Error", f"Error al cargar el modelo: {self.worker.startup_error}")
+        
+        for job_id, result, error in self.worker.poll():
+            if job_id != self._current_job:
+                # Predicción de una imagen que ya no se muestra
+                continue
+            self._current_job = None
+            if error is not None:
+                showinfo("Error", f"Error al procesar la imagen: {str(error)}")
+                continue
+            self.last_result = result
+            if self._predict_started is not None:
+                self._record_metric('time_to_first_prediction',
+                                    time.perf_counter() - self._predict_started)
+            
+            # Mostrar resultados
+            self.result_display.show_results(result.label, result.probability)
+            
+            # Limpiar heatmap anterior si existe
+            self.heatmap_display.clear()
+            
+            # Mostrar nuevo heatmap
+            self.heatmap_display.show_image(result.heatmap)
+        
+        self._update_progress()
+        self.root.after(self.POLL_INTERVAL_MS, self._poll_worker)
+    
+    def _update_progress(self):
+        """Actualiza el indicador de progreso según los trabajos pendientes."""
+        pending = self.worker.pending
+        loading = not self.worker.ready.is_set()
+        if pending or loading:
+            if not self._busy:
+                self.progress.start()
+                self._busy = True
+            if loading:
+                self.status_label["text"] = f"Cargando modelo... ({pending} en cola)"
             else:
-                showinfo("Error", "Por favor cargue una imagen primero.")
-        except Exception as e:
-            import traceback
-            print(f"Error detallado: {traceback.format_exc()}")  # Para depuración
-            showinfo("Error", f"Error al procesar la imagen: {str(e)}")
+                self.status_label["text"] = f"Procesando... ({pending} en cola)"
+            self.cancel_button["state"] = "enabled"
+        elif self._busy:
+            self.progress.stop()
+            self._busy = False
+            self.status_label["text"] = ""
+            self.cancel_button["state"] = "disabled"
+    
+    def _cancel(self):
+        """Cancela las predicciones pendientes."""
+        self.worker.cancel()
+        self._current_job = None
+        self._update_progress()
     
     def _save_results(self):
-        """Guarda los resultados en un archivo CSV."""
+        """Guarda el resultado mostrado en el historial."""
         if not self.id_entry.get():
             showinfo("Error", "Por favor ingrese la cédula del paciente.")
             return
-            
+        if self.last_result is None:
+            showinfo("Error", "No hay un resultado para guardar.")
+            return
+        
         try:
-            with open("historial.csv", "a", newline='') as csvfile:
-                writer = csv.writer(csvfile, delimiter="-")
-                writer.writerow([
-                    self.id_entry.get(),
-                    self.result_display.result_text.get("1.0", tk.END).strip(),
-                    self.result_display.prob_text.get("1.0", tk.END).strip()
-                ])
+            if self.store is None:
+                self.store = ResultStore(HISTORY_PATH)
+            result = replace(self.last_result, source=self.current_image_path)
+            self.store.add(result, patient_id=self.id_entry.get().strip(),
+                           model_version=self.worker.detector.model_id)
+            self.store.flush()
             showinfo("Guardar", "Los datos se guardaron con éxito.")
         except Exception as e:
             showinfo("Error", f"Error al guardar los datos: {str(e)}")
     
     def _create_pdf(self):
-        """Genera un PDF del reporte actual."""
+        """Genera el PDF del reporte a partir del resultado mostrado."""
+        if self.last_result is None:
+            showinfo("Error", "No hay un resultado para el reporte.")
+            return
+        
         try:
-            cap = tkcap.CAP(self.root)
-            img_path = f"Reporte{self.report_id}.jpg"
-            cap.capture(img_path)
-            
-            img = Image.open(img_path)
-            img = img.convert("RGB")
             pdf_path = f"Reporte{self.report_id}.pdf"
-            img.save(pdf_path)
+            result = replace(self.last_result, source=self.current_image_path)
+            write_report(pdf_path, result, self.array,
+                         patient_id=self.id_entry.get().strip() or None,
+                         model_version=self.worker.detector.model_id)
             
             self.report_id += 1
             showinfo("PDF", "El PDF fue generado con éxito.")
@@ -310,18 +429,38 @@ class PneumoniaDetectorGUI:
             self.result_display.clear()
             self.id_entry.delete(0, tk.END)
             self.array = None
+            self.last_result = None
+            self._cancel()
             self.predict_button["state"] = "disabled"
             showinfo("Borrar", "Los datos se borraron con éxito")
     
     def run(self):
         """Inicia la aplicación."""
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            if self.worker is not None:
+                self.worker.shutdown()
+            if self.store is not None:
+                self.store.close()
 
 
 def main():
-    """Función principal para iniciar la aplicación."""
-    app = PneumoniaDetectorGUI()
-    app.run()
+    """
+    Función principal para iniciar la aplicación.
+    
+    Con las variables NEUMONIA_TRACE o NEUMONIA_METRICS se miden las etapas
+    de cada predicción (ver ``src.instrumentation``); el resumen se imprime
+    en stderr al cerrar la ventana.
+    """
+    instrumentation.configure_from_env()
+    try:
+        app = PneumoniaDetectorGUI()
+        app.run()
+    finally:
+        recorder = instrumentation.disable()
+        if recorder is not None:
+            print(recorder.format_summary(), file=sys.stderr)
 
 
 if __name__ == "__main__":
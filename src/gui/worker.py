@@ -0,0 +1,128 @@
+"""
+Ejecución de las predicciones en un hilo de fondo para no bloquear la interfaz.
+"""
+
+import itertools
+import queue
+import threading
+from typing import Callable, List, Optional, Tuple
+
+
+class PredictionWorker:
+    """Cola de predicciones atendida por un hilo de fondo."""
+    
+    def __init__(self, detector_factory: Callable, warm_up: bool = True):
+        """
+        Inicializa el trabajador e inicia su hilo.
+        
+        El detector se construye dentro del hilo, de modo que importar
+        TensorFlow y cargar el modelo no retrasa la aparición de la ventana.
+        Los trabajos enviados mientras tanto esperan en la cola.
+        
+        Args:
+            detector_factory (callable): Función sin argumentos que retorna el
+                PneumoniaDetector usado para las predicciones.
+            warm_up (bool): Ejecutar una inferencia de prueba tras cargar el
+                modelo para que la primera predicción real no sea lenta.
+        """
+        self.detector = None
+        self.startup_error: Optional[Exception] = None
+        self.ready = threading.Event()
+        self._detector_factory = detector_factory
+        self._warm_up = warm_up
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # Cancelar incrementa la generación; se descartan los trabajos anteriores
+        self._generation = 0
+        self._pending = 0
+        self._thread = threading.Thread(target=self._run, name="prediction-worker",
+                                        daemon=True)
+        self._thread.start()
+    
+    def submit(self, image) -> int:
+        """
+        Encola una imagen para predecir.
+        
+        Args:
+            image (numpy.ndarray): Imagen a procesar.
+        
+        Returns:
+            int: Identificador del trabajo.
+        """
+        job_id = next(self._ids)
+        with self._lock:
+            self._pending += 1
+            self._jobs.put((job_id, self._generation, image))
+        return job_id
+    
+    def cancel(self) -> None:
+        """
+        Cancela los trabajos en cola y descarta el resultado del que está en curso.
+        
+        La inferencia en curso no se puede interrumpir; su resultado se ignora.
+        """
+        with self._lock:
+            self._generation += 1
+            self._pending = 0
+    
+    @property
+    def pending(self) -> int:
+        """Número de trabajos en cola o en curso."""
+        with self._lock:
+            return self._pending
+    
+    def poll(self) -> List[Tuple[int, object, object]]:
+        """
+        Retorna los resultados terminados desde la última consulta.
+        
+        Debe llamarse desde el hilo de la interfaz (por ejemplo con ``root.after``).
+        
+        Returns:
+            list: Tuplas (id del trabajo, resultado o None, excepción o None).
+        """
+        finished = []
+        while True:
+            try:
+                finished.append(self._results.get_nowait())
+            except queue.Empty:
+                return finished
+    
+    def shutdown(self) -> None:
+        """Detiene el hilo de fondo después del trabajo en curso."""
+        self.cancel()
+        self._jobs.put((None, None, None))
+    
+    def _start(self) -> None:
+        """Construye el detector y, si se pidió, lo calienta."""
+        try:
+            self.detector = self._detector_factory()
+            if self._warm_up:
+                self.detector.warm_up()
+        except Exception as e:
+            self.startup_error = e
+        finally:
+            self.ready.set()
+    
+    def _run(self) -> None:
+        """Bucle del hilo de fondo."""
+        self._start()
+        while True:
+            job_id, generation, image = self._jobs.get()
+            if job_id is None:
+                return
+            with self._lock:
+                if generation != self._generation:
+                    continue
+            try:
+                if self.startup_error is not None:
+                    raise self.startup_error
+                result, error = self.detector.detect(image), None
+            except Exception as e:
+                result, error = None, e
+            with self._lock:
+                if generation != self._generation:
+                    continue
+                self._pending -= 1
+            self._results.put((job_id, result, error))
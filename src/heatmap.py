@@ -0,0 +1,182 @@
+"""
+Este módulo construye los mapas de calor de Grad-CAM a partir de las
+activaciones y los gradientes ya calculados por el modelo.
+
+No depende de TensorFlow, por lo que se puede usar en procesos que solo
+muestran o envían los resultados.
+"""
+
+import threading
+from typing import Callable, Optional, Tuple
+import cv2
+import numpy as np
+
+
+def compute_cam(conv_outputs: np.ndarray, pooled_grads: np.ndarray) -> np.ndarray:
+    """
+    Calcula el mapa Grad-CAM normalizado de una o varias imágenes.
+    
+    Pondera los canales con una sola contracción (einsum) en lugar de un
+    bucle por canal y normaliza cada mapa por su máximo. Un mapa sin valores
+    positivos queda en cero en vez de producir NaN.
+    
+    Args:
+        conv_outputs (numpy.ndarray): Activaciones (alto, ancho, canales) o
+            un lote (N, alto, ancho, canales).
+        pooled_grads (numpy.ndarray): Gradientes promediados (canales,) o (N, canales).
+    
+    Returns:
+        numpy.ndarray: Mapa float32 en [0, 1] de forma (alto, ancho) o (N, alto, ancho).
+    """
+    conv_outputs = np.asarray(conv_outputs, dtype=np.float32)
+    pooled_grads = np.asarray(pooled_grads, dtype=np.float32)
+    
+    # Media de los canales ponderados por sus gradientes
+    cam = np.einsum('...hwc,...c->...hw', conv_outputs, pooled_grads)
+    cam /= conv_outputs.shape[-1]
+    np.maximum(cam, 0, out=cam)  # ReLU
+    
+    # Normalizar cada mapa; si el máximo es 0 el mapa ya es todo ceros
+    peak = cam.max(axis=(-2, -1), keepdims=True)
+    np.divide(cam, peak, out=cam, where=peak > 0)
+    return cam
+
+
+def quantize_cam(cam: np.ndarray, dtype=np.uint8) -> np.ndarray:
+    """
+    Reduce un mapa normalizado a un tipo compacto para guardarlo o enviarlo.
+    
+    Args:
+        cam (numpy.ndarray): Mapa en [0, 1], ver compute_cam.
+        dtype: ``numpy.uint8`` (niveles 0-255) o ``numpy.float16``.
+    
+    Returns:
+        numpy.ndarray: Mapa con la misma forma en el tipo pedido.
+    
+    Raises:
+        ValueError: Si el tipo no está soportado
+    """
+    dtype = np.dtype(dtype)
+    if dtype == np.uint8:
+        return np.rint(np.asarray(cam, dtype=np.float32) * 255).astype(np.uint8)
+    if dtype == np.float16:
+        return np.asarray(cam, dtype=np.float16)
+    raise ValueError(f"Tipo de mapa no soportado: {dtype}")
+
+
+def render_overlay(cam: np.ndarray, original_image: np.ndarray,
+                   size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """
+    Colorea un mapa Grad-CAM y lo superpone a la imagen original.
+    
+    Con ``size`` se reduce primero la imagen original, de modo que el
+    colormap y la mezcla se hacen solo sobre los píxeles que se van a mostrar.
+    
+    Args:
+        cam (numpy.ndarray): Mapa (alto, ancho) normalizado en [0, 1] o
+            cuantizado en uint8, ver compute_cam y quantize_cam.
+        original_image (numpy.ndarray): Imagen original para superposición.
+        size (tuple, optional): Tamaño (ancho, alto) del resultado. Por
+            defecto, el de la imagen original.
+    
+    Returns:
+        numpy.ndarray: Imagen RGB con el mapa de calor superpuesto.
+    """
+    if size is not None:
+        original_image = cv2.resize(original_image, tuple(size), interpolation=cv2.INTER_AREA)
+    
+    # Redimensionar y aplicar colormap
+    target = (original_image.shape[1], original_image.shape[0])
+    if cam.dtype == np.uint8:
+        heatmap = cv2.resize(cam, target)
+    else:
+        heatmap = np.uint8(255 * cv2.resize(np.asarray(cam, dtype=np.float32), target))
+    heatmap = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
+    
+    # Superponer heatmap en la imagen original
+    if len(original_image.shape) == 2:  # Si es imagen en escala de grises
+        original_image = cv2.cvtColor(original_image, cv2.COLOR_GRAY2BGR)
+    
+    alpha = 0.5  # Factor de mezcla
+    superimposed = cv2.addWeighted(original_image, 1-alpha, heatmap, alpha, 0)
+    
+    return superimposed[:, :, ::-1]  # Convertir BGR a RGB
+
+
+class DeferredHeatmap:
+    """
+    Heatmap que se calcula la primera vez que se pide.
+    
+    El cálculo tiene dos pasos, cada uno hecho una sola vez: el mapa Grad-CAM
+    de baja resolución (``get_cam``), normalmente a partir de las activaciones
+    capturadas durante la predicción, y su superposición a la imagen
+    (``get``). Las funciones se descartan después de usarlas para liberar los
+    arrays que retenían.
+    """
+    
+    def __init__(self, compute_cam: Optional[Callable[[], np.ndarray]],
+                 render: Optional[Callable[[np.ndarray], np.ndarray]] = None):
+        """
+        Inicializa el heatmap diferido.
+        
+        Args:
+            compute_cam: Función sin argumentos que retorna el mapa Grad-CAM.
+            render: Función que recibe el mapa y retorna el heatmap.
+        """
+        self._compute_cam = compute_cam
+        self._render = render
+        self._cam = None
+        self._heatmap = None
+        self._lock = threading.RLock()
+    
+    @classmethod
+    def resolved(cls, heatmap: np.ndarray,
+                 cam: Optional[np.ndarray] = None) -> 'DeferredHeatmap':
+        """
+        Crea un heatmap diferido ya calculado.
+        
+        Args:
+            heatmap (numpy.ndarray): Heatmap disponible.
+            cam (numpy.ndarray, optional): Mapa Grad-CAM del que proviene.
+        
+        Returns:
+            DeferredHeatmap: Objeto cuyo ``get`` retorna ``heatmap``.
+        """
+        deferred = cls(None)
+        deferred._heatmap = heatmap
+        deferred._cam = cam
+        return deferred
+    
+    @property
+    def ready(self) -> bool:
+        """Indica si el heatmap ya se calculó."""
+        return self._render is None and self._compute_cam is None
+    
+    def get_cam(self) -> Optional[np.ndarray]:
+        """
+        Retorna el mapa Grad-CAM de baja resolución, calculándolo una sola vez.
+        
+        Si el cálculo falla, la excepción se propaga y la siguiente llamada
+        lo vuelve a intentar.
+        
+        Returns:
+            numpy.ndarray: Mapa (alto, ancho), ver quantize_cam.
+        """
+        with self._lock:
+            if self._compute_cam is not None:
+                self._cam = self._compute_cam()
+                self._compute_cam = None
+            return self._cam
+    
+    def get(self) -> np.ndarray:
+        """
+        Retorna el heatmap, calculándolo solo en la primera llamada.
+        
+        Returns:
+            numpy.ndarray: Imagen RGB con el mapa de calor superpuesto.
+        """
+        with self._lock:
+            if self._render is not None:
+                self._heatmap = self._render(self.get_cam())
+                self._render = None
+            return self._heatmap
@@ -0,0 +1,348 @@
+"""
+Instrumentación de las etapas del detector: tiempos y memoria pico.
+
+Las etapas se marcan con ``span``::
+    
+    from src import instrumentation
+    
+    with instrumentation.span('preprocess'):
+        ...
+
+Mientras la instrumentación está desactivada (por defecto), ``span`` retorna
+un contexto vacío compartido, por lo que el costo es una consulta a una
+variable global. Al activarla con ``enable`` o ``configure_from_env`` se
+acumulan estadísticas por etapa, exportables en formato de texto de
+Prometheus, y opcionalmente se escribe una traza JSONL con cada span.
+
+La memoria pico se mide con ``tracemalloc`` (incluye los arrays de numpy,
+no la memoria interna de TensorFlow). Es global al proceso: con varios
+hilos instrumentados a la vez, el pico de un span puede incluir
+asignaciones de otro hilo.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+# Variables de entorno que leen configure_from_env
+TRACE_ENV = 'NEUMONIA_TRACE'
+METRICS_ENV = 'NEUMONIA_METRICS'
+MEMORY_ENV = 'NEUMONIA_TRACE_MEMORY'
+
+# Límites (segundos) de los buckets del histograma de Prometheus
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+_NULL_SPAN = contextlib.nullcontext()
+_recorder = None
+_local = threading.local()
+
+
+class _StageStats:
+    """Estadísticas acumuladas de una etapa."""
+    
+    __slots__ = ('count', 'total', 'max', 'buckets', 'peak_bytes')
+    
+    def __init__(self, n_buckets: int):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * n_buckets
+        self.peak_bytes = None
+
+
+class Recorder:
+    """Acumula los spans de un proceso y los exporta."""
+    
+    def __init__(self, trace_path: Union[str, Path, None] = None,
+                 metrics_path: Union[str, Path, None] = None, track_memory: bool = False,
+                 buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Inicializa el registro.
+        
+        Args:
+            trace_path (str o Path, optional): Archivo JSONL donde se agrega un
+                evento por span. Varios procesos pueden escribir en el mismo.
+            metrics_path (str o Path, optional): Archivo donde ``write_metrics``
+                escribe las métricas en formato de Prometheus.
+            track_memory (bool): Medir la memoria pico de cada span.
+            buckets (tuple): Límites del histograma de duración, en segundos.
+        """
+        self.trace_path = Path(trace_path) if trace_path is not None else None
+        self.metrics_path = Path(metrics_path) if metrics_path is not None else None
+        self.track_memory = track_memory
+        self.buckets = tuple(buckets)
+        self._stats: Dict[str, _StageStats] = {}
+        self._lock = threading.Lock()
+        self._trace = None
+        if self.trace_path is not None:
+            self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+            # Una línea por escritura para que los procesos no se mezclen
+            self._trace = open(self.trace_path, 'a', buffering=1, encoding='utf-8')
+        # tracemalloc hace más lentas todas las asignaciones; se detiene al cerrar
+        self._owns_tracemalloc = track_memory and not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start()
+    
+    @property
+    def worker_config(self) -> Optional[dict]:
+        """
+        Configuración para activar la traza en procesos hijos (ver ``enable``).
+        
+        Es None si no hay traza: las métricas de los procesos hijos no se
+        combinan con las de este.
+        """
+        if self.trace_path is None:
+            return None
+        return {'trace_path': self.trace_path, 'track_memory': self.track_memory}
+    
+    def record(self, name: str, start: float, duration: float, peak_bytes: Optional[int],
+               parent: Optional[str], attributes: dict) -> None:
+        """
+        Registra un span terminado.
+        
+        Args:
+            name (str): Etapa.
+            start (float): Inicio en segundos desde la época.
+            duration (float): Duración en segundos.
+            peak_bytes (int, optional): Memoria pico sobre la del inicio.
+            parent (str, optional): Etapa que contiene a esta.
+            attributes (dict): Datos adicionales del span.
+        """
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _StageStats(len(self.buckets))
+            stats.count += 1
+            stats.total += duration
+            stats.max = max(stats.max, duration)
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    stats.buckets[i] += 1
+            if peak_bytes is not None:
+                stats.peak_bytes = max(stats.peak_bytes or 0, peak_bytes)
+            
+            if self._trace is not None:
+                event = {'name': name, 'start': start, 'duration_ms': duration * 1000,
+                         'pid': os.getpid(), 'thread': threading.current_thread().name}
+                if parent is not None:
+                    event['parent'] = parent
+                if peak_bytes is not None:
+                    event['peak_bytes'] = peak_bytes
+                if attributes:
+                    event['attributes'] = attributes
+                self._trace.write(json.dumps(event, default=str) + '\n')
+    
+    def summary(self) -> List[dict]:
+        """
+        Retorna las estadísticas por etapa, de mayor a menor tiempo total.
+        
+        Returns:
+            list: Diccionarios con etapa, llamadas, total, media y máximo en
+            milisegundos, y memoria pico en bytes si se mide.
+        """
+        with self._lock:
+            rows = [{'stage': name, 'count': stats.count, 'total_ms': stats.total * 1000,
+                     'mean_ms': stats.total * 1000 / stats.count, 'max_ms': stats.max * 1000,
+                     'peak_bytes': stats.peak_bytes}
+                    for name, stats in self._stats.items()]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+    
+    def format_summary(self) -> str:
+        """Retorna ``summary`` como una tabla de texto."""
+        lines = [f"{'etapa':<24}{'llamadas':>9}{'total ms':>12}{'media ms':>11}"
+                 f"{'máx ms':>11}{'pico MB':>10}"]
+        for row in self.summary():
+            peak = f"{row['peak_bytes'] / 2**20:10.1f}" if row['peak_bytes'] is not None \
+                else f"{'-':>10}"
+            lines.append(f"{row['stage']:<24}{row['count']:>9}{row['total_ms']:>12.1f}"
+                         f"{row['mean_ms']:>11.2f}{row['max_ms']:>11.2f}{peak}")
+        return '\n'.join(lines)
+    
+    def to_prometheus(self) -> str:
+        """
+        Exporta las estadísticas en el formato de texto de Prometheus.
+        
+        Returns:
+            str: Histograma ``neumonia_stage_seconds`` y, si se mide la
+            memoria, ``neumonia_stage_peak_bytes`` por etapa.
+        """
+        lines = ['# HELP neumonia_stage_seconds Duración de cada etapa del detector.',
+                 '# TYPE neumonia_stage_seconds histogram']
+        peaks = []
+        with self._lock:
+            for name, stats in sorted(self._stats.items()):
+                label = f'stage="{name}"'
+                for bound, count in zip(self.buckets, stats.buckets):
+                    lines.append(f'neumonia_stage_seconds_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'neumonia_stage_seconds_bucket{{{label},le="+Inf"}} {stats.count}')
+                lines.append(f'neumonia_stage_seconds_sum{{{label}}} {stats.total}')
+                lines.append(f'neumonia_stage_seconds_count{{{label}}} {stats.count}')
+                if stats.peak_bytes is not None:
+                    peaks.append(f'neumonia_stage_peak_bytes{{{label}}} {stats.peak_bytes}')
+        if peaks:
+            lines.append('# HELP neumonia_stage_peak_bytes Memoria pico de cada etapa.')
+            lines.append('# TYPE neumonia_stage_peak_bytes gauge')
+            lines.extend(peaks)
+        return '\n'.join(lines) + '\n'
+    
+    def write_metrics(self, path: Union[str, Path, None] = None) -> Optional[Path]:
+        """
+        Escribe las métricas de Prometheus de forma atómica.
+        
+        Sirve para el recolector de archivos de texto de node_exporter.
+        
+        Args:
+            path (str o Path, optional): Archivo de destino. Por defecto ``metrics_path``.
+        
+        Returns:
+            Path o None: Archivo escrito, o None si no hay destino.
+        """
+        path = Path(path) if path is not None else self.metrics_path
+        if path is None:
+            return None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}")
+        tmp_path.write_text(self.to_prometheus(), encoding='utf-8')
+        os.replace(tmp_path, path)
+        return path
+    
+    def close(self) -> None:
+        """Escribe las métricas, cierra la traza y detiene tracemalloc si lo inició."""
+        self.write_metrics()
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+
+class _Span:
+    """Contexto que mide una etapa mientras la instrumentación está activa."""
+    
+    __slots__ = ('recorder', 'name', 'attributes', 'start', 'start_wall', 'base', 'peak')
+    
+    def __init__(self, recorder: Recorder, name: str, attributes: dict):
+        self.recorder = recorder
+        self.name = name
+        self.attributes = attributes
+        self.peak = 0
+    
+    def __enter__(self) -> '_Span':
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        if self.recorder.track_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # El pico del span que contiene a este se guarda antes de reiniciarlo
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.base = current
+            self.peak = current
+        else:
+            self.base = None
+        stack.append(self)
+        self.start_wall = time.time()
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        duration = time.perf_counter() - self.start
+        stack = _local.stack
+        stack.pop()
+        parent = stack[-1] if stack else None
+        
+        peak_bytes = None
+        if self.base is not None and tracemalloc.is_tracing():
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            peak_bytes = self.peak - self.base
+            if parent is not None:
+                parent.peak = max(parent.peak, self.peak)
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        self.recorder.record(self.name, self.start_wall, duration, peak_bytes,
+                             parent.name if parent is not None else None, self.attributes)
+
+
+def span(name: str, **attributes):
+    """
+    Retorna un contexto que mide una etapa.
+    
+    Args:
+        name (str): Nombre de la etapa, por ejemplo 'preprocess'.
+        **attributes: Datos adicionales que se guardan en la traza.
+    
+    Returns:
+        Contexto; uno vacío y compartido si la instrumentación está desactivada.
+    """
+    recorder = _recorder
+    if recorder is None:
+        return _NULL_SPAN
+    return _Span(recorder, name, attributes)
+
+
+def get_recorder() -> Optional[Recorder]:
+    """Retorna el registro activo, o None si la instrumentación está desactivada."""
+    return _recorder
+
+
+def enable(trace_path: Union[str, Path, None] = None,
+           metrics_path: Union[str, Path, None] = None,
+           track_memory: bool = False) -> Recorder:
+    """
+    Activa la instrumentación en este proceso, reemplazando la configuración anterior.
+    
+    Args:
+        trace_path (str o Path, optional): Archivo JSONL de la traza.
+        metrics_path (str o Path, optional): Archivo de métricas de Prometheus,
+            escrito al llamar a ``disable``.
+        track_memory (bool): Medir la memoria pico de cada span.
+    
+    Returns:
+        Recorder: Registro activo.
+    """
+    global _recorder
+    disable()
+    _recorder = Recorder(trace_path, metrics_path, track_memory)
+    return _recorder
+
+
+def disable() -> Optional[Recorder]:
+    """
+    Desactiva la instrumentación, escribe las métricas y cierra la traza.
+    
+    Returns:
+        Recorder o None: Registro que estaba activo, para consultar su resumen.
+    """
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.close()
+    return recorder
+
+
+def configure_from_env() -> Optional[Recorder]:
+    """
+    Activa la instrumentación según las variables de entorno.
+    
+    ``NEUMONIA_TRACE`` indica el archivo JSONL de la traza,
+    ``NEUMONIA_METRICS`` el de las métricas de Prometheus y
+    ``NEUMONIA_TRACE_MEMORY=1`` activa la medición de memoria.
+    
+    Returns:
+        Recorder o None: Registro activo, o None si no hay variables definidas.
+    """
+    trace_path = os.environ.get(TRACE_ENV) or None
+    metrics_path = os.environ.get(METRICS_ENV) or None
+    if trace_path is None and metrics_path is None:
+        return None
+    track_memory = os.environ.get(MEMORY_ENV, '0') not in ('0', '', 'false')
+    return enable(trace_path, metrics_path, track_memory)
@@ -3,42 +3,172 @@ Este módulo integra todos los componentes del sistema.
 """
 
 import os
+import threading
+from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
-from typing import Tuple, Union
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 import numpy as np
 from PIL import Image
 
 from .read_img import ImageReaderFactory
 from .preprocess_img import XRayPreprocessor
 from .load_model import ModelLoader
-from .grad_cam import GradCAM
+from .cache import ResultCache, hash_file, hash_image, hash_source, hash_weights
+from .instrumentation import span
+from .heatmap import DeferredHeatmap, compute_cam, quantize_cam, render_overlay
+
+
+@dataclass
+class DetectionResult:
+    """Resultado de la detección para un estudio."""
+    
+    source: Union[str, int]
+    label: Optional[str] = None
+    probability: Optional[float] = None
+    probabilities: Optional[np.ndarray] = None
+    heatmap: Optional[np.ndarray] = None
+    error: Optional[str] = None
+    # Mapa Grad-CAM en uint8 con la resolución de la capa (p. ej. 32x32)
+    cam: Optional[np.ndarray] = None
+    # Heatmap pendiente cuando se procesó con heatmap=False
+    deferred_heatmap: Optional[DeferredHeatmap] = None
+    
+    @property
+    def ok(self) -> bool:
+        """Indica si el estudio se procesó sin errores."""
+        return self.error is None
+    
+    def get_heatmap(self) -> Optional[np.ndarray]:
+        """
+        Retorna el heatmap, calculándolo si se había diferido.
+        
+        Returns:
+            numpy.ndarray o None: Heatmap, o None si el backend no lo calcula.
+        """
+        if self.heatmap is None and self.deferred_heatmap is not None:
+            self.heatmap = self.deferred_heatmap.get()
+        return self.heatmap
+    
+    def render_heatmap(self, original_image: np.ndarray,
+                       size: Optional[Tuple[int, int]] = None) -> Optional[np.ndarray]:
+        """
+        Superpone el mapa Grad-CAM a la imagen original con el tamaño pedido.
+        
+        Args:
+            original_image (numpy.ndarray): Imagen original del estudio.
+            size (tuple, optional): Tamaño (ancho, alto). Por defecto, el de la imagen.
+        
+        Returns:
+            numpy.ndarray o None: Imagen RGB, o None si no hay mapa.
+        """
+        if self.cam is None and self.deferred_heatmap is not None:
+            self.cam = self.deferred_heatmap.get_cam()
+        if self.cam is None:
+            return None
+        return render_overlay(self.cam, original_image, size)
 
 
 class PneumoniaDetector:
     """Clase principal que integra todos los componentes del sistema."""
     
-    def __init__(self, model_path: str = 'conv_MLP_84.h5'):
+    LABELS = {0: "bacteriana", 1: "normal", 2: "viral"}
+    # Backends de inferencia: Keras (con Grad-CAM) o TFLite (solo predicción)
+    BACKENDS = ('keras', 'tflite')
+    
+    def __init__(self, model_path: str = 'conv_MLP_84.h5', model=None,
+                 fast_preprocess: bool = False, cache: Optional[ResultCache] = None,
+                 backend: str = 'keras', heatmap_size: Optional[Tuple[int, int]] = None):
         """
         Inicializa el detector de neumonía.
         
         Args:
             model_path (str): Ruta al archivo del modelo.
+            model (tf.keras.Model, optional): Modelo ya cargado. Si se indica,
+                no se carga ``model_path``.
+            fast_preprocess (bool): Leer las imágenes directamente en un solo
+                canal, sin la copia RGB ni la imagen PIL. Para radiografías en
+                escala de grises el tensor resultante es idéntico.
+            cache (ResultCache, optional): Caché de resultados por contenido.
+            backend (str): 'keras' o 'tflite'. Con 'tflite', ``model_path`` es
+                un archivo ``.tflite`` (ver ``src.tflite_backend``), no se
+                importa Grad-CAM y los resultados no traen heatmap.
+            heatmap_size (tuple, optional): Tamaño (ancho, alto) con el que se
+                renderizan los heatmaps, por ejemplo el de la pantalla. Por
+                defecto, el de la imagen original. El mapa de baja resolución
+                de cada resultado (``cam``) permite renderizarlo a otro tamaño.
+        
+        Raises:
+            ValueError: Si el backend no es válido
         """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Backend no soportado: {backend}")
+        
+        self.backend = backend
         self.model_loader = ModelLoader()
-        self.model = self.model_loader.load_model(model_path)
+        if backend == 'tflite':
+            from .tflite_backend import TFLiteModel
+            self.model = model if model is not None else \
+                TFLiteModel(self.model_loader._get_model_path(model_path))
+            self.grad_cam = None
+        else:
+            from .grad_cam import GradCAM
+            self.model = model if model is not None else self.model_loader.load_model(model_path)
+            self.grad_cam = GradCAM(self.model)
+        self.model_path = model_path if model is None else None
+        self.cache = cache
+        self._model_id = None
+        # La GUI y el servidor pueden pedir model_id a la vez desde varios hilos
+        self._model_id_lock = threading.Lock()
+        self.fast_preprocess = fast_preprocess
+        self.heatmap_size = heatmap_size
         self.preprocessor = XRayPreprocessor()
-        self.grad_cam = GradCAM(self.model)
     
-    def process_image(self, image_input: Union[str, np.ndarray]) -> Tuple[str, float, np.ndarray]:
+    @property
+    def model_id(self) -> str:
         """
-        Procesa una imagen y retorna la predicción.
+        Identidad del modelo usada en las claves de la caché.
+        
+        Es el hash del archivo del modelo o, para modelos de Keras pasados
+        directamente, el hash de sus pesos.
+        """
+        if self._model_id is None:
+            with self._model_id_lock:
+                if self._model_id is None:
+                    if self.model_path is not None:
+                        model_id = self.model_loader.get_fingerprint(self.model_path)
+                    elif self.backend == 'tflite':
+                        model_id = hash_file(self.model.path)
+                    else:
+                        model_id = hash_weights(self.model)
+                    self._model_id = model_id
+        return self._model_id
+    
+    def _cache_key(self, image_array: np.ndarray) -> Optional[str]:
+        """
+        Retorna la clave de caché de una imagen, o None si no hay caché.
         
         Args:
-            image_input: Puede ser una ruta a la imagen (str) o un array numpy con la imagen
+            image_array (numpy.ndarray): Píxeles decodificados
             
         Returns:
-            tuple: (clase_predicha, probabilidad, imagen_heatmap)
-            
+            str o None: Clave de la imagen
+        """
+        if self.cache is None:
+            return None
+        with span('cache.key'):
+            return hash_image(image_array, self.model_id)
+    
+    def _read_image(self, image_input: Union[str, np.ndarray]) -> np.ndarray:
+        """
+        Obtiene el array de la imagen a partir de una ruta o un array.
+        
+        Args:
+            image_input: Ruta a la imagen (str) o array numpy con la imagen
+        
+        Returns:
+            numpy.ndarray: Imagen como array
+        
         Raises:
             FileNotFoundError: Si no se encuentra la imagen
             ValueError: Si el formato de imagen no está soportado
@@ -48,29 +178,401 @@ class PneumoniaDetector:
             if not Path(image_input).exists():
                 raise FileNotFoundError(f"No se encontró la imagen en: {image_input}")
             
-            # Obtener la extensión del archivo
-            file_extension = Path(image_input).suffix[1:]  # Eliminar el punto
-            
-            # Crear el lector apropiado y leer la imagen
-            reader = ImageReaderFactory.get_reader(file_extension)
-            image_array, _ = reader.read(image_input)
-        else:
-            # Si es un array numpy
-            image_array = image_input
+            # Obtener el lector según la firma del archivo o su extensión
+            with span('read'):
+                reader = ImageReaderFactory.get_reader_for_file(image_input)
+                if self.fast_preprocess:
+                    return reader.read_grayscale(image_input)
+                image_array, _ = reader.read(image_input)
+                return image_array
+        
+        # Si es un array numpy
+        return image_input
+    
+    def warm_up(self) -> None:
+        """
+        Ejecuta una inferencia sobre un tensor en blanco.
+        
+        La primera llamada al modelo construye la función de Grad-CAM y reserva
+        la memoria de TensorFlow; hacerlo por adelantado evita que la primera
+        predicción real sea lenta. El resultado no se guarda en la caché.
+        """
+        batch = self.preprocessor.empty_batch(1)
+        batch.fill(0)
+        self._infer(batch)
+    
+    def _infer(self, batch: np.ndarray, gradients: bool = True) -> tuple:
+        """
+        Ejecuta el modelo sobre un lote preprocesado.
+        
+        Args:
+            batch (numpy.ndarray): Tensor de forma (N, alto, ancho, 1)
+            gradients (bool): Calcular también los gradientes de Grad-CAM. Sin
+                ellos la llamada cuesta una pasada hacia adelante.
+        
+        Returns:
+            tuple: (predicciones, activaciones, gradientes promediados). Con el
+            backend TFLite las activaciones y los gradientes son None; sin
+            ``gradients``, los gradientes son None.
+        """
+        with span('predict', batch_size=len(batch), gradients=gradients):
+            if self.grad_cam is None:
+                return self.model.predict(batch), None, None
+            if not gradients:
+                return (*self.grad_cam.predict(batch), None)
+            return self.grad_cam.explain(batch)
+    
+    def _render(self, cam: np.ndarray, original: np.ndarray) -> np.ndarray:
+        """Renderiza un mapa sobre la imagen original con ``heatmap_size``."""
+        with span('render'):
+            return render_overlay(cam, original, self.heatmap_size)
+    
+    def _defer_heatmap(self, key: Optional[str], result: DetectionResult,
+                       original: Optional[np.ndarray],
+                       conv_output: Optional[np.ndarray] = None,
+                       tensor: Optional[np.ndarray] = None) -> Optional[DeferredHeatmap]:
+        """
+        Crea el heatmap diferido de un resultado.
+        
+        Al calcularse, el mapa se guarda en el resultado y en la caché.
+        
+        Args:
+            key (str, optional): Clave de caché de la imagen.
+            result (DetectionResult): Resultado ya calculado.
+            original (numpy.ndarray, optional): Imagen original para la
+                superposición. Sin ella solo se puede pedir ``get_cam``.
+            conv_output (numpy.ndarray, optional): Activaciones de la capa
+                capturadas en la predicción, de forma (alto, ancho, canales).
+                Si faltan (resultado de la caché), se repite la pasada hacia adelante.
+            tensor (numpy.ndarray, optional): Tensor preprocesado de la imagen,
+                de forma (alto, ancho, 1), para repetir la pasada. Por defecto
+                se preprocesa ``original``, lo que no sirve si esta ya está
+                preprocesada o reducida.
+        
+        Returns:
+            DeferredHeatmap o None: None con el backend TFLite.
+        """
+        if self.grad_cam is None:
+            return None
+        if result.heatmap is not None:
+            return DeferredHeatmap.resolved(result.heatmap, result.cam)
+        
+        def render(cam: np.ndarray) -> np.ndarray:
+            if original is None:
+                raise ValueError("El estudio se procesó sin la imagen original; "
+                                 "solo está disponible get_cam()")
+            return self._render(cam, original)
+        
+        if result.cam is not None:
+            # Solo falta renderizar el mapa ya calculado
+            cam = result.cam
+            return DeferredHeatmap(lambda: cam, render)
+        
+        def compute_cam_once() -> np.ndarray:
+            activations = conv_output
+            if activations is None:
+                batch = tensor[np.newaxis] if tensor is not None else \
+                    self.preprocessor.preprocess(original)
+                _, activations = self.grad_cam.predict(batch)
+                activations = activations[0]
+            # Solo se ejecuta la parte del modelo posterior a la capa
+            with span('grad_cam', deferred=True):
+                pooled_grads = self.grad_cam.gradients(activations[np.newaxis])[0]
+                result.cam = quantize_cam(compute_cam(activations, pooled_grads))
+            if key is not None:
+                self.cache.put(key, result)
+            return result.cam
+        
+        return DeferredHeatmap(compute_cam_once, render)
+    
+    def process_image(self, image_input: Union[str, np.ndarray],
+                      heatmap: bool = True) -> Tuple[str, float, np.ndarray]:
+        """
+        Procesa una imagen y retorna la predicción.
+        
+        Args:
+            image_input: Puede ser una ruta a la imagen (str) o un array numpy con la imagen
+            heatmap (bool): Calcular el heatmap. Con False solo se ejecuta la
+                pasada hacia adelante y el tercer elemento es un
+                DeferredHeatmap que lo calcula al llamar a ``get()``,
+                reutilizando las activaciones de la predicción.
+        
+        Returns:
+            tuple: (clase_predicha, probabilidad, imagen_heatmap). El heatmap
+            tiene el tamaño ``heatmap_size`` y es None con el backend TFLite
+        
+        Raises:
+            FileNotFoundError: Si no se encuentra la imagen
+            ValueError: Si el formato de imagen no está soportado
+        """
+        result = self.detect(image_input, heatmap)
+        if not heatmap:
+            return result.label, result.probability, result.deferred_heatmap
+        return result.label, result.probability, result.heatmap
+    
+    def detect(self, image_input: Union[str, np.ndarray],
+               heatmap: bool = True) -> DetectionResult:
+        """
+        Procesa una imagen y retorna el resultado completo.
+        
+        Igual que ``process_image``, pero conserva el vector de probabilidades
+        y el mapa Grad-CAM, por ejemplo para guardarlos en un ResultStore.
+        
+        Args:
+            image_input: Ruta a la imagen (str) o array numpy con la imagen
+            heatmap (bool): Calcular el heatmap; con False queda en
+                ``deferred_heatmap``.
+        
+        Returns:
+            DetectionResult: Resultado del estudio; ``source`` es la ruta o None.
+        
+        Raises:
+            FileNotFoundError: Si no se encuentra la imagen
+            ValueError: Si el formato de imagen no está soportado
+        """
+        source = image_input if isinstance(image_input, str) else None
+        with span('process_image'):
+            result = self._process_image(image_input, heatmap)
+        result.source = source
+        return result
+    
+    def _process_image(self, image_input: Union[str, np.ndarray],
+                       heatmap: bool) -> DetectionResult:
+        """Implementa ``detect``; cada etapa se mide por separado."""
+        image_array = self._read_image(image_input)
+        
+        # Consultar la caché antes de preprocesar
+        key = self._cache_key(image_array)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                if not heatmap:
+                    cached.deferred_heatmap = self._defer_heatmap(key, cached, image_array)
+                    return cached
+                if cached.cam is not None:
+                    cached.heatmap = self._render(cached.cam, image_array)
+                    return cached
+                if self.grad_cam is None:
+                    return cached
         
         # Preprocesar la imagen
         processed_image = self.preprocessor.preprocess(image_array)
         
-        # Realizar predicción
-        prediction = self.model.predict(processed_image)
+        # Predicción, activaciones y gradientes en una sola pasada
+        prediction, conv_outputs, pooled_grads = self._infer(processed_image, gradients=heatmap)
         class_idx = np.argmax(prediction[0])
         probability = np.max(prediction[0]) * 100
         
         # Mapear índice a etiqueta
-        labels = {0: "bacteriana", 1: "normal", 2: "viral"}
-        predicted_class = labels[class_idx]
+        predicted_class = self.LABELS[class_idx]
+        result = DetectionResult(source=None, label=predicted_class,
+                                 probability=float(probability), probabilities=prediction[0])
+        
+        if not heatmap:
+            if key is not None:
+                self.cache.put(key, result)
+            conv_output = conv_outputs[0] if conv_outputs is not None else None
+            result.deferred_heatmap = self._defer_heatmap(key, result, image_array, conv_output)
+            return result
+        
+        # Generar heatmap reutilizando las activaciones ya calculadas
+        if conv_outputs is not None:
+            with span('grad_cam'):
+                result.cam = quantize_cam(compute_cam(conv_outputs[0], pooled_grads[0]))
+            result.heatmap = self._render(result.cam, image_array)
+        
+        if key is not None:
+            self.cache.put(key, result)
+        
+        return result
+    
+    def process_batch(self, inputs: Iterable[Union[str, np.ndarray]],
+                      batch_size: int = 16, heatmap: bool = True) -> List[DetectionResult]:
+        """
+        Procesa varias imágenes agrupándolas en lotes para el modelo.
+        
+        Los errores de lectura o preprocesamiento se reportan en el resultado
+        de cada estudio sin interrumpir el resto del lote.
+        
+        Args:
+            inputs: Rutas (str) o arrays numpy con las imágenes
+            batch_size (int): Número máximo de imágenes por llamada al modelo
+            heatmap (bool): Calcular los heatmaps; con False se difieren (ver
+                ``process_preprocessed``).
+        
+        Returns:
+            list: Un DetectionResult por entrada, en el mismo orden
+        
+        Raises:
+            ValueError: Si batch_size no es positivo
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size debe ser positivo: {batch_size}")
+        
+        results = []
+        iterator = iter(inputs)
+        while True:
+            chunk = list(islice(iterator, batch_size))
+            if not chunk:
+                break
+            results.extend(self._process_chunk(chunk, offset=len(results), heatmap=heatmap))
+        return results
+    
+    def _process_chunk(self, chunk: list, offset: int = 0,
+                       heatmap: bool = True) -> List[DetectionResult]:
+        """
+        Procesa un lote de entradas con una sola llamada al modelo.
+        
+        Args:
+            chunk (list): Rutas o arrays del lote
+            offset (int): Posición del primer elemento dentro de la entrada total
+            heatmap (bool): Calcular los heatmaps o diferirlos
+        
+        Returns:
+            list: Un DetectionResult por elemento del lote
+        """
+        results = []
+        pending = []
+        originals = []
+        sources = []
+        # Cada imagen se preprocesa directamente en su posición del lote
+        batch = self.preprocessor.empty_batch(len(chunk))
+        for position, image_input in enumerate(chunk):
+            source = image_input if isinstance(image_input, str) else offset + position
+            try:
+                image_array = self._read_image(image_input)
+                self.preprocessor.preprocess_into(batch, len(pending), image_array)
+                originals.append(image_array)
+                sources.append(source)
+                pending.append(position)
+                results.append(None)
+            except Exception as e:
+                results.append(DetectionResult(source=source, error=str(e)))
+        
+        if pending:
+            computed = self.process_preprocessed(batch[:len(pending)], originals, sources,
+                                                 heatmap)
+            for position, result in zip(pending, computed):
+                results[position] = result
+        return results
+    
+    def process_dataset(self, dataset, batch_size: int = 16, heatmap: bool = False,
+                        entries: Optional[list] = None) -> Iterator[DetectionResult]:
+        """
+        Procesa un conjunto preparado con ``src.dataset.prepare_dataset``.
+        
+        Los lotes se leen en orden de los fragmentos mapeados en memoria, sin
+        decodificar ni preprocesar. La imagen preprocesada (uint8, tras CLAHE)
+        hace de imagen original para los heatmaps. La clave de caché se
+        obtiene del hash del archivo guardado en el índice (ver
+        ``cache.hash_source``), por lo que no coincide con la de ``detect``
+        o ``process_batch`` para el mismo estudio.
+        
+        Args:
+            dataset (PreparedDataset): Conjunto preparado.
+            batch_size (int): Número máximo de imágenes por llamada al modelo
+            heatmap (bool): Calcular los heatmaps o diferirlos
+            entries (list, optional): Subconjunto de ``dataset.entries``.
+        
+        Yields:
+            DetectionResult: Resultado de cada estudio; ``source`` es la ruta
+            del archivo de origen.
+        
+        Raises:
+            ValueError: Si el conjunto se preparó con otro tamaño de imagen
+        """
+        expected = self.preprocessor.empty_batch(0).shape[1:3]
+        if tuple(dataset.shape) != expected:
+            raise ValueError(f"El conjunto tiene imágenes {dataset.shape}; "
+                             f"el modelo espera {expected}")
+        for batch, chunk in dataset.batches(batch_size, entries):
+            keys = None
+            if self.cache is not None:
+                keys = [hash_source(entry.sha256, self.model_id) for entry in chunk]
+            yield from self.process_preprocessed(
+                batch, [dataset.image(entry) for entry in chunk],
+                [entry.source for entry in chunk], heatmap, keys)
+    
+    def process_preprocessed(self, batch: np.ndarray, originals: List[np.ndarray],
+                             sources: List[Union[str, int]], heatmap: bool = True,
+                             keys: Optional[List[Optional[str]]] = None
+                             ) -> List[DetectionResult]:
+        """
+        Ejecuta el modelo y Grad-CAM sobre un lote ya preprocesado.
+        
+        Args:
+            batch (numpy.ndarray): Tensor de forma (N, alto, ancho, 1)
+            originals (list): Imagen original de cada elemento, para el heatmap.
+                Con ``heatmap=False`` y ``keys`` puede ser None.
+            sources (list): Identificador de cada elemento
+            heatmap (bool): Calcular los heatmaps. Con False solo se ejecuta la
+                pasada hacia adelante y cada resultado trae un
+                ``deferred_heatmap`` (ver ``DetectionResult.get_heatmap``).
+            keys (list, optional): Clave de caché de cada elemento, ya
+                calculada (por ejemplo en los procesos de lectura). Por
+                defecto se calcula sobre ``originals``.
+        
+        Returns:
+            list: Un DetectionResult por elemento del lote
+        """
+        results = [DetectionResult(source=source) for source in sources]
+        
+        # Resolver desde la caché y ejecutar el modelo solo con el resto
+        if self.cache is None:
+            keys = [None] * len(originals)
+        elif keys is None:
+            keys = [self._cache_key(image_array) for image_array in originals]
+        pending = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key, sources[i]) if key is not None else None
+            if cached is not None and not heatmap:
+                # Repetir la pasada sobre el tensor del lote, que puede no
+                # coincidir con el de preprocesar la imagen original
+                tensor = batch[i].copy() if cached.cam is None else None
+                cached.deferred_heatmap = self._defer_heatmap(key, cached, originals[i],
+                                                              tensor=tensor)
+                results[i] = cached
+            elif cached is not None and cached.cam is not None:
+                cached.heatmap = self._render(cached.cam, originals[i])
+                results[i] = cached
+            elif cached is not None and self.grad_cam is None:
+                results[i] = cached
+            else:
+                pending.append(i)
+        if not pending:
+            return results
+        if len(pending) < len(results):
+            batch = batch[pending]
+        
+        try:
+            predictions, conv_outputs, pooled_grads = self._infer(batch, gradients=heatmap)
+        except Exception as e:
+            for i in pending:
+                results[i].error = str(e)
+            return results
         
-        # Generar heatmap
-        heatmap = self.grad_cam.generate_heatmap(processed_image, image_array)
+        # Mapas Grad-CAM de todo el lote en una sola operación
+        cams = None
+        if pooled_grads is not None:
+            with span('grad_cam', batch_size=len(pending)):
+                cams = quantize_cam(compute_cam(conv_outputs, pooled_grads))
         
-        return predicted_class, probability, heatmap
\ No newline at end of file
+        for j, i in enumerate(pending):
+            result = results[i]
+            try:
+                result.probabilities = predictions[j]
+                result.label = self.LABELS[int(np.argmax(predictions[j]))]
+                result.probability = float(np.max(predictions[j]) * 100)
+                if cams is not None:
+                    result.cam = cams[j]
+                    result.heatmap = self._render(result.cam, originals[i])
+            except Exception as e:
+                result.error = str(e)
+            if keys[i] is not None:
+                self.cache.put(keys[i], result)
+            if not heatmap and result.ok:
+                # Copiar las activaciones para no retener las de todo el lote
+                conv_output = conv_outputs[j].copy() if conv_outputs is not None else None
+                result.deferred_heatmap = self._defer_heatmap(keys[i], result, originals[i],
+                                                              conv_output)
+        return results
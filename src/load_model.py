@@ -2,86 +2,240 @@
 Este módulo maneja la carga del modelo de red neuronal.
 """
 
+import hashlib
 import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
-import tensorflow as tf
-from tensorflow.keras.models import load_model
+from typing import TYPE_CHECKING, Dict, List, Union
+
+from .instrumentation import span
+
+if TYPE_CHECKING:
+    import tensorflow as tf
 
 
 class ModelLoader:
-    """Clase para cargar y gestionar el modelo de IA."""
+    """
+    Registro de los modelos de IA cargados en el proceso.
+    
+    Cada archivo ``.h5`` o directorio SavedModel se carga una sola vez por
+    versión (ruta, tamaño y fecha de modificación), de modo que se pueden
+    tener varios modelos a la vez, por ejemplo para comparar dos versiones.
+    """
     
     _instance = None
     _MODEL_DIR = 'models'  # Directorio de modelos
     _DEFAULT_MODEL = 'conv_MLP_84.h5'  # Nombre del modelo por defecto
+    # Variable de entorno con un directorio de modelos adicional
+    _MODEL_DIR_ENV = 'NEUMONIA_MODELS_DIR'
+    # Raíz del proyecto (donde está main.py), independiente del directorio actual
+    _PROJECT_ROOT = Path(__file__).resolve().parent.parent
     
     def __new__(cls):
-        """Implementa el patrón Singleton para el modelo."""
+        """Implementa el patrón Singleton para el registro de modelos."""
         if cls._instance is None:
             cls._instance = super(ModelLoader, cls).__new__(cls)
-            cls._instance._model = None
+            # (ruta, tamaño, fecha) -> modelo, en orden de carga
+            cls._instance._models = OrderedDict()
+            cls._instance._fingerprints = {}
+            cls._instance._lock = threading.RLock()
         return cls._instance
     
-    def _get_model_path(self, model_name: str = _DEFAULT_MODEL) -> Path:
+    def _search_dirs(self) -> List[Path]:
+        """
+        Retorna los directorios donde se buscan los modelos, en orden.
+        
+        Returns:
+            list: Directorio de la variable de entorno, ``models/`` del
+            proyecto y ``models/`` del directorio actual.
+        """
+        dirs = []
+        if os.environ.get(self._MODEL_DIR_ENV):
+            dirs.append(Path(os.environ[self._MODEL_DIR_ENV]))
+        dirs.append(self._PROJECT_ROOT / self._MODEL_DIR)
+        dirs.append(Path.cwd() / self._MODEL_DIR)
+        return dirs
+    
+    def _get_model_path(self, model_name: Union[str, Path] = _DEFAULT_MODEL) -> Path:
         """
-        Construye la ruta completa al archivo del modelo.
+        Construye la ruta completa al archivo o directorio del modelo.
+        
+        Las rutas absolutas o existentes se usan tal cual; los nombres se
+        buscan en los directorios de ``_search_dirs``.
         
         Args:
-            model_name (str): Nombre del archivo del modelo
-            
+            model_name (str): Nombre o ruta del modelo
+        
         Returns:
-            Path: Ruta completa al modelo
+            Path: Ruta absoluta al modelo. Si no existe en ningún directorio,
+            la ruta dentro de ``models/`` del proyecto.
         """
-        # Encontrar la raíz del proyecto (donde está main.py)
-        current_dir = Path(os.getcwd())
-        model_path = current_dir / self._MODEL_DIR / model_name
+        path = Path(model_name)
+        if path.is_absolute() or path.exists():
+            return path.resolve()
         
-        print(f"Buscando modelo en: {model_path}")  # Para depuración
-        return model_path
+        for directory in self._search_dirs():
+            candidate = directory / path
+            if candidate.exists():
+                return candidate.resolve()
+        return self._PROJECT_ROOT / self._MODEL_DIR / path
+    
+    @staticmethod
+    def _version_key(model_path: Path) -> tuple:
+        """Clave que identifica una versión concreta de un modelo en disco."""
+        stat = model_path.stat()
+        return (str(model_path), stat.st_size, stat.st_mtime_ns)
     
-    def load_model(self, model_name: str = _DEFAULT_MODEL) -> tf.keras.Model:
+    def load_model(self, model_name: Union[str, Path] = _DEFAULT_MODEL) -> 'tf.keras.Model':
         """
-        Carga el modelo de red neuronal.
+        Carga un modelo o retorna el ya cargado para esa versión.
+        
+        Si el archivo cambió desde la última carga, la versión anterior se
+        elimina del registro al cargar la nueva.
+        
+        Acepta archivos ``.h5`` y directorios SavedModel (ver
+        ``export_saved_model``). Para compartir los pesos entre procesos
+        creados con ``fork``, cargue el modelo antes de crearlos.
         
         Args:
-            model_name (str): Nombre del archivo del modelo
-            
+            model_name (str): Nombre o ruta del modelo
+        
         Returns:
             tf.keras.Model: Modelo cargado
-            
+        
         Raises:
             FileNotFoundError: Si no se encuentra el archivo del modelo
         """
-        if self._model is None:
-            model_path = self._get_model_path(model_name)
-            
-            if not model_path.exists():
-                raise FileNotFoundError(
-                    f"No se encontró el modelo en: {model_path}\n"
-                    f"Directorio actual: {os.getcwd()}\n"
-                    f"Contenido del directorio models/: {list(Path('models').glob('*'))}"
-                )
-            
-            try:
-                print(f"Intentando cargar modelo desde: {model_path}")
-                self._model = load_model(str(model_path))
-                print("Modelo cargado exitosamente")
-            except Exception as e:
-                print(f"Error al cargar el modelo: {str(e)}")
-                raise
-        
-        return self._model
+        # TensorFlow se importa solo al cargar un modelo de Keras. grad_cam
+        # fija el modo de ejecución, que debe estar activo antes de crear el modelo
+        from . import grad_cam  # noqa: F401
+        from tensorflow.keras.models import load_model
+        
+        model_path = self._get_model_path(model_name)
+        
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"No se encontró el modelo {model_name}\n"
+                f"Directorios buscados: {[str(d) for d in self._search_dirs()]}"
+            )
+        
+        with self._lock:
+            key = self._version_key(model_path)
+            model = self._models.get(key)
+            if model is None:
+                try:
+                    print(f"Intentando cargar modelo desde: {model_path}")
+                    with span('load_model'):
+                        model = load_model(str(model_path))
+                    print("Modelo cargado exitosamente")
+                except Exception as e:
+                    print(f"Error al cargar el modelo: {str(e)}")
+                    raise
+                # Las versiones anteriores del archivo ya no se usan
+                for stale in [stale for stale in self._models if stale[0] == key[0]]:
+                    del self._models[stale]
+                self._models[key] = model
+            self._models.move_to_end(key)
+        return model
     
-    def get_model(self) -> tf.keras.Model:
+    def loaded_models(self) -> Dict[str, 'tf.keras.Model']:
         """
-        Retorna el modelo cargado.
+        Retorna los modelos cargados, del más antiguo al más reciente.
+        
+        Returns:
+            dict: Ruta del modelo -> modelo; de cada ruta solo se conserva
+            la versión más reciente.
+        """
+        with self._lock:
+            return {path: model for (path, _, _), model in self._models.items()}
+    
+    def unload(self, model_name: Union[str, Path]) -> None:
+        """
+        Elimina del registro todas las versiones cargadas de un modelo.
+        
+        Args:
+            model_name (str): Nombre o ruta del modelo
+        """
+        path = str(self._get_model_path(model_name))
+        with self._lock:
+            for key in [key for key in self._models if key[0] == path]:
+                del self._models[key]
+    
+    def export_saved_model(self, model_name: Union[str, Path] = _DEFAULT_MODEL,
+                           directory: Union[str, Path, None] = None) -> Path:
+        """
+        Convierte un modelo ``.h5`` al formato SavedModel.
+        
+        Args:
+            model_name (str): Nombre o ruta del modelo ``.h5``
+            directory (str o Path, optional): Directorio de destino. Por
+                defecto, la ruta del modelo sin la extensión.
+        
+        Returns:
+            Path: Directorio del SavedModel, que se puede pasar a load_model
+        """
+        model = self.load_model(model_name)
+        if directory is None:
+            directory = self._get_model_path(model_name).with_suffix('')
+        directory = Path(directory).resolve()
+        model.save(str(directory), save_format='tf')
+        return directory
+    
+    def get_fingerprint(self, model_name: Union[str, Path] = _DEFAULT_MODEL) -> str:
+        """
+        Retorna el hash del modelo, para identificar su versión.
+        
+        El hash se recalcula solo si cambian el tamaño o la fecha del archivo.
+        Para un SavedModel se combinan los hashes de todos sus archivos.
+        
+        Args:
+            model_name (str): Nombre o ruta del modelo
+        
+        Returns:
+            str: SHA-256 del modelo en hexadecimal
+        """
+        from .cache import hash_file
+        
+        model_path = self._get_model_path(model_name)
+        with self._lock:
+            key = self._version_key(model_path)
+            if key not in self._fingerprints:
+                if model_path.is_dir():
+                    digest = hashlib.sha256()
+                    for file in sorted(p for p in model_path.rglob('*') if p.is_file()):
+                        digest.update(str(file.relative_to(model_path)).encode())
+                        digest.update(hash_file(file).encode())
+                    fingerprint = digest.hexdigest()
+                else:
+                    fingerprint = hash_file(model_path)
+                # Como en load_model, solo se conserva la versión más reciente
+                for stale in [stale for stale in self._fingerprints if stale[0] == key[0]]:
+                    del self._fingerprints[stale]
+                self._fingerprints[key] = fingerprint
+            return self._fingerprints[key]
+    
+    def get_model(self, model_name: Union[str, Path, None] = None) -> 'tf.keras.Model':
+        """
+        Retorna un modelo ya cargado.
+        
+        Args:
+            model_name (str, optional): Nombre o ruta del modelo. Por defecto,
+                el último modelo cargado.
         
         Returns:
             tf.keras.Model: Modelo cargado
-            
+        
         Raises:
             RuntimeError: Si el modelo no ha sido cargado
         """
-        if self._model is None:
-            raise RuntimeError("El modelo no ha sido cargado. Llame a load_model primero.")
-        return self._model
\ No newline at end of file
+        with self._lock:
+            if model_name is None:
+                if self._models:
+                    return next(reversed(self._models.values()))
+            else:
+                path = str(self._get_model_path(model_name))
+                for (loaded_path, _, _), model in reversed(self._models.items()):
+                    if loaded_path == path:
+                        return model
+        raise RuntimeError("El modelo no ha sido cargado. Llame a load_model primero.")
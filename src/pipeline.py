@@ -0,0 +1,337 @@
+"""
+Este módulo implementa la lectura y el preprocesamiento en varios procesos.
+
+Un conjunto de procesos lee y preprocesa los estudios mientras un único
+proceso, el que contiene el modelo, consume los lotes ya preparados. Los
+tensores y las imágenes originales reducidas se entregan por memoria
+compartida (ver ``src.shared_ring``); por la cola solo viajan los índices de
+las posiciones y la clave de caché, calculada sobre la imagen completa.
+"""
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from . import instrumentation
+from .cache import hash_image
+from .instrumentation import span
+from .read_img import ImageReaderFactory
+from .preprocess_img import XRayPreprocessor
+from .shared_ring import SharedRing
+
+
+@dataclass
+class PreprocessedStudy:
+    """Estudio leído y preprocesado por un proceso de trabajo."""
+    
+    source: str
+    tensor: Optional[np.ndarray] = None
+    original: Optional[np.ndarray] = None
+    error: Optional[str] = None
+    # Posición del anillo de memoria compartida y forma de la imagen guardada
+    slot: Optional[int] = None
+    original_shape: Optional[Tuple[int, ...]] = None
+    # Clave de caché de la imagen original completa (ver cache.hash_image)
+    cache_key: Optional[str] = None
+
+
+# Configuración propia de cada proceso de trabajo
+_preprocessor = None
+_grayscale = False
+_ring = None
+_model_id = None
+_originals = True
+
+
+def _init_worker(preprocessor: XRayPreprocessor, grayscale: bool,
+                 tracing: Optional[dict] = None, ring: Optional[dict] = None,
+                 model_id: Optional[str] = None, originals: bool = True) -> None:
+    """
+    Inicializa el estado de un proceso de trabajo.
+    
+    Args:
+        preprocessor (XRayPreprocessor): Preprocesador a usar en el proceso.
+        grayscale (bool): Leer las imágenes directamente en un solo canal.
+        tracing (dict, optional): Configuración de la instrumentación del
+            proceso principal; los spans se agregan a la misma traza.
+        ring (dict, optional): ``SharedRing.spec`` del anillo donde se
+            escriben los resultados.
+        model_id (str, optional): Identidad del modelo para calcular la clave
+            de caché de cada imagen.
+        originals (bool): Entregar la imagen original de cada estudio.
+    """
+    global _preprocessor, _grayscale, _ring, _model_id, _originals
+    _preprocessor = preprocessor
+    _grayscale = grayscale
+    _ring = SharedRing(**ring) if ring is not None else None
+    _model_id = model_id
+    _originals = originals
+    if tracing is not None:
+        instrumentation.enable(**tracing)
+
+
+def load_study(path: Union[str, Path], slot: Optional[int] = None) -> PreprocessedStudy:
+    """
+    Lee y preprocesa un estudio. Se ejecuta dentro de un proceso de trabajo.
+    
+    Con ``slot``, el tensor se escribe en esa posición del anillo y el
+    resultado lleva el índice en su lugar. Si el anillo guarda imágenes
+    originales, la imagen reducida también se escribe en la posición; si no,
+    viaja completa en el resultado, salvo que el pipeline no entregue
+    originales. La clave de caché se calcula siempre sobre la imagen completa.
+    
+    Args:
+        path: Ruta de la imagen.
+        slot (int, optional): Posición del anillo de memoria compartida.
+    
+    Returns:
+        PreprocessedStudy: Tensor listo para el modelo o el error producido.
+    """
+    path = str(path)
+    try:
+        with span('read'):
+            reader = ImageReaderFactory.get_reader_for_file(path)
+            if _grayscale:
+                image_array = reader.read_grayscale(path)
+            else:
+                image_array, _ = reader.read(path)
+        cache_key = None
+        if _model_id is not None:
+            with span('cache.key'):
+                cache_key = hash_image(image_array, _model_id)
+        original = image_array if _originals else None
+        if slot is not None:
+            _preprocessor.preprocess_into(_ring.tensors, slot, image_array)
+            if not _originals or _ring.original_size is None:
+                return PreprocessedStudy(source=path, slot=slot, original=original,
+                                         cache_key=cache_key)
+            shape = _ring.write_original(slot, image_array)
+            return PreprocessedStudy(source=path, slot=slot, original_shape=shape,
+                                     cache_key=cache_key)
+        tensor = _preprocessor.preprocess(image_array)[0]
+        return PreprocessedStudy(source=path, tensor=tensor, original=original,
+                                 cache_key=cache_key)
+    except Exception as e:
+        return PreprocessedStudy(source=path, error=str(e))
+
+
+class PreprocessPipeline:
+    """Lectura y preprocesamiento en paralelo con contrapresión."""
+    
+    def __init__(self, workers: Optional[int] = None, batch_size: int = 16,
+                 prefetch: int = 2, preprocessor: Optional[XRayPreprocessor] = None,
+                 grayscale: bool = False, start_method: Optional[str] = None,
+                 shared_memory: bool = True,
+                 original_size: Optional[Tuple[int, int]] = (1024, 1024),
+                 originals: bool = True):
+        """
+        Inicializa el pipeline.
+        
+        Args:
+            workers (int, optional): Procesos de lectura. Por defecto, los núcleos
+                disponibles menos el del modelo.
+            batch_size (int): Número de estudios por lote.
+            prefetch (int): Lotes que se preparan por adelantado. Limita la
+                memoria usada cuando el modelo es más lento que la lectura.
+            preprocessor (XRayPreprocessor, optional): Preprocesador que se copia
+                a cada proceso. Por defecto uno con la configuración estándar.
+            grayscale (bool): Leer las imágenes directamente en un solo canal.
+            start_method (str, optional): Método de inicio de multiprocessing.
+                Por defecto ``forkserver`` si está disponible, si no ``spawn``,
+                para no heredar el estado de TensorFlow del proceso principal.
+            shared_memory (bool): Entregar los resultados por un anillo de
+                memoria compartida en lugar de serializarlos.
+            original_size (tuple, optional): Tamaño máximo (ancho, alto) de la
+                imagen original entregada por memoria compartida; las más
+                grandes se reducen, por lo que los heatmaps salen con ese
+                tamaño. Basta con el tamaño al que se renderizan. Con None la
+                imagen se entrega completa, serializada junto con el índice.
+            originals (bool): Entregar la imagen original de cada estudio. Con
+                False solo viajan los tensores, por ejemplo si no se van a
+                renderizar heatmaps (los mapas ``cam`` no la necesitan).
+        
+        Raises:
+            ValueError: Si batch_size o prefetch no son positivos
+        """
+        if batch_size < 1 or prefetch < 1:
+            raise ValueError("batch_size y prefetch deben ser positivos")
+        
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+        self.preprocessor = preprocessor or XRayPreprocessor()
+        self.grayscale = grayscale
+        self.shared_memory = shared_memory
+        self.original_size = original_size
+        self.originals = originals
+        if start_method is None:
+            methods = multiprocessing.get_all_start_methods()
+            start_method = 'forkserver' if 'forkserver' in methods else 'spawn'
+        self.start_method = start_method
+    
+    def batches(self, paths: Iterable[Union[str, Path]], copy: bool = True,
+                model_id: Optional[str] = None) -> Iterator[List[PreprocessedStudy]]:
+        """
+        Lee y preprocesa los estudios, retornándolos en lotes y en orden.
+        
+        Como máximo hay ``batch_size * prefetch`` estudios en vuelo; no se
+        envían más tareas hasta que el consumidor toma el siguiente lote.
+        Con memoria compartida, el anillo tiene una posición por estudio en
+        vuelo más las del lote que tiene el consumidor, y cada lote ocupa
+        posiciones consecutivas (ver ``batch_tensor``).
+        
+        Args:
+            paths: Rutas de las imágenes.
+            copy (bool): Copiar los tensores y originales fuera del anillo.
+                Con False son vistas de la memoria compartida que solo son
+                válidas hasta pedir el siguiente lote.
+            model_id (str, optional): Identidad del modelo. Si se indica, cada
+                proceso calcula la clave de caché de la imagen original
+                completa, antes de reducirla (``PreprocessedStudy.cache_key``).
+        
+        Yields:
+            list: Lote de PreprocessedStudy en el orden de entrada.
+        """
+        context = multiprocessing.get_context(self.start_method)
+        if self.start_method == 'forkserver':
+            # Importar los módulos una sola vez en el servidor y no en cada proceso
+            context.set_forkserver_preload([__name__])
+        max_in_flight = self.batch_size * self.prefetch
+        paths = iter(paths)
+        in_flight = deque()
+        recorder = instrumentation.get_recorder()
+        tracing = recorder.worker_config if recorder is not None else None
+        ring = None
+        if self.shared_memory:
+            ring = SharedRing(max_in_flight + self.batch_size,
+                              self.preprocessor.empty_batch(0).shape[1:],
+                              self.original_size if self.originals else None,
+                              1 if self.grayscale else 3)
+        submitted = 0
+        
+        def submit(pool, path):
+            nonlocal submitted
+            slot = submitted % ring.n_slots if ring is not None else None
+            in_flight.append(pool.submit(load_study, path, slot))
+            submitted += 1
+        
+        batch = []
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                     initializer=_init_worker,
+                                     initargs=(self.preprocessor, self.grayscale, tracing,
+                                               ring.spec if ring is not None else None,
+                                               model_id, self.originals)) as pool:
+                for path in islice(paths, max_in_flight):
+                    submit(pool, path)
+                
+                while in_flight:
+                    study = in_flight.popleft().result()
+                    if study.slot is not None:
+                        study.tensor = ring.tensors[study.slot]
+                        if study.original_shape is not None:
+                            study.original = ring.original(study.slot, study.original_shape)
+                            if copy:
+                                study.original = study.original.copy()
+                        if copy:
+                            study.tensor = study.tensor.copy()
+                    batch.append(study)
+                    # La posición del nuevo estudio es la de un lote ya consumido
+                    for path in islice(paths, 1):
+                        submit(pool, path)
+                    if len(batch) == self.batch_size:
+                        yield batch
+                        batch = []
+                if batch:
+                    yield batch
+        finally:
+            batch = None
+            if ring is not None:
+                ring.close()
+
+
+def batch_tensor(studies: List[PreprocessedStudy]) -> np.ndarray:
+    """
+    Arma el tensor de entrada del modelo con los estudios de un lote.
+    
+    Si los tensores ocupan posiciones consecutivas del anillo, como ocurre
+    en un lote sin errores retornado con ``copy=False``, se retorna una vista
+    de la memoria compartida sin copiar nada; en otro caso se apilan.
+    
+    Args:
+        studies (list): PreprocessedStudy sin error.
+    
+    Returns:
+        numpy.ndarray: Tensor de forma (N, alto, ancho, 1).
+    """
+    first = studies[0].tensor
+    start = first.__array_interface__['data'][0]
+    consecutive = all(
+        study.tensor.flags.c_contiguous and study.tensor.shape == first.shape
+        and study.tensor.__array_interface__['data'][0] == start + i * first.nbytes
+        for i, study in enumerate(studies))
+    if consecutive:
+        return as_strided(first, (len(studies),) + first.shape,
+                          (first.nbytes,) + first.strides, writeable=False)
+    return np.stack([study.tensor for study in studies])
+
+
+def run_pipeline(detector, paths: Iterable[Union[str, Path]],
+                 pipeline: Optional[PreprocessPipeline] = None,
+                 heatmap: bool = True) -> Iterator:
+    """
+    Procesa estudios leyendo en varios procesos y ejecutando el modelo en este.
+    
+    Args:
+        detector (PneumoniaDetector): Detector que contiene el modelo.
+        paths: Rutas de las imágenes.
+        pipeline (PreprocessPipeline, optional): Pipeline a usar.
+        heatmap (bool): Calcular los heatmaps; con False se difieren y el
+            modelo solo ejecuta la pasada hacia adelante.
+    
+    Yields:
+        DetectionResult: Resultado de cada estudio en el orden de entrada.
+    
+    Raises:
+        ValueError: Si se piden heatmaps a un pipeline que no entrega las
+            imágenes originales
+    """
+    from .integrator import DetectionResult
+    
+    pipeline = pipeline or PreprocessPipeline(preprocessor=detector.preprocessor,
+                                              grayscale=detector.fast_preprocess)
+    if heatmap and not pipeline.originals:
+        raise ValueError("Los heatmaps necesitan un pipeline con originals=True")
+    # Los lotes son vistas del anillo, válidas hasta pedir el siguiente
+    model_id = detector.model_id if detector.cache is not None else None
+    batches = pipeline.batches(paths, copy=False, model_id=model_id)
+    try:
+        for batch in batches:
+            valid = [study for study in batch if study.error is None]
+            computed = iter([])
+            if valid:
+                originals = [study.original for study in valid]
+                if not heatmap:
+                    # Los heatmaps diferidos usan la imagen después de reciclar la posición
+                    originals = [study.original.copy() if study.original_shape is not None
+                                 else study.original for study in valid]
+                keys = [study.cache_key for study in valid] if model_id is not None else None
+                computed = iter(detector.process_preprocessed(
+                    batch_tensor(valid), originals,
+                    [study.source for study in valid], heatmap, keys))
+            for study in batch:
+                if study.error is None:
+                    yield next(computed)
+                else:
+                    yield DetectionResult(source=study.source, error=study.error)
+    finally:
+        # Soltar las vistas antes de liberar la memoria compartida
+        batch = valid = originals = computed = None
+        batches.close()
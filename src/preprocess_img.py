@@ -2,10 +2,13 @@
 Este módulo implementa el preprocesamiento de imágenes médicas.
 """
 
+import threading
 import numpy as np
 import cv2
 from abc import ABC, abstractmethod
 
+from .instrumentation import span
+
 
 class ImagePreprocessor(ABC):
     """Clase abstracta para el preprocesamiento de imágenes."""
@@ -22,6 +25,17 @@ class ImagePreprocessor(ABC):
             numpy.ndarray: Imagen preprocesada.
         """
         pass
+    
+    def preprocess_into(self, out: np.ndarray, idx: int, image: np.ndarray) -> None:
+        """
+        Preprocesa una imagen y la escribe en una posición de un lote existente.
+        
+        Args:
+            out (numpy.ndarray): Lote preasignado de forma (N, alto, ancho, 1).
+            idx (int): Posición del lote donde escribir.
+            image (numpy.ndarray): Imagen a preprocesar.
+        """
+        out[idx] = self.preprocess(image)[0]
 
 
 class XRayPreprocessor(ImagePreprocessor):
@@ -35,18 +49,44 @@ class XRayPreprocessor(ImagePreprocessor):
             target_size (tuple): Tamaño objetivo de la imagen (altura, ancho).
         """
         self.target_size = target_size
+        self._local = threading.local()
     
-    def preprocess(self, image: np.ndarray) -> np.ndarray:
+    def __getstate__(self):
+        """Excluye los objetos CLAHE, que no se pueden serializar."""
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+    
+    def __setstate__(self, state):
+        """Restaura el estado creando un nuevo almacenamiento por hilo."""
+        self.__dict__.update(state)
+        self._local = threading.local()
+    
+    def _get_clahe(self):
         """
-        Preprocesa una imagen de rayos X.
+        Retorna el objeto CLAHE del hilo actual, creándolo una sola vez.
+        
+        Returns:
+            cv2.CLAHE: Objeto CLAHE configurado.
+        """
+        clahe = getattr(self._local, 'clahe', None)
+        if clahe is None:
+            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 4))
+            self._local.clahe = clahe
+        return clahe
+    
+    def enhance(self, image: np.ndarray) -> np.ndarray:
+        """
+        Redimensiona, convierte a escala de grises y aplica CLAHE.
         
         Args:
-            image (numpy.ndarray): Imagen a preprocesar.
+            image (numpy.ndarray): Imagen a procesar.
             
         Returns:
-            numpy.ndarray: Imagen preprocesada en formato batch.
+            numpy.ndarray: Imagen uint8 de un canal con el tamaño objetivo.
         """
-        # Redimensionar
+        # Redimensionar. Con imágenes de un canal (ver
+        # ImageReader.read_grayscale) no hace falta convertir a escala de grises
         image = cv2.resize(image, self.target_size)
         
         # Convertir a escala de grises
@@ -54,14 +94,47 @@ class XRayPreprocessor(ImagePreprocessor):
             image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
         # Aplicar CLAHE
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 4))
-        image = clahe.apply(image)
+        return self._get_clahe().apply(image)
+    
+    def empty_batch(self, batch_size: int) -> np.ndarray:
+        """
+        Reserva un lote float32 para llenarlo con preprocess_into.
         
-        # Normalizar
-        image = image / 255.0
+        Args:
+            batch_size (int): Número de imágenes del lote.
+            
+        Returns:
+            numpy.ndarray: Array sin inicializar de forma (N, alto, ancho, 1).
+        """
+        width, height = self.target_size  # cv2.resize recibe (ancho, alto)
+        return np.empty((batch_size, height, width, 1), dtype=np.float32)
+    
+    def preprocess_into(self, out: np.ndarray, idx: int, image: np.ndarray) -> None:
+        """
+        Preprocesa una imagen escribiendo el resultado directamente en un lote.
         
-        # Convertir a formato batch
-        image = np.expand_dims(image, axis=-1)
-        image = np.expand_dims(image, axis=0)
+        Evita crear arrays intermedios en float64 y la copia al armar el lote.
         
-        return image
\ No newline at end of file
+        Args:
+            out (numpy.ndarray): Lote float32 de forma (N, alto, ancho, 1).
+            idx (int): Posición del lote donde escribir.
+            image (numpy.ndarray): Imagen a preprocesar.
+        """
+        with span('preprocess'):
+            # Normalizar directamente sobre la vista del lote
+            np.multiply(self.enhance(image), np.float32(1 / 255.0),
+                        out=out[idx, :, :, 0], casting='unsafe')
+    
+    def preprocess(self, image: np.ndarray) -> np.ndarray:
+        """
+        Preprocesa una imagen de rayos X.
+        
+        Args:
+            image (numpy.ndarray): Imagen a preprocesar.
+            
+        Returns:
+            numpy.ndarray: Imagen preprocesada en formato batch (float32).
+        """
+        batch = self.empty_batch(1)
+        self.preprocess_into(batch, 0, image)
+        return batch
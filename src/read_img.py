@@ -3,11 +3,73 @@ Este módulo implementa la lectura de imágenes médicas en diferentes formatos.
 """
 
 from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
 import numpy as np
 import cv2
 from PIL import Image
 import pydicom
 
+from .instrumentation import span
+
+
+# Rango máximo de valores enteros que se normaliza con una tabla de búsqueda
+_MAX_LUT_SIZE = 2 ** 16
+
+
+def _apply_lut(img_array: np.ndarray, lut: np.ndarray, low: int,
+               rows_per_block: int = 256) -> np.ndarray:
+    """
+    Aplica una tabla de búsqueda indexada desde el valor mínimo.
+    
+    Se procesa por bloques de filas para que los índices temporales no
+    ocupen más que una fracción de la imagen.
+    
+    Args:
+        img_array (numpy.ndarray): Píxeles enteros.
+        lut (numpy.ndarray): Tabla uint8 con una entrada por valor.
+        low (int): Valor correspondiente a la primera entrada.
+        rows_per_block (int): Filas procesadas en cada bloque.
+    
+    Returns:
+        numpy.ndarray: Píxeles convertidos a uint8.
+    """
+    out = np.empty(img_array.shape, dtype=np.uint8)
+    for start in range(0, img_array.shape[0], rows_per_block):
+        block = img_array[start:start + rows_per_block]
+        np.take(lut, np.subtract(block, low, dtype=np.int64),
+                out=out[start:start + rows_per_block])
+    return out
+
+
+def _normalize(img_array: np.ndarray) -> np.ndarray:
+    """
+    Normaliza los píxeles a 0-255 según el mínimo y el máximo.
+    
+    Para enteros usa una tabla de búsqueda con el mismo cálculo que la
+    versión en float64, sin crear copias en punto flotante de la imagen.
+    
+    Args:
+        img_array (numpy.ndarray): Píxeles originales.
+    
+    Returns:
+        numpy.ndarray: Píxeles normalizados (uint8).
+    """
+    low, high = img_array.min(), img_array.max()
+    if high == low:
+        return img_array.astype(np.uint8)
+    
+    if img_array.dtype.kind in 'ui' and int(high) - int(low) < _MAX_LUT_SIZE:
+        values = np.arange(int(high) - int(low) + 1, dtype=np.float64)
+        lut = (values * 255.0 / (float(high) - float(low))).astype(np.uint8)
+        return _apply_lut(img_array, lut, int(low))
+    
+    # Valores en punto flotante o rangos muy amplios
+    scale = np.float32(255.0 / (float(high) - float(low)))
+    img_float = np.subtract(img_array, low, dtype=np.float32)
+    img_float *= scale
+    return img_float.astype(np.uint8)
+
 
 class ImageReader(ABC):
     """Clase abstracta para la lectura de imágenes."""
@@ -24,11 +86,114 @@ class ImageReader(ABC):
             tuple: (numpy.ndarray, PIL.Image)
         """
         pass
+    
+    def read_grayscale(self, path: str) -> np.ndarray:
+        """
+        Lee una imagen en un solo canal, sin la copia RGB ni la imagen PIL.
+        
+        Es la entrada que necesita el modelo. Las subclases pueden
+        sobrescribirlo para decodificar directamente en escala de grises.
+        
+        Args:
+            path (str): Ruta de la imagen a leer.
+            
+        Returns:
+            numpy.ndarray: Imagen en escala de grises (uint8).
+        """
+        img_array, _ = self.read(path)
+        if len(img_array.shape) > 2:
+            img_array = cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY)
+        return img_array
 
 
 class DicomReader(ImageReader):
     """Implementación para lectura de archivos DICOM."""
     
+    def __init__(self, apply_window: bool = False, max_size: Optional[int] = None):
+        """
+        Inicializa el lector DICOM.
+        
+        Args:
+            apply_window (bool): Usar la ventana VOI (WindowCenter/WindowWidth)
+                del archivo en lugar de la normalización mínimo-máximo.
+            max_size (int, optional): Submuestrear al leer para que el lado
+                mayor no supere este tamaño. Por defecto se conserva la imagen.
+        """
+        self.apply_window = apply_window
+        self.max_size = max_size
+    
+    def _window(self, img_array: np.ndarray, dcm) -> np.ndarray:
+        """
+        Aplica la ventana VOI lineal del estándar DICOM (PS3.3 C.11.2.1.2).
+        
+        Args:
+            img_array (numpy.ndarray): Píxeles enteros almacenados.
+            dcm: Dataset DICOM con WindowCenter y WindowWidth.
+            
+        Returns:
+            numpy.ndarray: Píxeles con la ventana aplicada (uint8).
+        """
+        center = dcm.WindowCenter
+        width = dcm.WindowWidth
+        # Puede haber varias ventanas; se usa la primera
+        center = float(center[0] if isinstance(center, pydicom.multival.MultiValue) else center)
+        width = float(width[0] if isinstance(width, pydicom.multival.MultiValue) else width)
+        slope = float(getattr(dcm, 'RescaleSlope', 1))
+        intercept = float(getattr(dcm, 'RescaleIntercept', 0))
+        
+        invert = getattr(dcm, 'PhotometricInterpretation', '') == 'MONOCHROME1'
+        
+        low, high = int(img_array.min()), int(img_array.max())
+        if high - low < _MAX_LUT_SIZE:
+            values = np.arange(low, high + 1, dtype=np.float64) * slope + intercept
+            lut = ((values - (center - 0.5)) / max(width - 1, 1) + 0.5) * 255.0
+            lut = np.clip(lut, 0, 255).astype(np.uint8)
+            if invert:
+                lut = 255 - lut
+            return _apply_lut(img_array, lut, low)
+        
+        # Rangos muy amplios (p. ej. 32 bits): calcular sobre los píxeles en
+        # float32, con la misma fórmula agrupada en una escala y un desplazamiento
+        scale = 255.0 / max(width - 1, 1)
+        img_float = img_array.astype(np.float32)
+        img_float *= np.float32(slope * scale)
+        img_float += np.float32((intercept - (center - 0.5)) * scale + 127.5)
+        np.clip(img_float, 0, 255, out=img_float)
+        out = img_float.astype(np.uint8)
+        if invert:
+            np.subtract(255, out, out=out)
+        return out
+    
+    def _read_normalized(self, path: str) -> np.ndarray:
+        """
+        Lee los píxeles de un archivo DICOM y los normaliza a uint8.
+        
+        Args:
+            path (str): Ruta del archivo DICOM.
+            
+        Returns:
+            numpy.ndarray: Píxeles normalizados a 0-255.
+        """
+        # Leer archivo DICOM
+        with span('dicom.dcmread'):
+            dcm = pydicom.dcmread(path)
+            img_array = dcm.pixel_array
+        
+        # Submuestrear antes de normalizar para reducir el trabajo posterior
+        if self.max_size:
+            step = -(-max(img_array.shape[:2]) // self.max_size)
+            if step > 1:
+                img_array = img_array[::step, ::step]
+        
+        # Normalizar la imagen
+        with span('dicom.normalize'):
+            if (self.apply_window and img_array.dtype.kind in 'ui'
+                    and 'WindowCenter' in dcm and 'WindowWidth' in dcm):
+                img_array = self._window(img_array, dcm)
+            elif img_array.dtype != np.uint8:
+                img_array = _normalize(img_array)
+            return np.ascontiguousarray(img_array)
+    
     def read(self, path: str) -> tuple:
         """
         Lee una imagen DICOM.
@@ -40,17 +205,7 @@ class DicomReader(ImageReader):
             tuple: (numpy.ndarray, PIL.Image)
         """
         try:
-            # Leer archivo DICOM
-            dcm = pydicom.dcmread(path)
-            img_array = dcm.pixel_array
-            
-            # Normalizar la imagen
-            if img_array.dtype != np.uint8:
-                img_array = img_array.astype(float)
-                if img_array.max() != img_array.min():
-                    img_array = ((img_array - img_array.min()) * 255.0 / 
-                               (img_array.max() - img_array.min()))
-                img_array = img_array.astype(np.uint8)
+            img_array = self._read_normalized(path)
             
             # Asegurar que la imagen esté en RGB para la visualización
             if len(img_array.shape) == 2:
@@ -66,6 +221,26 @@ class DicomReader(ImageReader):
         except Exception as e:
             print(f"Error al leer archivo DICOM: {str(e)}")
             raise
+    
+    def read_grayscale(self, path: str) -> np.ndarray:
+        """
+        Lee una imagen DICOM en un solo canal.
+        
+        Args:
+            path (str): Ruta del archivo DICOM.
+            
+        Returns:
+            numpy.ndarray: Imagen en escala de grises (uint8).
+        """
+        try:
+            img_array = self._read_normalized(path)
+            if len(img_array.shape) > 2:
+                img_array = cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY)
+            return img_array
+            
+        except Exception as e:
+            print(f"Error al leer archivo DICOM: {str(e)}")
+            raise
 
 
 class JpgReader(ImageReader):
@@ -88,13 +263,150 @@ class JpgReader(ImageReader):
         img_RGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         img2show = Image.fromarray(img_RGB)
         return img_RGB, img2show
+    
+    def read_grayscale(self, path: str) -> np.ndarray:
+        """
+        Lee una imagen JPG/JPEG decodificándola directamente en un canal.
+        
+        Args:
+            path (str): Ruta del archivo JPG.
+            
+        Returns:
+            numpy.ndarray: Imagen en escala de grises (uint8).
+        """
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            raise ValueError(f"No se pudo leer la imagen: {path}")
+        return img
+
+
+class HighBitDepthReader(ImageReader):
+    """Lectura de PNG/TIFF de 8 o 16 bits, normalizando al rango 0-255."""
+    
+    def _read_normalized(self, path: str) -> np.ndarray:
+        """
+        Lee la imagen conservando su profundidad y la normaliza a uint8.
+        
+        Args:
+            path (str): Ruta de la imagen.
+            
+        Returns:
+            numpy.ndarray: Imagen uint8 en BGR o escala de grises.
+            
+        Raises:
+            ValueError: Si la imagen no se puede leer.
+        """
+        img = cv2.imread(path, cv2.IMREAD_ANYDEPTH | cv2.IMREAD_ANYCOLOR)
+        if img is None:
+            raise ValueError(f"No se pudo leer la imagen: {path}")
+        if img.dtype != np.uint8:
+            img = _normalize(img)
+        return img
+    
+    def read(self, path: str) -> tuple:
+        """
+        Lee la imagen y la retorna en RGB.
+        
+        Args:
+            path (str): Ruta de la imagen.
+            
+        Returns:
+            tuple: (numpy.ndarray, PIL.Image)
+        """
+        img = self._read_normalized(path)
+        if len(img.shape) == 2:
+            img_RGB = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+        else:
+            img_RGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        img2show = Image.fromarray(img_RGB)
+        return img_RGB, img2show
+    
+    def read_grayscale(self, path: str) -> np.ndarray:
+        """
+        Lee la imagen en un solo canal.
+        
+        Args:
+            path (str): Ruta de la imagen.
+            
+        Returns:
+            numpy.ndarray: Imagen en escala de grises (uint8).
+        """
+        img = self._read_normalized(path)
+        if len(img.shape) > 2:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return img
 
 
 class ImageReaderFactory:
-    """Factory para crear el lector de imágenes apropiado."""
+    """
+    Registro de lectores de imágenes.
+    
+    Cada formato tiene una única instancia de lector que se reutiliza. El
+    formato se obtiene de la extensión o, para archivos, de su firma.
+    """
+    
+    # formato -> instancia del lector
+    _readers = {}
+    # extensión -> formato
+    _extensions = {}
+    # lista de (pares (desplazamiento, bytes), formato), en orden de registro
+    _signatures = []
+    
+    @classmethod
+    def register(cls, format_name: str, reader: ImageReader, extensions: tuple = (),
+                 signatures: tuple = ()) -> None:
+        """
+        Registra o reemplaza el lector de un formato.
+        
+        Args:
+            format_name (str): Nombre del formato (p. ej. 'tiff').
+            reader (ImageReader): Instancia del lector, compartida entre llamadas.
+            extensions (tuple): Extensiones asociadas, sin punto.
+            signatures (tuple): Firmas que identifican el formato al inicio del
+                archivo. Cada firma es un par (desplazamiento, bytes) o una
+                tupla de pares que deben coincidir todos. Las firmas se
+                comprueban en orden de registro.
+        """
+        cls._readers[format_name] = reader
+        for extension in extensions:
+            cls._extensions[extension.lower()] = format_name
+        cls._signatures = [entry for entry in cls._signatures if entry[1] != format_name]
+        for signature in signatures:
+            parts = (signature,) if isinstance(signature[0], int) else tuple(signature)
+            cls._signatures.append((parts, format_name))
     
-    @staticmethod
-    def get_reader(file_extension: str) -> ImageReader:
+    @classmethod
+    def supported_extensions(cls) -> tuple:
+        """
+        Retorna las extensiones registradas.
+        
+        Returns:
+            tuple: Extensiones sin punto, en minúsculas.
+        """
+        return tuple(cls._extensions)
+    
+    @classmethod
+    def sniff(cls, path: str) -> Optional[str]:
+        """
+        Identifica el formato de un archivo por su firma.
+        
+        Args:
+            path (str): Ruta del archivo.
+            
+        Returns:
+            str o None: Nombre del formato, o None si no se reconoce.
+        """
+        length = max((offset + len(magic) for parts, _ in cls._signatures
+                      for offset, magic in parts), default=0)
+        with open(path, 'rb') as f:
+            header = f.read(length)
+        for parts, format_name in cls._signatures:
+            if all(header[offset:offset + len(magic)] == magic for offset, magic in parts):
+                return format_name
+        return None
+    
+    @classmethod
+    def get_reader(cls, file_extension: str) -> ImageReader:
         """
         Retorna el lector apropiado según la extensión del archivo.
         
@@ -107,14 +419,40 @@ class ImageReaderFactory:
         Raises:
             ValueError: Si la extensión no está soportada.
         """
-        readers = {
-            'dcm': DicomReader(),
-            'jpg': JpgReader(),
-            'jpeg': JpgReader(),
-            'png': JpgReader()
-        }
-        
-        reader = readers.get(file_extension.lower())
-        if reader is None:
+        format_name = cls._extensions.get(file_extension.lower())
+        if format_name is None:
             raise ValueError(f"Formato de archivo no soportado: {file_extension}")
-        return reader
\ No newline at end of file
+        return cls._readers[format_name]
+    
+    @classmethod
+    def get_reader_for_file(cls, path: str) -> ImageReader:
+        """
+        Retorna el lector de un archivo según su firma o, si no se reconoce,
+        según su extensión. Así se leen también archivos mal nombrados.
+        
+        Args:
+            path (str): Ruta del archivo.
+            
+        Returns:
+            ImageReader: Instancia del lector apropiado.
+            
+        Raises:
+            ValueError: Si el formato no está soportado.
+        """
+        format_name = cls.sniff(path)
+        if format_name is not None:
+            return cls._readers[format_name]
+        return cls.get_reader(Path(path).suffix[1:])
+
+
+_jpg_reader = JpgReader()
+_high_bit_depth_reader = HighBitDepthReader()
+_PNG_MAGIC = b'\x89PNG\r\n\x1a\n'
+ImageReaderFactory.register('dicom', DicomReader(), ('dcm',), ((128, b'DICM'),))
+ImageReaderFactory.register('jpeg', _jpg_reader, ('jpg', 'jpeg'), ((0, b'\xff\xd8\xff'),))
+# La profundidad de bits de un PNG está en el byte 24, dentro del bloque IHDR
+ImageReaderFactory.register('png16', _high_bit_depth_reader, (),
+                            (((0, _PNG_MAGIC), (12, b'IHDR'), (24, b'\x10')),))
+ImageReaderFactory.register('png', _jpg_reader, ('png',), ((0, _PNG_MAGIC),))
+ImageReaderFactory.register('tiff', _high_bit_depth_reader, ('tif', 'tiff'),
+                            ((0, b'II*\x00'), (0, b'MM\x00*')))
@@ -0,0 +1,245 @@
+"""
+Este módulo genera los reportes en PDF a partir de los datos del resultado.
+
+La página se compone con Pillow a partir de la imagen original, el mapa de
+calor, la clase y las probabilidades, sin capturar la ventana. No necesita
+pantalla ni TensorFlow, por lo que los reportes de un historial se pueden
+generar en varios procesos.
+"""
+
+import multiprocessing
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from .heatmap import render_overlay
+from .read_img import ImageReaderFactory
+
+# Página A4 a 150 ppp
+PAGE_SIZE = (1240, 1754)
+RESOLUTION = 150
+# Tamaño (ancho, alto) de cada imagen en la página
+IMAGE_SIZE = (520, 520)
+JPEG_QUALITY = 85
+MARGIN = 100
+
+CLASS_NAMES = ("bacteriana", "normal", "viral")
+
+# (id de la fila, ruta del PDF o None, mensaje de error o None)
+ReportOutcome = Tuple[int, Optional[Path], Optional[str]]
+
+
+@lru_cache(maxsize=None)
+def _font(size: int) -> ImageFont.ImageFont:
+    """Retorna una fuente TrueType con acentos o, si no hay, la de Pillow."""
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size)
+        except TypeError:  # Pillow < 10.1
+            return ImageFont.load_default()
+
+
+def _fit_size(shape: tuple, box: Tuple[int, int]) -> Tuple[int, int]:
+    """Tamaño (ancho, alto) de una imagen ``shape`` reducida para caber en ``box``."""
+    scale = min(box[0] / shape[1], box[1] / shape[0], 1.0)
+    return max(1, round(shape[1] * scale)), max(1, round(shape[0] * scale))
+
+
+def _fit(image: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """Reduce una imagen para que quepa en ``size`` conservando la proporción."""
+    target = _fit_size(image.shape, size)
+    if target == (image.shape[1], image.shape[0]):
+        return image
+    return cv2.resize(image, target, interpolation=cv2.INTER_AREA)
+
+
+def build_report(result, original_image: Optional[np.ndarray] = None,
+                 heatmap: Optional[np.ndarray] = None, patient_id: Optional[str] = None,
+                 created_at: Optional[float] = None,
+                 model_version: Optional[str] = None) -> Image.Image:
+    """
+    Compone la página del reporte de un estudio.
+    
+    Los metadatos que no se pasan se toman del resultado cuando los tiene
+    (por ejemplo, un StoredResult del historial). Sin ``heatmap``, el mapa
+    de calor se renderiza a partir de ``result.cam`` sobre la imagen ya
+    reducida al tamaño de la página.
+    
+    Args:
+        result: DetectionResult o StoredResult con la clase y las probabilidades.
+        original_image (numpy.ndarray, optional): Imagen original del estudio.
+        heatmap (numpy.ndarray, optional): Imagen RGB con el mapa de calor.
+        patient_id (str, optional): Identificación del paciente.
+        created_at (float, optional): Momento del resultado (time.time()).
+        model_version (str, optional): Versión del modelo.
+    
+    Returns:
+        PIL.Image: Página RGB de tamaño PAGE_SIZE.
+    """
+    patient_id = patient_id if patient_id is not None else getattr(result, 'patient_id', None)
+    created_at = created_at if created_at is not None else getattr(result, 'created_at', None)
+    model_version = model_version if model_version is not None else \
+        getattr(result, 'model_version', None)
+    if original_image is not None:
+        original_image = _fit(original_image, IMAGE_SIZE)
+        cam = getattr(result, 'cam', None)
+        if heatmap is None and cam is not None:
+            heatmap = render_overlay(cam, original_image)
+    
+    page = Image.new("RGB", PAGE_SIZE, "white")
+    draw = ImageDraw.Draw(page)
+    title_font, text_font, small_font = _font(40), _font(28), _font(22)
+    
+    y = MARGIN
+    draw.text((MARGIN, y), "Reporte de apoyo al diagnóstico de neumonía",
+              fill="black", font=title_font)
+    y += 90
+    
+    date = datetime.fromtimestamp(created_at) if created_at is not None else datetime.now()
+    fields = [
+        ("Cédula del paciente", patient_id or "-"),
+        ("Fecha", date.strftime("%Y-%m-%d %H:%M")),
+        ("Archivo", Path(str(result.source)).name if result.source is not None else "-"),
+    ]
+    if result.error is not None:
+        fields.append(("Error", result.error))
+    else:
+        fields.append(("Resultado", result.label))
+        fields.append(("Probabilidad", f"{result.probability:.2f}%"))
+    if result.probabilities is not None:
+        fields.append(("Probabilidades", ", ".join(
+            f"{name} {100 * value:.1f}%"
+            for name, value in zip(CLASS_NAMES, result.probabilities))))
+    for name, value in fields:
+        draw.text((MARGIN, y), f"{name}:", fill="black", font=text_font)
+        draw.text((MARGIN + 330, y), str(value), fill="black", font=text_font)
+        y += 50
+    
+    # Imagen original y mapa de calor, una al lado de la otra
+    y += 40
+    slots = [("Imagen radiográfica", original_image), ("Imagen con heatmap", heatmap)]
+    for column, (caption, image) in enumerate(slots):
+        x = MARGIN + column * (IMAGE_SIZE[0] + 40)
+        draw.text((x, y), caption, fill="black", font=text_font)
+        draw.rectangle((x, y + 45, x + IMAGE_SIZE[0], y + 45 + IMAGE_SIZE[1]), outline="gray")
+        if image is None:
+            draw.text((x + 20, y + 65), "No disponible", fill="gray", font=text_font)
+            continue
+        picture = Image.fromarray(np.ascontiguousarray(_fit(image, IMAGE_SIZE))).convert("RGB")
+        offset = ((IMAGE_SIZE[0] - picture.width) // 2, (IMAGE_SIZE[1] - picture.height) // 2)
+        page.paste(picture, (x + offset[0], y + 45 + offset[1]))
+    
+    footer = "Herramienta de apoyo; no reemplaza el diagnóstico de un profesional."
+    if model_version:
+        footer += f"  Modelo: {model_version[:12]}"
+    draw.text((MARGIN, PAGE_SIZE[1] - MARGIN), footer, fill="gray", font=small_font)
+    return page
+
+
+def write_report(path: Union[str, Path], result, original_image: Optional[np.ndarray] = None,
+                 heatmap: Optional[np.ndarray] = None, **metadata) -> Path:
+    """
+    Genera el reporte de un estudio y lo guarda en PDF.
+    
+    La página se incrusta como JPEG, por lo que un reporte ocupa unos
+    cientos de KB.
+    
+    Args:
+        path: Archivo PDF de salida.
+        result: DetectionResult o StoredResult, ver build_report.
+        original_image (numpy.ndarray, optional): Imagen original del estudio.
+        heatmap (numpy.ndarray, optional): Imagen RGB con el mapa de calor.
+        **metadata: ``patient_id``, ``created_at`` o ``model_version``.
+    
+    Returns:
+        Path: Ruta del PDF.
+    """
+    path = Path(path)
+    page = build_report(result, original_image, heatmap, **metadata)
+    page.save(path, "PDF", resolution=RESOLUTION, quality=JPEG_QUALITY)
+    return path
+
+
+def report_from_row(row, output_dir: Union[str, Path]) -> ReportOutcome:
+    """
+    Genera el reporte de una fila del historial. Se ejecuta en un proceso de trabajo.
+    
+    La imagen original se lee de ``row.source``; el mapa de calor se
+    renderiza a partir del mapa Grad-CAM guardado, si lo hay.
+    
+    Args:
+        row (StoredResult): Fila del historial.
+        output_dir: Directorio de los reportes.
+    
+    Returns:
+        tuple: (id de la fila, ruta del PDF o None, mensaje de error o None).
+    """
+    try:
+        original = None
+        # Los estudios que fallaron al procesarse se reportan sin imagen
+        if row.error is None and row.source is not None and Path(row.source).is_file():
+            reader = ImageReaderFactory.get_reader_for_file(row.source)
+            original = reader.read(row.source)[0]
+        path = write_report(Path(output_dir) / f"reporte_{row.id}.pdf", row, original)
+        return row.id, path, None
+    except Exception as e:
+        return row.id, None, str(e)
+
+
+def generate_reports(rows: Iterable, output_dir: Union[str, Path], workers: int = 4,
+                     prefetch: int = 16,
+                     start_method: Optional[str] = None) -> List[ReportOutcome]:
+    """
+    Genera los reportes de varias filas del historial en varios procesos.
+    
+    Como máximo hay ``workers * prefetch`` reportes en vuelo, de modo que
+    se pueden recorrer consultas grandes sin cargarlas en memoria.
+    
+    Args:
+        rows: StoredResult, por ejemplo ``ResultStore.query()``.
+        output_dir: Directorio de los reportes; se crea si no existe.
+        workers (int): Número de procesos.
+        prefetch (int): Reportes en vuelo por proceso.
+        start_method (str, optional): Método de inicio de los procesos; por
+            defecto ``forkserver`` si está disponible, si no ``spawn``.
+    
+    Returns:
+        list: Por fila, (id, ruta del PDF o None, mensaje de error o None),
+        en el orden de entrada.
+    
+    Raises:
+        ValueError: Si workers no es positivo
+    """
+    if workers < 1:
+        raise ValueError(f"workers debe ser positivo: {workers}")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if start_method is None:
+        methods = multiprocessing.get_all_start_methods()
+        start_method = 'forkserver' if 'forkserver' in methods else 'spawn'
+    context = multiprocessing.get_context(start_method)
+    
+    rows = iter(rows)
+    in_flight = deque()
+    outcomes = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        for row in islice(rows, workers * prefetch):
+            in_flight.append(pool.submit(report_from_row, row, output_dir))
+        while in_flight:
+            outcome = in_flight.popleft().result()
+            if outcome[2] is not None:
+                print(f"Reporte {outcome[0]}: {outcome[2]}", file=sys.stderr)
+            outcomes.append(outcome)
+            for row in islice(rows, 1):
+                in_flight.append(pool.submit(report_from_row, row, output_dir))
+    return outcomes
@@ -0,0 +1,314 @@
+"""
+Este módulo implementa el historial de resultados en una base de datos SQLite.
+
+La base usa el modo WAL: las escrituras se agrupan en transacciones de
+varios resultados y las consultas se hacen con conexiones de solo lectura
+que no bloquean al escritor. La interfaz gráfica y el procesamiento por
+lotes pueden escribir en el mismo archivo.
+"""
+
+import io
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Union
+import numpy as np
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    patient_id TEXT,
+    created_at REAL NOT NULL,
+    source TEXT,
+    label TEXT,
+    probability REAL,
+    probabilities BLOB,
+    model_version TEXT,
+    error TEXT,
+    cam BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_results_patient ON results (patient_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_results_created ON results (created_at);
+"""
+
+_INSERT = """
+INSERT INTO results (patient_id, created_at, source, label, probability,
+                     probabilities, model_version, error, cam)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_COLUMNS = ("id, patient_id, created_at, source, label, probability, probabilities, "
+            "model_version, error, cam")
+
+
+@dataclass
+class StoredResult:
+    """Fila del historial de resultados."""
+    
+    id: int
+    patient_id: Optional[str]
+    # Segundos desde la época (time.time())
+    created_at: float
+    source: Optional[str]
+    label: Optional[str]
+    probability: Optional[float]
+    probabilities: Optional[np.ndarray]
+    model_version: Optional[str]
+    error: Optional[str]
+    # Mapa Grad-CAM de baja resolución, si se guardó
+    cam: Optional[np.ndarray] = None
+
+
+class ResultStore:
+    """Historial de resultados con escritura por lotes."""
+    
+    def __init__(self, path: Union[str, Path], batch_size: int = 500,
+                 flush_interval: float = 1.0):
+        """
+        Abre o crea la base de datos.
+        
+        Los resultados añadidos se guardan en memoria y se escriben en una
+        sola transacción al reunir ``batch_size`` filas, al llamar a
+        ``flush`` o ``close`` o, como tarde, ``flush_interval`` segundos
+        después de añadirlos: un temporizador escribe las filas pendientes
+        aunque no lleguen más.
+        
+        Args:
+            path: Archivo de la base de datos.
+            batch_size (int): Filas por transacción.
+            flush_interval (float): Segundos máximos que una fila espera en memoria.
+        
+        Raises:
+            ValueError: Si batch_size no es positivo
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size debe ser positivo: {batch_size}")
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._timer = None
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # En modo WAL, FULL sincroniza el registro en cada transacción
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(_SCHEMA)
+        # Bases creadas antes de guardar el mapa Grad-CAM
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(results)")}
+        if 'cam' not in columns:
+            self._conn.execute("ALTER TABLE results ADD COLUMN cam BLOB")
+    
+    def __enter__(self) -> 'ResultStore':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+    
+    def __len__(self) -> int:
+        return self.count()
+    
+    def add(self, result, patient_id: Optional[str] = None,
+            model_version: Optional[str] = None,
+            created_at: Optional[float] = None) -> None:
+        """
+        Añade un resultado al historial.
+        
+        Se guarda también su mapa Grad-CAM compacto (``result.cam``) si ya
+        está calculado, para poder generar el reporte sin el modelo.
+        
+        Args:
+            result (DetectionResult): Resultado del detector.
+            patient_id (str, optional): Identificación del paciente.
+            model_version (str, optional): Versión del modelo, por ejemplo
+                ``PneumoniaDetector.model_id``.
+            created_at (float, optional): Momento del resultado; por defecto, el actual.
+        """
+        self.add_many([result], patient_id, model_version, created_at)
+    
+    def add_many(self, results: Iterable, patient_id: Optional[str] = None,
+                 model_version: Optional[str] = None,
+                 created_at: Optional[float] = None) -> None:
+        """
+        Añade varios resultados con los mismos metadatos.
+        
+        Args:
+            results (iterable): DetectionResult a guardar.
+            patient_id (str, optional): Identificación del paciente.
+            model_version (str, optional): Versión del modelo.
+            created_at (float, optional): Momento de los resultados; por defecto, el actual.
+        """
+        created_at = time.time() if created_at is None else created_at
+        rows = []
+        for result in results:
+            probabilities = None
+            if result.probabilities is not None:
+                probabilities = np.asarray(result.probabilities, dtype='<f4').tobytes()
+            source = None if result.source is None else str(result.source)
+            probability = None if result.probability is None else float(result.probability)
+            cam = getattr(result, 'cam', None)
+            rows.append((patient_id, created_at, source, result.label, probability,
+                         probabilities, model_version, result.error,
+                         None if cam is None else _encode_array(cam)))
+        with self._lock:
+            self._buffer.extend(rows)
+            if (len(self._buffer) >= self.batch_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+            elif self._buffer and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+    
+    def flush(self) -> None:
+        """Escribe en disco los resultados pendientes."""
+        with self._lock:
+            self._flush_locked()
+    
+    def _flush_on_timer(self) -> None:
+        """Escribe las filas que esperan desde hace ``flush_interval`` segundos."""
+        with self._lock:
+            self._timer = None
+            if self._conn is not None:
+                self._flush_locked()
+    
+    def _flush_locked(self) -> None:
+        """Escribe el búfer en una transacción; requiere tener el lock."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._buffer:
+            with self._conn:
+                self._conn.executemany(_INSERT, self._buffer)
+            self._buffer.clear()
+        self._last_flush = time.monotonic()
+    
+    def close(self) -> None:
+        """Escribe los resultados pendientes y cierra la base de datos."""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush_locked()
+            self._conn.close()
+            self._conn = None
+    
+    def _where(self, patient_id: Optional[str], since: Optional[float],
+               until: Optional[float]) -> tuple:
+        """Construye la condición de una consulta y sus parámetros."""
+        conditions, params = [], []
+        if patient_id is not None:
+            conditions.append("patient_id = ?")
+            params.append(patient_id)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("created_at < ?")
+            params.append(until)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+    
+    def _reader(self) -> sqlite3.Connection:
+        """Abre una conexión de solo lectura tras escribir lo pendiente."""
+        self.flush()
+        return sqlite3.connect(f"file:{self.path.resolve()}?mode=ro", uri=True)
+    
+    def query(self, patient_id: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, limit: Optional[int] = None,
+              newest_first: bool = True) -> Iterator[StoredResult]:
+        """
+        Recorre el historial filtrado por paciente y rango de fechas.
+        
+        Las filas se leen a medida que se consumen, por lo que recorrer
+        millones de resultados no los carga todos en memoria.
+        
+        Args:
+            patient_id (str, optional): Solo los resultados de este paciente.
+            since (float, optional): Solo los creados en este momento o después.
+            until (float, optional): Solo los creados antes de este momento.
+            limit (int, optional): Número máximo de filas.
+            newest_first (bool): Ordenar del más reciente al más antiguo.
+        
+        Yields:
+            StoredResult: Cada fila del historial.
+        """
+        where, params = self._where(patient_id, since, until)
+        order = "DESC" if newest_first else "ASC"
+        sql = f"SELECT {_COLUMNS} FROM results{where} ORDER BY created_at {order}, id {order}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        
+        conn = self._reader()
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._to_result(row)
+        finally:
+            conn.close()
+    
+    def count(self, patient_id: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None) -> int:
+        """
+        Cuenta los resultados que cumplen los filtros de ``query``.
+        
+        Returns:
+            int: Número de filas.
+        """
+        where, params = self._where(patient_id, since, until)
+        conn = self._reader()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM results{where}", params).fetchone()[0]
+        finally:
+            conn.close()
+    
+    def latest(self, patient_id: str) -> Optional[StoredResult]:
+        """
+        Retorna el último resultado de un paciente.
+        
+        Args:
+            patient_id (str): Identificación del paciente.
+        
+        Returns:
+            StoredResult o None: Resultado más reciente, o None si no hay.
+        """
+        return next(self.query(patient_id, limit=1), None)
+    
+    @staticmethod
+    def _to_result(row: tuple) -> StoredResult:
+        """Convierte una fila de la consulta en un StoredResult."""
+        values = list(row)
+        if values[6] is not None:
+            values[6] = np.frombuffer(values[6], dtype='<f4')
+        if values[9] is not None:
+            values[9] = np.load(io.BytesIO(values[9]), allow_pickle=False)
+        return StoredResult(*values)
+
+
+def _encode_array(array: np.ndarray) -> bytes:
+    """Serializa un array con su forma y tipo en formato .npy."""
+    buffer = io.BytesIO()
+    np.save(buffer, np.ascontiguousarray(array), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def read_results(path: Union[str, Path], **filters) -> List[StoredResult]:
+    """
+    Lee el historial de un archivo sin mantenerlo abierto.
+    
+    Args:
+        path: Archivo de la base de datos.
+        **filters: Argumentos de ``ResultStore.query``.
+    
+    Returns:
+        list: Resultados encontrados.
+    """
+    with ResultStore(path) as store:
+        return list(store.query(**filters))
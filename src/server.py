@@ -0,0 +1,381 @@
+"""
+Servidor HTTP local de inferencia.
+
+Expone un PneumoniaDetector para que varias estaciones de trabajo compartan
+una sola copia del modelo. Las solicitudes concurrentes se agrupan en lotes
+con MicroBatcher. Solo escucha en la interfaz de loopback.
+
+Uso::
+    
+    python -m src.server --port 8765
+    curl --data-binary @estudio.dcm "http://127.0.0.1:8765/predict?heatmap=1"
+    curl --data-binary @estudio.dcm "http://127.0.0.1:8765/predict?heatmap=1&size=250x250"
+"""
+
+import argparse
+import base64
+import ipaddress
+import json
+import os
+import socket
+import sys
+import tempfile
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import cv2
+import numpy as np
+
+from . import instrumentation
+from .batching import MicroBatcher
+from .read_img import ImageReaderFactory
+
+
+# Tamaño máximo aceptado para un estudio subido
+MAX_UPLOAD_BYTES = 256 * 2**20
+
+
+def _check_loopback(host: str) -> int:
+    """
+    Verifica que todas las direcciones del host, IPv4 o IPv6, sean de loopback.
+    
+    Args:
+        host (str): Nombre o dirección de escucha, p. ej. 'localhost' o '::1'.
+    
+    Returns:
+        int: Familia de direcciones con la que escuchar; IPv4 si el host la tiene.
+    
+    Raises:
+        ValueError: Si la dirección no es local
+    """
+    infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+    if not infos or not all(ipaddress.ip_address(info[4][0]).is_loopback for info in infos):
+        raise ValueError(f"El servidor solo puede escuchar en localhost: {host}")
+    families = {info[0] for info in infos}
+    return socket.AF_INET if socket.AF_INET in families else socket.AF_INET6
+
+
+def decode_upload(data: bytes, filename: str = '') -> np.ndarray:
+    """
+    Decodifica un estudio recibido como bytes.
+    
+    El formato se identifica por la firma del archivo, como en
+    ``ImageReaderFactory.get_reader_for_file``; el nombre solo se usa si la
+    firma no se reconoce.
+    
+    Args:
+        data (bytes): Contenido del archivo DICOM/PNG/JPEG/TIFF.
+        filename (str): Nombre original del archivo, opcional.
+    
+    Returns:
+        numpy.ndarray: Imagen decodificada.
+    
+    Raises:
+        ValueError: Si el formato no está soportado
+    """
+    # Los lectores trabajan con rutas, así que se usa un archivo temporal
+    fd, path = tempfile.mkstemp(suffix=Path(filename).suffix)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        image_array, _ = ImageReaderFactory.get_reader_for_file(path).read(path)
+        return image_array
+    finally:
+        os.unlink(path)
+
+
+def encode_png(heatmap: np.ndarray) -> str:
+    """
+    Codifica un heatmap RGB o un mapa en escala de grises como PNG en base64.
+    
+    Args:
+        heatmap (numpy.ndarray): Imagen RGB uint8 o mapa (alto, ancho) uint8.
+    
+    Returns:
+        str: PNG codificado en base64.
+    """
+    if heatmap.ndim == 3:
+        heatmap = cv2.cvtColor(heatmap, cv2.COLOR_RGB2BGR)
+    ok, buffer = cv2.imencode('.png', heatmap)
+    if not ok:
+        raise ValueError("No se pudo codificar el heatmap")
+    return base64.b64encode(buffer.tobytes()).decode('ascii')
+
+
+def parse_size(value: str) -> Tuple[int, int]:
+    """
+    Interpreta un tamaño con el formato ``ANCHOxALTO``.
+    
+    Args:
+        value (str): Texto como ``250x250``.
+    
+    Returns:
+        tuple: (ancho, alto)
+    
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise ValueError(f"Tamaño no válido: {value}") from None
+    if width < 1 or height < 1:
+        raise ValueError(f"Tamaño no válido: {value}")
+    return width, height
+
+
+class InferenceServer(ThreadingHTTPServer):
+    """Servidor HTTP que comparte un detector entre todas las solicitudes."""
+    
+    daemon_threads = True
+    
+    def __init__(self, detector, host: str = '127.0.0.1', port: int = 8765,
+                 max_batch_size: int = 8, max_wait_ms: float = 5.0, quiet: bool = True):
+        """
+        Inicializa el servidor.
+        
+        Args:
+            detector (PneumoniaDetector): Detector que atiende las solicitudes.
+            host (str): Dirección de escucha; debe ser de loopback.
+            port (int): Puerto; 0 para elegir uno libre.
+            max_batch_size (int): Estudios máximos por llamada al modelo.
+            max_wait_ms (float): Espera máxima para completar un lote.
+            quiet (bool): No registrar cada solicitud en stderr.
+        
+        Raises:
+            ValueError: Si la dirección no es de loopback
+        """
+        self.address_family = _check_loopback(host)
+        self.detector = detector
+        self.quiet = quiet
+        super().__init__((host, port), InferenceHandler)
+        self.batcher = MicroBatcher(self._process_batch, max_batch_size=max_batch_size,
+                                    max_wait_ms=max_wait_ms)
+    
+    def _process_batch(self, items: list) -> list:
+        """
+        Ejecuta el modelo sobre un lote de estudios ya preprocesados.
+        
+        Args:
+            items (list): Tuplas (tensor, imagen original, identificador).
+        
+        Returns:
+            list: Un DetectionResult por estudio
+        """
+        tensors, originals, sources = zip(*items)
+        # Los heatmaps se calculan después, solo para las solicitudes que los piden
+        return self.detector.process_preprocessed(np.stack(tensors), list(originals),
+                                                  list(sources), heatmap=False)
+    
+    def predict(self, data: bytes, filename: str = '', cam: bool = False,
+                heatmap: bool = False, heatmap_size: Optional[Tuple[int, int]] = None):
+        """
+        Decodifica, preprocesa y encola un estudio, esperando su resultado.
+        
+        La decodificación y el preprocesamiento se hacen en el hilo de la
+        solicitud; solo la llamada al modelo se agrupa. Los mapas Grad-CAM se
+        calculan después, solo para las solicitudes que los piden.
+        
+        Args:
+            data (bytes): Contenido del archivo.
+            filename (str): Nombre original del archivo, opcional.
+            cam (bool): Calcular el mapa Grad-CAM de baja resolución.
+            heatmap (bool): Calcular también el heatmap superpuesto.
+            heatmap_size (tuple, optional): Tamaño (ancho, alto) del heatmap.
+                Por defecto, el de la imagen.
+        
+        Returns:
+            DetectionResult: Resultado del estudio
+        """
+        image_array = decode_upload(data, filename)
+        tensor = self.detector.preprocessor.preprocess(image_array)[0]
+        result = self.batcher.submit((tensor, image_array, filename)).result()
+        try:
+            if result.ok and heatmap:
+                result.heatmap = result.render_heatmap(image_array, heatmap_size)
+            elif result.ok and cam and result.deferred_heatmap is not None:
+                result.cam = result.deferred_heatmap.get_cam()
+        except Exception as e:
+            result.error = str(e)
+        return result
+    
+    def server_close(self) -> None:
+        """Cierra el socket y detiene el agrupador."""
+        super().server_close()
+        self.batcher.close()
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    """Atiende ``POST /predict`` y ``GET /health``."""
+    
+    server: InferenceServer
+    
+    def _send_json(self, status: HTTPStatus, payload: dict) -> None:
+        """Envía una respuesta JSON."""
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_GET(self) -> None:
+        """Responde al chequeo de estado y a las métricas de Prometheus."""
+        path = urlparse(self.path).path
+        if path == '/metrics':
+            self._send_metrics()
+            return
+        if path != '/health':
+            self._send_json(HTTPStatus.NOT_FOUND, {'error': 'Ruta no encontrada'})
+            return
+        batcher = self.server.batcher
+        self._send_json(HTTPStatus.OK, {'status': 'ok', 'batches': batcher.batches,
+                                        'studies': batcher.items})
+    
+    def _send_metrics(self) -> None:
+        """Envía las métricas por etapa en el formato de texto de Prometheus."""
+        recorder = instrumentation.get_recorder()
+        if recorder is None:
+            self._send_json(HTTPStatus.NOT_FOUND, {'error': 'Instrumentación desactivada'})
+            return
+        body = recorder.to_prometheus().encode('utf-8')
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_POST(self) -> None:
+        """
+        Procesa un estudio enviado como cuerpo de la solicitud.
+        
+        Parámetros de la consulta: ``heatmap=1`` para incluir el heatmap en
+        PNG (base64), ``size=ANCHOxALTO`` para renderizarlo a ese tamaño,
+        ``cam=1`` para incluir el mapa Grad-CAM de baja resolución en PNG
+        (escala de grises) y ``filename`` con el nombre original del archivo.
+        """
+        url = urlparse(self.path)
+        if url.path != '/predict':
+            self._send_json(HTTPStatus.NOT_FOUND, {'error': 'Ruta no encontrada'})
+            return
+        query = parse_qs(url.query)
+        
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0:
+            self._send_json(HTTPStatus.LENGTH_REQUIRED, {'error': 'Cuerpo vacío'})
+            return
+        if length > MAX_UPLOAD_BYTES:
+            self._send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                            {'error': 'Archivo demasiado grande'})
+            return
+        data = self.rfile.read(length)
+        
+        def flag(name: str) -> bool:
+            return query.get(name, ['0'])[0] not in ('0', '', 'false')
+        
+        try:
+            size = parse_size(query['size'][0]) if 'size' in query else None
+            result = self.server.predict(data, query.get('filename', [''])[0],
+                                         cam=flag('cam'), heatmap=flag('heatmap'),
+                                         heatmap_size=size)
+        except Exception as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, {'error': str(e)})
+            return
+        if not result.ok:
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': result.error})
+            return
+        
+        payload = {
+            'label': result.label,
+            'probability': result.probability,
+            'probabilities': {label: float(result.probabilities[idx])
+                              for idx, label in self.server.detector.LABELS.items()},
+        }
+        # El backend TFLite no calcula heatmaps
+        if flag('heatmap') and result.heatmap is not None:
+            payload['heatmap_png'] = encode_png(result.heatmap)
+        if flag('cam') and result.cam is not None:
+            payload['cam_png'] = encode_png(result.cam)
+        self._send_json(HTTPStatus.OK, payload)
+    
+    def log_message(self, format: str, *args) -> None:
+        """Registra la solicitud salvo que el servidor sea silencioso."""
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Construye el analizador de argumentos del servidor.
+    
+    Returns:
+        argparse.ArgumentParser: Analizador configurado.
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m src.server',
+        description='Servidor local de inferencia del detector de neumonía.'
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='Dirección de loopback.')
+    parser.add_argument('--port', type=int, default=8765, help='Puerto de escucha.')
+    parser.add_argument('--model', default='conv_MLP_84.h5', help='Archivo del modelo.')
+    parser.add_argument('--max-batch-size', type=int, default=8,
+                        help='Estudios máximos por llamada al modelo.')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help='Espera máxima para completar un lote, en milisegundos.')
+    parser.add_argument('--cache-dir', type=Path,
+                        help='Directorio de la caché de resultados en disco.')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Registrar cada solicitud en stderr.')
+    parser.add_argument('--metrics', action='store_true',
+                        help='Medir cada etapa y publicar las métricas en GET /metrics.')
+    parser.add_argument('--trace', type=Path,
+                        help='Archivo JSONL con la duración de cada etapa.')
+    return parser
+
+
+def main(argv=None) -> int:
+    """
+    Inicia el servidor hasta que se interrumpa con Ctrl+C.
+    
+    Args:
+        argv (list, optional): Argumentos; por defecto los del proceso.
+    
+    Returns:
+        int: Código de salida.
+    """
+    args = build_parser().parse_args(argv)
+    
+    from .cache import ResultCache
+    from .integrator import PneumoniaDetector
+    cache = ResultCache(directory=args.cache_dir) if args.cache_dir else None
+    # Sin opciones se usan las variables de entorno NEUMONIA_TRACE/NEUMONIA_METRICS
+    if args.metrics or args.trace:
+        instrumentation.enable(args.trace)
+    else:
+        instrumentation.configure_from_env()
+    detector = PneumoniaDetector(args.model, cache=cache)
+    detector.warm_up()
+    
+    try:
+        server = InferenceServer(detector, args.host, args.port,
+                                 max_batch_size=args.max_batch_size,
+                                 max_wait_ms=args.max_wait_ms, quiet=not args.verbose)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    
+    print(f"Escuchando en http://{args.host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        instrumentation.disable()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
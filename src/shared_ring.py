@@ -0,0 +1,136 @@
+"""
+Este módulo implementa un anillo de posiciones en memoria compartida.
+
+Los procesos de lectura escriben el tensor preprocesado y, opcionalmente, la
+imagen original reducida directamente en una posición del anillo; por la
+cola solo viaja el índice de la posición. El proceso del modelo lee los tensores como vistas,
+sin copiarlos ni deserializarlos.
+"""
+
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+import cv2
+import numpy as np
+
+
+class SharedRing:
+    """Posiciones de tensores e imágenes originales en un bloque de memoria compartida."""
+    
+    def __init__(self, n_slots: int, tensor_shape: Tuple[int, ...],
+                 original_size: Optional[Tuple[int, int]] = (1024, 1024), channels: int = 3,
+                 name: Optional[str] = None):
+        """
+        Crea el anillo o se conecta a uno existente.
+        
+        Args:
+            n_slots (int): Número de posiciones.
+            tensor_shape (tuple): Forma del tensor preprocesado de una imagen,
+                por ejemplo (512, 512, 1).
+            original_size (tuple, optional): Tamaño máximo (ancho, alto) de la
+                imagen original guardada; las más grandes se reducen. Con None
+                el anillo solo guarda tensores.
+            channels (int): Canales de la imagen original (1 o 3).
+            name (str, optional): Nombre del bloque al que conectarse. Si
+                falta, se crea uno nuevo y este objeto es su dueño.
+        
+        Raises:
+            ValueError: Si n_slots no es positivo
+        """
+        if n_slots < 1:
+            raise ValueError(f"n_slots debe ser positivo: {n_slots}")
+        self.n_slots = n_slots
+        self.tensor_shape = tuple(tensor_shape)
+        self.original_size = tuple(original_size) if original_size is not None else None
+        self.channels = channels
+        
+        tensor_bytes = n_slots * int(np.prod(self.tensor_shape)) * 4
+        self._original_items = 0 if original_size is None else \
+            original_size[0] * original_size[1] * channels
+        size = tensor_bytes + n_slots * self._original_items
+        self.owner = name is None
+        self._shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        
+        self.tensors = np.ndarray((n_slots,) + self.tensor_shape, dtype=np.float32,
+                                  buffer=self._shm.buf)
+        self._originals = np.ndarray((n_slots, self._original_items), dtype=np.uint8,
+                                     buffer=self._shm.buf, offset=tensor_bytes)
+    
+    @property
+    def spec(self) -> dict:
+        """Argumentos para conectarse al anillo desde otro proceso."""
+        return {'n_slots': self.n_slots, 'tensor_shape': self.tensor_shape,
+                'original_size': self.original_size, 'channels': self.channels,
+                'name': self._shm.name}
+    
+    def original_shape(self, shape: Tuple[int, ...]) -> Tuple[int, ...]:
+        """
+        Calcula la forma con la que se guarda una imagen original.
+        
+        Args:
+            shape (tuple): Forma (alto, ancho[, canales]) de la imagen.
+        
+        Returns:
+            tuple: Forma reducida para caber en ``original_size``.
+        """
+        height, width = shape[:2]
+        scale = min(self.original_size[0] / width, self.original_size[1] / height, 1.0)
+        reduced = (max(1, int(height * scale)), max(1, int(width * scale)))
+        return reduced + tuple(shape[2:])
+    
+    def original(self, slot: int, shape: Tuple[int, ...]) -> np.ndarray:
+        """
+        Retorna la imagen original de una posición como vista.
+        
+        Args:
+            slot (int): Índice de la posición.
+            shape (tuple): Forma guardada, ver ``write_original``.
+        
+        Returns:
+            numpy.ndarray: Vista uint8 de la memoria compartida.
+        """
+        return self._originals[slot, :int(np.prod(shape))].reshape(shape)
+    
+    def write_original(self, slot: int, image: np.ndarray) -> Tuple[int, ...]:
+        """
+        Guarda una imagen original, reduciéndola directamente en la posición.
+        
+        Args:
+            slot (int): Índice de la posición.
+            image (numpy.ndarray): Imagen uint8 (alto, ancho[, canales]).
+        
+        Returns:
+            tuple: Forma guardada, que se envía junto con el índice.
+        
+        Raises:
+            ValueError: Si la imagen tiene más canales que el anillo o el
+                anillo no guarda imágenes originales
+        """
+        if self.original_size is None:
+            raise ValueError("El anillo no guarda imágenes originales")
+        if image.ndim == 3 and image.shape[2] > self.channels:
+            raise ValueError(f"La imagen tiene {image.shape[2]} canales; "
+                             f"el anillo admite {self.channels}")
+        shape = self.original_shape(image.shape)
+        target = self.original(slot, shape)
+        if shape == image.shape:
+            np.copyto(target, image, casting='unsafe')
+        else:
+            cv2.resize(image, (shape[1], shape[0]), dst=target, interpolation=cv2.INTER_AREA)
+        return shape
+    
+    def close(self) -> None:
+        """
+        Libera las vistas y desconecta el bloque; el dueño además lo elimina.
+        
+        Las vistas retornadas antes dejan de ser válidas. Si alguna sigue en
+        uso, el bloque se elimina igualmente y se desconecta al liberarla.
+        """
+        self.tensors = self._originals = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass
+        finally:
+            if self.owner:
+                self._shm.unlink()
+                self.owner = False
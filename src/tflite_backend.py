@@ -0,0 +1,122 @@
+"""
+Backend de inferencia con TensorFlow Lite.
+
+Exporta el modelo de Keras a un archivo ``.tflite``, opcionalmente
+cuantizado, y lo ejecuta con el intérprete de TFLite. Si está instalado el
+paquete ``tflite_runtime`` no se importa TensorFlow, lo que reduce el
+tiempo de arranque y la memoria de los procesos que solo clasifican.
+
+El backend TFLite solo calcula las probabilidades: Grad-CAM necesita los
+gradientes del modelo de Keras, por lo que los resultados no traen heatmap.
+"""
+
+import threading
+from pathlib import Path
+from typing import Iterable, Optional, Union
+import numpy as np
+
+# Cuantizaciones soportadas por export_tflite
+QUANTIZATIONS = (None, 'float16', 'int8')
+
+
+def _interpreter_class():
+    """
+    Retorna la clase del intérprete, prefiriendo ``tflite_runtime``.
+    
+    Returns:
+        type: Clase Interpreter de tflite_runtime o de TensorFlow.
+    """
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+def export_tflite(model, output_path: Union[str, Path], quantization: Optional[str] = None,
+                  representative_data: Optional[Iterable[np.ndarray]] = None) -> Path:
+    """
+    Convierte un modelo de Keras a TFLite.
+    
+    Args:
+        model (tf.keras.Model): Modelo cargado, por ejemplo con ModelLoader.
+        output_path: Archivo ``.tflite`` de destino.
+        quantization (str, optional): None (float32), 'float16' (pesos en
+            float16) o 'int8' (pesos y activaciones en int8; la entrada y la
+            salida siguen siendo float32).
+        representative_data: Tensores preprocesados de forma (alto, ancho, 1)
+            usados para calibrar la cuantización int8.
+    
+    Returns:
+        Path: Ruta del archivo generado.
+    
+    Raises:
+        ValueError: Si la cuantización no es válida o falta la calibración int8
+    """
+    import tensorflow as tf
+    
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Cuantización no soportada: {quantization}")
+    if quantization == 'int8' and representative_data is None:
+        raise ValueError("La cuantización int8 requiere datos de calibración")
+    
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        samples = [np.asarray(tensor, dtype=np.float32) for tensor in representative_data]
+        converter.representative_dataset = lambda: ([sample[np.newaxis]] for sample in samples)
+    
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_bytes(converter.convert())
+    return output_path
+
+
+class TFLiteModel:
+    """Modelo TFLite con la interfaz de predicción por lotes."""
+    
+    def __init__(self, path: Union[str, Path], num_threads: Optional[int] = None):
+        """
+        Carga el archivo ``.tflite``.
+        
+        Args:
+            path: Ruta del archivo.
+            num_threads (int, optional): Hilos del intérprete.
+        """
+        self.path = Path(path)
+        self._interpreter = _interpreter_class()(model_path=str(self.path),
+                                                 num_threads=num_threads)
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = None
+        # El intérprete no admite llamadas concurrentes
+        self._lock = threading.Lock()
+    
+    @property
+    def input_shape(self) -> tuple:
+        """Forma de una imagen de entrada (alto, ancho, canales)."""
+        return tuple(int(dim) for dim in self._input['shape'][1:])
+    
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Calcula las probabilidades de un lote.
+        
+        Args:
+            batch (numpy.ndarray): Tensor float32 de forma (N, alto, ancho, 1).
+        
+        Returns:
+            numpy.ndarray: Probabilidades de forma (N, clases).
+        """
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input['index'], batch.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self._interpreter.set_tensor(self._input['index'], batch)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output['index']).copy()
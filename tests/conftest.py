@@ -6,8 +6,25 @@ import os
 import sys
 from pathlib import Path
 
+import pytest
+
 # Obtener el directorio raíz del proyecto
 ROOT_DIR = Path(__file__).parent.parent
 
 # Añadir el directorio raíz al path de Python
-sys.path.insert(0, str(ROOT_DIR))
\ No newline at end of file
+sys.path.insert(0, str(ROOT_DIR))
+
+from benchmarks.common import build_stand_in_model  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def stand_in_model():
+    """Fixture con un modelo sustituto que contiene la capa ``conv10_thisone``."""
+    return build_stand_in_model()
+
+
+@pytest.fixture(scope="session")
+def detector(stand_in_model):
+    """Fixture con un detector que usa el modelo sustituto."""
+    from src.integrator import PneumoniaDetector
+    return PneumoniaDetector(model=stand_in_model)
@@ -0,0 +1,87 @@
+"""
+Tests para el detector asíncrono.
+"""
+
+import asyncio
+import numpy as np
+import pytest
+from src.async_detector import AsyncPneumoniaDetector
+
+
+@pytest.fixture
+def images():
+    """Fixture que genera imágenes RGB aleatorias."""
+    rng = np.random.default_rng(1)
+    return [rng.integers(0, 256, (128, 96, 3), dtype=np.uint8) for _ in range(6)]
+
+
+def test_concurrent_awaits_are_batched(detector, images):
+    """Prueba que las esperas concurrentes compartan llamadas al modelo."""
+    async_detector = AsyncPneumoniaDetector(detector, max_batch_size=8, max_wait_ms=50)
+    
+    results = asyncio.run(async_detector.predict_many(images + ["no_existe.dcm"]))
+    async_detector.close()
+    
+    assert [result.ok for result in results] == [True] * 6 + [False]
+    assert [result.source for result in results[:6]] == list(range(6))
+    for image, result in zip(images, results):
+        label, probability, _ = detector.process_image(image)
+        assert result.label == label
+        assert result.probability == pytest.approx(probability, rel=1e-5)
+    assert async_detector.batcher.items == 6
+    assert async_detector.batcher.batches < 6
+
+
+def test_timeout_is_reported(detector, images):
+    """Prueba que un estudio que no termina a tiempo lance TimeoutError."""
+    async_detector = AsyncPneumoniaDetector(detector, timeout=0)
+    
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(async_detector.predict(images[0]))
+    results = asyncio.run(async_detector.predict_many(images[:2]))
+    async_detector.close()
+    
+    assert all("Tiempo de espera" in result.error for result in results)
+
+
+def test_timeout_includes_queue_time(detector, images):
+    """Prueba que el tiempo esperando turno cuente para el timeout."""
+    async_detector = AsyncPneumoniaDetector(detector, max_concurrency=1)
+    
+    async def predict(image_input, source):
+        await asyncio.sleep(0.5 if source == "lento" else 0)
+        return source
+    
+    async_detector._predict = predict
+    
+    async def run():
+        slow = asyncio.ensure_future(async_detector.predict(images[0], "lento"))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await async_detector.predict(images[1], "rápido", timeout=0.1)
+        return await slow
+    
+    assert asyncio.run(run()) == "lento"
+    async_detector.close()
+
+
+def test_concurrency_is_bounded(detector, images):
+    """Prueba que no haya más estudios en curso que max_concurrency."""
+    async_detector = AsyncPneumoniaDetector(detector, max_concurrency=2)
+    in_flight = []
+    prepare = async_detector._prepare
+    
+    def counting_prepare(image_input):
+        in_flight.append(2 - async_detector._semaphore._value)
+        return prepare(image_input)
+    
+    async_detector._prepare = counting_prepare
+    
+    async def run():
+        async with async_detector:
+            return await async_detector.predict_many(images)
+    
+    results = asyncio.run(run())
+    
+    assert all(result.ok for result in results)
+    assert max(in_flight) <= 2
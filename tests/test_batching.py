@@ -0,0 +1,54 @@
+"""
+Tests para el agrupador de solicitudes.
+"""
+
+import threading
+import time
+import pytest
+from src.batching import MicroBatcher
+
+
+def test_concurrent_submissions_are_batched():
+    """Prueba que las solicitudes simultáneas se procesen en un solo lote."""
+    batches = []
+    release = threading.Event()
+    
+    def process(items):
+        release.wait()
+        batches.append(list(items))
+        return [item * 2 for item in items]
+    
+    batcher = MicroBatcher(process, max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(i) for i in range(4)]
+    release.set()
+    
+    assert [future.result(timeout=5) for future in futures] == [0, 2, 4, 6]
+    assert batches == [[0, 1, 2, 3]]
+    batcher.close()
+
+
+def test_batch_is_limited_by_size_and_wait():
+    """Prueba que un lote no supere max_batch_size ni espere de más."""
+    batcher = MicroBatcher(lambda items: list(items), max_batch_size=2, max_wait_ms=1)
+    futures = [batcher.submit(i) for i in range(5)]
+    assert [future.result(timeout=5) for future in futures] == list(range(5))
+    assert batcher.batches >= 3
+    
+    start = time.monotonic()
+    assert batcher.submit("solo").result(timeout=5) == "solo"
+    assert time.monotonic() - start < 1
+    batcher.close()
+
+
+def test_errors_are_propagated_to_every_future():
+    """Prueba que un error del lote llegue a todas sus solicitudes."""
+    def fail(items):
+        raise RuntimeError("fallo del modelo")
+    
+    batcher = MicroBatcher(fail, max_batch_size=2, max_wait_ms=1)
+    future = batcher.submit(1)
+    with pytest.raises(RuntimeError, match="fallo del modelo"):
+        future.result(timeout=5)
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit(2)
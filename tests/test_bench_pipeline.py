@@ -0,0 +1,42 @@
+"""
+Tests para la suite de benchmarks de la cadena de procesamiento.
+"""
+
+import json
+from benchmarks.bench_pipeline import compare, main, run_suite
+
+
+def test_run_suite_covers_every_stage(tmp_path, stand_in_model):
+    """Prueba que la suite mida todas las etapas con cada tamaño y profundidad."""
+    results = run_suite(tmp_path, sizes=(256,), bits=(8, 16), batch_sizes=(2,), repeat=2,
+                        model=stand_in_model)
+    
+    names = [result["name"] for result in results]
+    assert names == ["read.dicom.256.8bit", "read.dicom.256.16bit", "read.jpg.256",
+                     "preprocess.256", "grad_cam.generate_heatmap.256", "predict.batch2",
+                     "grad_cam.explain.batch2"]
+    assert all(result["rounds"] == 2 and result["median_ms"] > 0 for result in results)
+
+
+def test_compare_flags_regressions():
+    """Prueba que solo se marquen los casos más lentos que el umbral."""
+    baseline = [{"name": "a", "median_ms": 10.0}, {"name": "b", "median_ms": 10.0}]
+    current = [{"name": "a", "median_ms": 10.5}, {"name": "b", "median_ms": 12.0},
+               {"name": "c", "median_ms": 1.0}]
+    
+    rows = compare(current, baseline, threshold=0.1)
+    
+    assert [(row["name"], row["regression"]) for row in rows] == [("a", False), ("b", True)]
+
+
+def test_main_writes_json(tmp_path):
+    """Prueba que los resultados se guarden en JSON con el entorno."""
+    output = tmp_path / "bench.json"
+    
+    assert main(["--sizes", "128", "--bits", "8", "--filter", "read.", "--repeat", "1",
+                 "--output", str(output)]) == 0
+    
+    data = json.loads(output.read_text())
+    assert {"commit", "numpy", "tensorflow"} <= set(data["environment"])
+    assert [result["name"] for result in data["results"]] == ["read.dicom.128.8bit",
+                                                              "read.jpg.128"]
@@ -0,0 +1,80 @@
+"""
+Tests para la caché de resultados.
+"""
+
+import numpy as np
+import pytest
+from src.cache import ResultCache, hash_image
+from src.integrator import DetectionResult, PneumoniaDetector
+from src.load_model import ModelLoader
+
+
+def make_result(label="normal", size=10):
+    """Crea un resultado con un mapa Grad-CAM de tamaño conocido."""
+    return DetectionResult(source="x", label=label, probability=90.0,
+                           probabilities=np.array([0.05, 0.9, 0.05], dtype=np.float32),
+                           cam=np.zeros((size, size), dtype=np.uint8))
+
+
+def test_cache_evicts_least_recently_used():
+    """Prueba que se descarte la entrada usada hace más tiempo."""
+    cache = ResultCache(max_entries=2)
+    cache.put("a", make_result("a"))
+    cache.put("b", make_result("b"))
+    cache.get("a")
+    cache.put("c", make_result("c"))
+    
+    assert cache.get("b") is None
+    assert cache.get("a").label == "a"
+    assert cache.get("c").label == "c"
+
+
+def test_cache_respects_max_bytes():
+    """Prueba que la memoria ocupada no supere el límite."""
+    cache = ResultCache(max_entries=100, max_bytes=1000)
+    for key in "abcd":
+        cache.put(key, make_result(size=17))  # 289 bytes de mapa y 12 de probabilidades
+    
+    assert len(cache) == 3
+
+
+def test_cache_persists_to_disk(tmp_path):
+    """Prueba que el nivel en disco sobreviva a una nueva instancia."""
+    ResultCache(directory=tmp_path).put("clave", make_result())
+    
+    result = ResultCache(directory=tmp_path).get("clave", source="estudio.dcm")
+    
+    assert result.source == "estudio.dcm"
+    assert result.label == "normal"
+    assert result.cam.shape == (10, 10)
+    assert result.heatmap is None
+
+
+def test_detector_reuses_cached_results(stand_in_model):
+    """Prueba que una imagen repetida no vuelva a ejecutar el modelo."""
+    cache = ResultCache()
+    detector = PneumoniaDetector(model=stand_in_model, cache=cache)
+    image = np.random.randint(0, 256, (100, 100, 3), dtype=np.uint8)
+    
+    first = detector.process_image(image)
+    results = detector.process_batch([image, image.copy()])
+    
+    assert cache.hits == 2
+    assert all(result.label == first[0] for result in results)
+
+
+def test_model_fingerprint_changes_with_model_file(tmp_path, monkeypatch):
+    """Prueba que modificar el archivo del modelo cambie su identidad."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "models").mkdir()
+    model_file = tmp_path / "models" / "modelo.h5"
+    model_file.write_bytes(b"version 1")
+    loader = ModelLoader()
+    image = np.zeros((4, 4), dtype=np.uint8)
+    
+    first = loader.get_fingerprint("modelo.h5")
+    model_file.write_bytes(b"version 2 con otro contenido")
+    second = loader.get_fingerprint("modelo.h5")
+    
+    assert first != second
+    assert hash_image(image, first) != hash_image(image, second)
@@ -0,0 +1,102 @@
+"""
+Tests para la línea de comandos sin interfaz gráfica.
+"""
+
+import csv
+import json
+
+import cv2
+import numpy as np
+import pytest
+from src.cli import ResultWriter, iter_studies, main, score_directory
+from src.dataset import prepare_dataset
+from src.results_store import ResultStore
+
+
+@pytest.fixture
+def study_dir(tmp_path):
+    """Fixture que crea un directorio con imágenes y un archivo no soportado."""
+    rng = np.random.default_rng(0)
+    (tmp_path / "sub").mkdir()
+    for name in ["a.png", "b.jpg", "sub/c.png"]:
+        cv2.imwrite(str(tmp_path / name), rng.integers(0, 256, (64, 64, 3), dtype=np.uint8))
+    (tmp_path / "notas.txt").write_text("no es una imagen")
+    (tmp_path / "roto.png").write_bytes(b"no es un png")
+    return tmp_path
+
+
+def test_iter_studies_filters_supported_files(study_dir):
+    """Prueba que solo se recorran las extensiones soportadas."""
+    names = [path.name for path in iter_studies(study_dir)]
+    
+    assert names == ["a.png", "b.jpg", "roto.png", "c.png"]
+
+
+def test_score_directory_writes_csv(detector, study_dir, tmp_path_factory):
+    """Prueba que se escriba una fila por estudio, incluyendo errores."""
+    output = tmp_path_factory.mktemp("out") / "resultados.csv"
+    
+    processed = score_directory(detector, study_dir, output, workers=2, batch_size=2)
+    
+    with open(output, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert processed == 4
+    assert len(rows) == 4
+    errors = [row for row in rows if row['error']]
+    assert [row['path'].endswith('roto.png') for row in errors] == [True]
+
+
+def test_score_directory_resumes_from_output(detector, study_dir, tmp_path_factory):
+    """Prueba que al reanudar solo se reintenten los estudios pendientes."""
+    output = tmp_path_factory.mktemp("out") / "resultados.jsonl"
+    score_directory(detector, study_dir, output, batch_size=3)
+    
+    processed = score_directory(detector, study_dir, output, batch_size=3)
+    
+    with open(output) as f:
+        rows = [json.loads(line) for line in f]
+    assert processed == 1  # solo se reintenta el archivo con error
+    assert len(rows) == 5
+    assert len(ResultWriter.completed(output)) == 3
+
+
+def test_score_directory_writes_store(detector, study_dir, tmp_path_factory):
+    """Prueba que los resultados se añadan también al historial."""
+    out = tmp_path_factory.mktemp("out")
+    
+    with ResultStore(out / "historial.db") as store:
+        score_directory(detector, study_dir, out / "resultados.csv", batch_size=2, store=store)
+        rows = list(store.query())
+    
+    assert len(rows) == 4
+    assert {row.model_version for row in rows} == {detector.model_id}
+    assert sum(row.error is not None for row in rows) == 1
+
+
+def test_report_command_writes_pdfs(detector, study_dir, tmp_path_factory):
+    """Prueba que el comando report genere un PDF por fila del historial."""
+    out = tmp_path_factory.mktemp("out")
+    with ResultStore(out / "historial.db") as store:
+        score_directory(detector, study_dir, out / "resultados.csv", store=store,
+                        store_cam=True)
+        assert sum(row.cam is not None for row in store.query()) == 3
+    
+    status = main(["report", str(out / "historial.db"), "--output-dir", str(out / "pdf"),
+                   "--workers", "1"])
+    
+    assert status == 0
+    assert len(list((out / "pdf").glob("*.pdf"))) == 4
+
+
+def test_score_directory_reads_prepared_dataset(detector, study_dir, tmp_path_factory):
+    """Prueba que un conjunto preparado se evalúe sin volver a leer las imágenes."""
+    out = tmp_path_factory.mktemp("out")
+    prepare_dataset(iter_studies(study_dir), out / "preparado", root=study_dir, workers=1)
+    
+    processed = score_directory(detector, out / "preparado", out / "resultados.csv")
+    
+    with open(out / "resultados.csv", newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert processed == 3
+    assert sorted(row['path'] for row in rows) == \
+        sorted(str(path) for path in iter_studies(study_dir) if path.name != "roto.png")
@@ -0,0 +1,90 @@
+"""
+Tests para el formato de estudios preprocesados.
+"""
+
+import cv2
+import numpy as np
+import pytest
+from src.dataset import PreparedDataset, prepare_dataset
+from src.preprocess_img import XRayPreprocessor
+
+
+@pytest.fixture
+def study_dir(tmp_path):
+    """Fixture con imágenes PNG válidas y una dañada."""
+    rng = np.random.default_rng(0)
+    root = tmp_path / "estudios"
+    root.mkdir()
+    for i in range(5):
+        cv2.imwrite(str(root / f"{i}.png"), rng.integers(0, 256, (60, 80, 3), dtype=np.uint8))
+    (root / "roto.png").write_bytes(b"no es un png")
+    return root
+
+
+def test_prepare_writes_shards_and_index(study_dir, tmp_path):
+    """Prueba que el conjunto normalice al cargar igual que el preprocesador."""
+    paths = sorted(study_dir.iterdir())
+    
+    added = prepare_dataset(paths, tmp_path / "preparado", root=study_dir, shard_size=2,
+                            workers=2)
+    dataset = PreparedDataset(tmp_path / "preparado")
+    
+    assert added == 5
+    assert sorted(path.name for path in (tmp_path / "preparado").glob("shard_*.npy")) == \
+        ["shard_00000.npy", "shard_00001.npy", "shard_00002.npy"]
+    assert [entry.study_id for entry in dataset.entries] == [f"{i}.png" for i in range(5)]
+    preprocessor = XRayPreprocessor()
+    tensors = np.concatenate([batch.copy() for batch, _ in dataset.batches(batch_size=3)])
+    for entry, tensor in zip(dataset.entries, tensors):
+        expected = preprocessor.preprocess(cv2.imread(entry.source)[:, :, ::-1])[0]
+        np.testing.assert_array_equal(tensor, expected)
+
+
+def test_prepare_skips_unchanged_and_replaces_changed(study_dir, tmp_path):
+    """Prueba que al volver a preparar solo se añadan los estudios modificados."""
+    paths = sorted(study_dir.iterdir())
+    prepare_dataset(paths, tmp_path / "preparado", root=study_dir, workers=1)
+    cv2.imwrite(str(study_dir / "3.png"), np.zeros((60, 80, 3), dtype=np.uint8))
+    
+    added = prepare_dataset(paths, tmp_path / "preparado", root=study_dir, workers=1)
+    dataset = PreparedDataset(tmp_path / "preparado")
+    
+    assert added == 1
+    assert len(dataset) == 5
+    changed = [entry for entry in dataset.entries if entry.study_id == "3.png"]
+    assert changed[0].shard == 1
+    np.testing.assert_array_equal(dataset.image(changed[0]),
+                                  XRayPreprocessor().enhance(np.zeros((60, 80, 3), np.uint8)))
+
+
+def test_process_dataset_matches_process_batch(detector, study_dir, tmp_path):
+    """Prueba que evaluar el conjunto dé los mismos resultados que leer las imágenes."""
+    paths = [str(path) for path in sorted(study_dir.glob("[0-9].png"))]
+    prepare_dataset(paths, tmp_path / "preparado", workers=1)
+    dataset = PreparedDataset(tmp_path / "preparado")
+    
+    results = list(detector.process_dataset(dataset, batch_size=2))
+    expected = detector.process_batch(paths, batch_size=2, heatmap=False)
+    
+    assert [result.source for result in results] == paths
+    for result, reference in zip(results, expected):
+        np.testing.assert_allclose(result.probabilities, reference.probabilities, rtol=1e-5)
+
+
+def test_cached_dataset_results_defer_the_right_cam(stand_in_model, study_dir, tmp_path):
+    """Prueba que el heatmap diferido de un resultado en caché use el tensor guardado."""
+    from src.cache import ResultCache
+    from src.integrator import PneumoniaDetector
+    
+    prepare_dataset(sorted(study_dir.glob("[0-9].png")), tmp_path / "preparado", workers=1)
+    dataset = PreparedDataset(tmp_path / "preparado")
+    detector = PneumoniaDetector(model=stand_in_model, cache=ResultCache())
+    expected = [result.cam for result in detector.process_dataset(dataset, heatmap=True)]
+    detector.cache = ResultCache()
+    
+    list(detector.process_dataset(dataset, heatmap=False))
+    cached = list(detector.process_dataset(dataset, heatmap=False))
+    
+    assert detector.cache.hits == len(dataset)
+    for result, cam in zip(cached, expected):
+        np.testing.assert_array_equal(result.deferred_heatmap.get_cam(), cam)
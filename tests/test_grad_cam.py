@@ -0,0 +1,130 @@
+"""
+Tests para el módulo Grad-CAM.
+"""
+
+import numpy as np
+from src.grad_cam import GradCAM
+
+
+def test_explain_returns_predictions_and_gradients(stand_in_model):
+    """Prueba que una sola pasada entregue predicción, activaciones y gradientes."""
+    grad_cam = GradCAM(stand_in_model)
+    batch = np.random.rand(1, 512, 512, 1)
+    
+    preds, conv_outputs, pooled_grads = grad_cam.explain(batch)
+    
+    np.testing.assert_allclose(preds, stand_in_model.predict(batch), rtol=1e-5)
+    assert conv_outputs.shape == (1, 32, 32, 8)
+    assert pooled_grads.shape == (1, 8)
+
+
+def test_generate_heatmap_matches_original_size(stand_in_model):
+    """Prueba que el heatmap tenga el tamaño de la imagen original."""
+    grad_cam = GradCAM(stand_in_model)
+    batch = np.random.rand(1, 512, 512, 1)
+    original = np.random.randint(0, 256, (300, 200, 3), dtype=np.uint8)
+    
+    heatmap = grad_cam.generate_heatmap(batch, original)
+    
+    assert heatmap.shape == (300, 200, 3)
+
+
+def test_generate_heatmap_uses_requested_class(stand_in_model):
+    """Prueba que class_idx cambie la clase explicada por el heatmap."""
+    grad_cam = GradCAM(stand_in_model)
+    batch = np.random.default_rng(0).random((1, 512, 512, 1))
+    original = np.zeros((64, 64, 3), dtype=np.uint8)
+    
+    first = grad_cam.generate_heatmap(batch, original, class_idx=0)
+    second = grad_cam.generate_heatmap(batch, original, class_idx=1)
+    
+    _, conv_outputs, pooled_grads = grad_cam.explain(batch, class_idx=0)
+    expected = grad_cam.overlay_heatmap(conv_outputs[0], pooled_grads[0], original)
+    
+    assert not np.array_equal(first, second)
+    np.testing.assert_array_equal(first, expected)
+
+
+def test_explain_functions_are_built_once(stand_in_model):
+    """Prueba que las llamadas repetidas no agreguen operaciones al grafo."""
+    import tensorflow as tf
+    batch = np.random.rand(1, 512, 512, 1)
+    GradCAM(stand_in_model).explain(batch)
+    GradCAM(stand_in_model).explain(batch, class_idx=2)
+    graph = tf.compat.v1.get_default_graph()
+    ops_before = len(graph.get_operations())
+    
+    for _ in range(3):
+        GradCAM(stand_in_model).explain(batch)
+        GradCAM(stand_in_model).explain(batch, class_idx=2)
+    
+    assert len(graph.get_operations()) == ops_before
+
+
+def test_compute_cam_matches_channel_loop():
+    """Prueba que la contracción por lotes coincida con el bucle por canal."""
+    from src.heatmap import compute_cam
+    rng = np.random.default_rng(0)
+    conv_outputs = rng.random((3, 16, 16, 64), dtype=np.float32)
+    pooled_grads = rng.standard_normal((3, 64)).astype(np.float32)
+    
+    cams = compute_cam(conv_outputs, pooled_grads)
+    
+    assert cams.shape == (3, 16, 16)
+    for conv, grads, cam in zip(conv_outputs, pooled_grads, cams):
+        expected = conv.copy()
+        for i in range(grads.shape[0]):
+            expected[:, :, i] *= grads[i]
+        expected = np.maximum(np.mean(expected, axis=-1), 0)
+        expected /= np.max(expected)
+        np.testing.assert_allclose(cam, expected, rtol=1e-4, atol=1e-6)
+        np.testing.assert_allclose(compute_cam(conv, grads), cam)
+
+
+def test_heatmap_without_positive_values_has_no_nan(stand_in_model):
+    """Prueba que un mapa con máximo 0 no produzca NaN."""
+    from src.heatmap import compute_cam
+    conv_outputs = np.ones((2, 8, 8, 4), dtype=np.float32)
+    pooled_grads = np.array([[0, 0, 0, 0], [-1, -1, -1, -1]], dtype=np.float32)
+    original = np.zeros((40, 30), dtype=np.uint8)
+    
+    with np.errstate(all="raise"):
+        cams = compute_cam(conv_outputs, pooled_grads)
+        heatmap = GradCAM(stand_in_model).overlay_heatmap(conv_outputs[0], pooled_grads[0],
+                                                          original)
+    
+    assert not np.isnan(cams).any()
+    assert (cams == 0).all()
+    assert heatmap.shape == (40, 30, 3)
+
+
+def test_gradients_from_captured_activations_match_explain(stand_in_model):
+    """Prueba que los gradientes diferidos coincidan con los de explain."""
+    grad_cam = GradCAM(stand_in_model)
+    batch = np.random.rand(2, 512, 512, 1)
+    
+    preds, conv_outputs, pooled_grads = grad_cam.explain(batch)
+    fast_preds, fast_conv_outputs = grad_cam.predict(batch)
+    
+    np.testing.assert_allclose(fast_preds, preds, rtol=1e-5)
+    np.testing.assert_allclose(fast_conv_outputs, conv_outputs, rtol=1e-5)
+    np.testing.assert_allclose(grad_cam.gradients(fast_conv_outputs), pooled_grads,
+                               rtol=1e-4, atol=1e-7)
+
+
+def test_render_overlay_at_target_size():
+    """Prueba que el mapa compacto se renderice al tamaño pedido."""
+    from src.heatmap import quantize_cam, render_overlay
+    cam = np.random.default_rng(0).random((32, 32), dtype=np.float32)
+    original = np.random.randint(0, 256, (3000, 2000, 3), dtype=np.uint8)
+    
+    compact = quantize_cam(cam)
+    small = render_overlay(compact, original, size=(250, 250))
+    full = render_overlay(compact, original)
+    
+    assert compact.dtype == np.uint8 and compact.nbytes == 32 * 32
+    assert quantize_cam(cam, np.float16).dtype == np.float16
+    assert small.shape == (250, 250, 3)
+    assert full.shape == (3000, 2000, 3)
+    np.testing.assert_allclose(render_overlay(cam, original[:300, :200]),
+                               render_overlay(compact, original[:300, :200]), atol=3)
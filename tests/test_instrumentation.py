@@ -0,0 +1,74 @@
+"""
+Tests para la instrumentación de las etapas.
+"""
+
+import json
+import numpy as np
+import pytest
+from src import instrumentation
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    """Fixture que activa la instrumentación con traza y la desactiva al terminar."""
+    recorder = instrumentation.enable(trace_path=tmp_path / "traza.jsonl",
+                                      metrics_path=tmp_path / "metricas.prom",
+                                      track_memory=True)
+    yield recorder
+    instrumentation.disable()
+
+
+def test_disabled_span_is_shared_null_context():
+    """Prueba que sin instrumentación no se cree ningún objeto por span."""
+    assert instrumentation.get_recorder() is None
+    assert instrumentation.span("a") is instrumentation.span("b", size=1)
+
+
+def test_nested_spans_record_time_memory_and_trace(recorder, tmp_path):
+    """Prueba que los spans anidados registren duración, memoria y jerarquía."""
+    with instrumentation.span("externo"):
+        with instrumentation.span("interno", size=4):
+            buffer = np.ones(2**20, dtype=np.float64)  # 8 MB
+        del buffer
+    instrumentation.disable()
+    
+    summary = {row["stage"]: row for row in recorder.summary()}
+    assert summary["externo"]["count"] == summary["interno"]["count"] == 1
+    assert summary["interno"]["peak_bytes"] >= 2**23
+    assert summary["externo"]["peak_bytes"] >= 2**23
+    
+    events = [json.loads(line) for line in (tmp_path / "traza.jsonl").read_text().splitlines()]
+    assert [event["name"] for event in events] == ["interno", "externo"]
+    assert events[0]["parent"] == "externo"
+    assert events[0]["attributes"] == {"size": 4}
+    
+    metrics = (tmp_path / "metricas.prom").read_text()
+    assert "# TYPE neumonia_stage_seconds histogram" in metrics
+    assert 'neumonia_stage_seconds_count{stage="interno"} 1' in metrics
+    assert 'neumonia_stage_seconds_bucket{stage="interno",le="+Inf"} 1' in metrics
+
+
+def test_detector_stages_are_measured(recorder, detector):
+    """Prueba que process_image registre cada etapa del detector."""
+    image = np.random.randint(0, 256, (300, 200, 3), dtype=np.uint8)
+    
+    detector.process_image(image)
+    
+    stages = {row["stage"] for row in recorder.summary()}
+    assert {"process_image", "preprocess", "predict", "grad_cam", "render"} <= stages
+
+
+def test_configure_from_env(monkeypatch, tmp_path):
+    """Prueba que las variables de entorno activen la instrumentación."""
+    monkeypatch.delenv(instrumentation.TRACE_ENV, raising=False)
+    monkeypatch.delenv(instrumentation.METRICS_ENV, raising=False)
+    assert instrumentation.configure_from_env() is None
+    
+    monkeypatch.setenv(instrumentation.METRICS_ENV, str(tmp_path / "m.prom"))
+    try:
+        recorder = instrumentation.configure_from_env()
+        assert recorder is instrumentation.get_recorder()
+        assert not recorder.track_memory
+    finally:
+        instrumentation.disable()
+    assert (tmp_path / "m.prom").exists()
@@ -0,0 +1,145 @@
+"""
+Tests para el módulo integrador.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def sample_images():
+    """Fixture que genera imágenes RGB de distintos tamaños."""
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+            for h, w in [(100, 100), (300, 200), (512, 512)]]
+
+
+def test_process_batch_matches_process_image(detector, sample_images):
+    """Prueba que el lote produzca los mismos resultados que una a una."""
+    results = detector.process_batch(sample_images, batch_size=2)
+    
+    assert [result.source for result in results] == [0, 1, 2]
+    for image, result in zip(sample_images, results):
+        label, probability, heatmap = detector.process_image(image)
+        assert result.ok
+        assert result.label == label
+        assert result.probability == pytest.approx(probability, rel=1e-5)
+        assert result.heatmap.shape == heatmap.shape
+
+
+def test_process_batch_reports_errors_per_item(detector, sample_images):
+    """Prueba que un error en un estudio no interrumpa el lote."""
+    inputs = [sample_images[0], "no_existe.dcm", sample_images[1]]
+    
+    results = detector.process_batch(inputs, batch_size=3)
+    
+    assert [result.ok for result in results] == [True, False, True]
+    assert results[1].source == "no_existe.dcm"
+    assert "no_existe.dcm" in results[1].error
+
+
+def test_warm_up_does_not_touch_cache(stand_in_model):
+    """Prueba que el calentamiento no agregue entradas a la caché."""
+    from src.cache import ResultCache
+    from src.integrator import PneumoniaDetector
+    
+    detector = PneumoniaDetector(model=stand_in_model, cache=ResultCache())
+    detector.warm_up()
+    
+    assert len(detector.cache) == 0
+
+
+def test_import_package_does_not_load_tensorflow():
+    """Prueba que importar el paquete no importe TensorFlow."""
+    code = ("import sys, src, src.cache, src.read_img, src.pipeline, src.integrator; "
+            "assert 'tensorflow' not in sys.modules; "
+            "assert src.ImageReaderFactory is src.read_img.ImageReaderFactory")
+    subprocess.run([sys.executable, "-c", code], check=True,
+                   cwd=Path(__file__).resolve().parents[1])
+
+
+def test_deferred_heatmap_matches_eager_heatmap(detector, sample_images):
+    """Prueba que el heatmap diferido coincida con el calculado en la predicción."""
+    results = detector.process_batch(sample_images, batch_size=3, heatmap=False)
+    
+    for image, result in zip(sample_images, results):
+        label, probability, heatmap = detector.process_image(image)
+        assert result.heatmap is None
+        assert not result.deferred_heatmap.ready
+        assert result.label == label
+        np.testing.assert_allclose(result.get_heatmap(), heatmap, atol=1)
+        assert result.deferred_heatmap.ready
+
+
+def test_detect_returns_full_result(detector, sample_images):
+    """Prueba que detect conserve el vector de probabilidades y el mapa."""
+    result = detector.detect(sample_images[0])
+    label, probability, heatmap = detector.process_image(sample_images[0])
+    
+    assert result.source is None
+    assert result.label == label
+    assert result.probability == pytest.approx(probability)
+    assert result.probabilities.shape == (3,)
+    assert result.cam is not None
+    assert result.heatmap.shape == heatmap.shape
+
+
+def test_deferred_heatmap_is_computed_once(stand_in_model, sample_images):
+    """Prueba que el heatmap diferido se calcule una vez y se guarde en la caché."""
+    from src.cache import ResultCache
+    from src.integrator import PneumoniaDetector
+    
+    detector = PneumoniaDetector(model=stand_in_model, cache=ResultCache())
+    label, _, deferred = detector.process_image(sample_images[1], heatmap=False)
+    assert len(detector.cache) == 1
+    
+    first = deferred.get()
+    assert deferred.get() is first
+    # La caché ya tiene el heatmap, por lo que no se vuelve a ejecutar el modelo
+    cached_label, _, heatmap = detector.process_image(sample_images[1])
+    assert cached_label == label
+    np.testing.assert_array_equal(heatmap, first)
+    assert detector.cache.misses == 1
+
+
+def test_results_carry_compact_cam(stand_in_model, sample_images):
+    """Prueba que el resultado traiga el mapa compacto y el heatmap al tamaño pedido."""
+    from src.integrator import PneumoniaDetector
+    
+    detector = PneumoniaDetector(model=stand_in_model, heatmap_size=(250, 250))
+    result = detector.process_batch(sample_images[1:2])[0]
+    
+    assert result.cam.shape == (32, 32) and result.cam.dtype == np.uint8
+    assert result.heatmap.shape == (250, 250, 3)
+    assert result.render_heatmap(sample_images[1]).shape == (300, 200, 3)
+
+
+def test_model_id_is_computed_once_across_threads(stand_in_model, monkeypatch):
+    """Prueba que varios hilos que piden model_id a la vez calculen el hash una vez."""
+    import threading
+    import time
+    import src.integrator
+    from src.integrator import PneumoniaDetector
+    
+    calls = []
+    
+    def slow_hash(model):
+        calls.append(model)
+        time.sleep(0.05)
+        return "abc"
+    
+    monkeypatch.setattr(src.integrator, 'hash_weights', slow_hash)
+    detector = PneumoniaDetector(model=stand_in_model)
+    ids = []
+    threads = [threading.Thread(target=lambda: ids.append(detector.model_id))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert ids == ["abc"] * 8
+    assert len(calls) == 1
@@ -0,0 +1,82 @@
+"""
+Tests para el registro de modelos.
+"""
+
+import os
+import numpy as np
+import pytest
+from src.load_model import ModelLoader
+
+
+@pytest.fixture(scope="module")
+def saved_models(stand_in_model, tmp_path_factory):
+    """Fixture que guarda el modelo sustituto como .h5 y como SavedModel."""
+    directory = tmp_path_factory.mktemp("modelos")
+    stand_in_model.save(str(directory / "a.h5"))
+    stand_in_model.save(str(directory / "b.h5"))
+    saved_model = ModelLoader().export_saved_model(directory / "a.h5", directory / "a_tf")
+    yield directory, saved_model
+    for name in ("a.h5", "b.h5", "a_tf"):
+        ModelLoader().unload(directory / name)
+
+
+def test_registry_holds_several_models(saved_models):
+    """Prueba que se puedan tener varios modelos cargados a la vez."""
+    directory, _ = saved_models
+    loader = ModelLoader()
+    
+    first = loader.load_model(directory / "a.h5")
+    second = loader.load_model(str(directory / "b.h5"))
+    
+    assert first is not second
+    assert loader.load_model(directory / "a.h5") is first
+    assert loader.get_model(directory / "b.h5") is second
+    assert {str(directory / "a.h5"), str(directory / "b.h5")} <= set(loader.loaded_models())
+
+
+def test_reloading_a_rewritten_model_drops_the_old_version(stand_in_model, tmp_path):
+    """Prueba que al cambiar el archivo no quede cargada la versión anterior."""
+    path = tmp_path / "modelo.h5"
+    stand_in_model.save(str(path))
+    loader = ModelLoader()
+    try:
+        first = loader.load_model(path)
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        
+        second = loader.load_model(path)
+        
+        assert second is not first
+        assert [key for key in loader._models if key[0] == str(path)] == \
+            [loader._version_key(path)]
+    finally:
+        loader.unload(path)
+
+
+def test_models_are_found_independently_of_cwd(saved_models, tmp_path, monkeypatch):
+    """Prueba que los nombres se resuelvan con la variable de entorno sin depender del cwd."""
+    directory, _ = saved_models
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv(ModelLoader._MODEL_DIR_ENV, str(directory))
+    loader = ModelLoader()
+    
+    assert loader.load_model("a.h5") is loader.load_model(directory / "a.h5")
+    with pytest.raises(FileNotFoundError):
+        loader.load_model("no_existe.h5")
+    with pytest.raises(RuntimeError):
+        loader.get_model("no_existe.h5")
+
+
+def test_saved_model_matches_h5(saved_models):
+    """Prueba que el SavedModel exportado dé las mismas predicciones."""
+    from src.grad_cam import GradCAM
+    
+    directory, saved_model = saved_models
+    loader = ModelLoader()
+    batch = np.random.default_rng(0).random((2, 512, 512, 1), dtype=np.float32)
+    
+    expected = GradCAM(loader.load_model(directory / "a.h5")).explain(batch)[0]
+    actual = GradCAM(loader.load_model(saved_model)).explain(batch)[0]
+    
+    np.testing.assert_allclose(actual, expected, rtol=1e-5)
+    assert len(loader.get_fingerprint(saved_model)) == 64
@@ -0,0 +1,133 @@
+"""
+Tests para el pipeline de lectura y preprocesamiento en varios procesos.
+"""
+
+import cv2
+import numpy as np
+import pytest
+from src.pipeline import PreprocessPipeline, batch_tensor, run_pipeline
+
+
+@pytest.fixture
+def image_paths(tmp_path):
+    """Fixture que crea imágenes PNG válidas y una ruta inexistente."""
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"imagen_{i}.png"
+        cv2.imwrite(str(path), rng.integers(0, 256, (64, 80, 3), dtype=np.uint8))
+        paths.append(str(path))
+    paths.insert(2, str(tmp_path / "no_existe.png"))
+    return paths
+
+
+def test_batches_preserve_order_and_size(image_paths):
+    """Prueba que los lotes conserven el orden y el tamaño pedido."""
+    pipeline = PreprocessPipeline(workers=2, batch_size=4, prefetch=1)
+    
+    batches = list(pipeline.batches(image_paths))
+    
+    assert [len(batch) for batch in batches] == [4, 2]
+    studies = [study for batch in batches for study in batch]
+    assert [study.source for study in studies] == image_paths
+    assert studies[2].error is not None
+    assert studies[0].tensor.shape == (512, 512, 1)
+    assert studies[0].original.shape == (64, 80, 3)
+
+
+def test_shared_memory_batches_are_views(image_paths):
+    """Prueba que con copy=False el lote llegue al modelo sin copias."""
+    pipeline = PreprocessPipeline(workers=2, batch_size=2, prefetch=1)
+    reference = PreprocessPipeline(workers=1, batch_size=2, shared_memory=False)
+    
+    expected = [study for batch in reference.batches(image_paths) for study in batch]
+    for position, batch in enumerate(pipeline.batches(image_paths, copy=False)):
+        valid = [study for study in batch if study.error is None]
+        tensor = batch_tensor(valid)
+        assert np.shares_memory(tensor, valid[0].tensor)
+        for study, other in zip(batch, expected[2 * position:]):
+            assert study.source == other.source
+            if study.error is None:
+                np.testing.assert_array_equal(study.tensor, other.tensor)
+                np.testing.assert_array_equal(study.original, other.original)
+
+
+def test_run_pipeline_matches_process_batch(detector, image_paths):
+    """Prueba que el pipeline produzca los mismos resultados que process_batch."""
+    pipeline = PreprocessPipeline(workers=2, batch_size=3)
+    
+    results = list(run_pipeline(detector, image_paths, pipeline))
+    expected = detector.process_batch(image_paths, batch_size=3)
+    
+    assert [result.ok for result in results] == [result.ok for result in expected]
+    for result, reference in zip(results, expected):
+        assert result.label == reference.label
+
+
+def test_run_pipeline_deferred_heatmaps_outlive_slots(detector, image_paths):
+    """Prueba que los heatmaps diferidos no usen posiciones ya recicladas."""
+    pipeline = PreprocessPipeline(workers=2, batch_size=2, prefetch=1)
+    
+    results = list(run_pipeline(detector, image_paths, pipeline, heatmap=False))
+    expected = detector.process_batch(image_paths, batch_size=2)
+    
+    for result, reference in zip(results, expected):
+        if result.ok:
+            np.testing.assert_array_equal(result.get_heatmap(), reference.heatmap)
+
+
+def test_run_pipeline_shares_cache_with_detect(stand_in_model, tmp_path):
+    """Prueba que el pipeline y detect compartan la caché aunque se reduzca el original."""
+    from src.cache import ResultCache
+    from src.integrator import PneumoniaDetector
+    
+    path = str(tmp_path / "grande.png")
+    rng = np.random.default_rng(1)
+    cv2.imwrite(path, rng.integers(0, 256, (1400, 1600, 3), dtype=np.uint8))
+    detector = PneumoniaDetector(model=stand_in_model, cache=ResultCache())
+    full_size = PreprocessPipeline(workers=1, batch_size=1, prefetch=1, original_size=None)
+    
+    result = next(run_pipeline(detector, [path], full_size))
+    reference = detector.detect(path)
+    
+    assert result.heatmap.shape == reference.heatmap.shape == (1400, 1600, 3)
+    assert detector.cache.hits == 1
+    np.testing.assert_array_equal(result.heatmap, reference.heatmap)
+    
+    # Por defecto la imagen se reduce en el anillo, pero la clave es la de la imagen completa
+    default = PreprocessPipeline(workers=1, batch_size=1, prefetch=1)
+    result = next(run_pipeline(detector, [path], default))
+    assert result.heatmap.shape == (896, 1024, 3)
+    assert detector.cache.hits == 2
+
+
+def test_default_pipeline_does_not_send_full_size_originals(tmp_path):
+    """Prueba que los originales grandes no viajen completos ni se entreguen sin pedirlos."""
+    path = str(tmp_path / "grande.png")
+    cv2.imwrite(path, np.zeros((1400, 1600, 3), dtype=np.uint8))
+    
+    study = next(PreprocessPipeline(workers=1, batch_size=1).batches([path]))[0]
+    without = next(PreprocessPipeline(workers=1, batch_size=1, originals=False)
+                   .batches([path], model_id="abc"))[0]
+    
+    assert study.original.shape == (896, 1024, 3)
+    assert without.original is None
+    assert without.tensor.shape == (512, 512, 1)
+    assert without.cache_key is not None
+
+
+def test_run_pipeline_without_originals_keeps_cams(detector, image_paths):
+    """Prueba que sin originales se calculen los mapas pero no los heatmaps."""
+    pipeline = PreprocessPipeline(workers=1, batch_size=2, originals=False)
+    
+    results = [result for result in run_pipeline(detector, image_paths, pipeline,
+                                                  heatmap=False) if result.ok]
+    expected = [result for result in detector.process_batch(image_paths, batch_size=2)
+                if result.ok]
+    
+    for result, reference in zip(results, expected):
+        np.testing.assert_array_equal(result.deferred_heatmap.get_cam(), reference.cam)
+    with pytest.raises(ValueError):
+        results[0].get_heatmap()
+    with pytest.raises(ValueError):
+        next(run_pipeline(detector, image_paths, pipeline))
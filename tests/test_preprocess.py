@@ -31,4 +31,17 @@ def test_preprocessor_normalization(sample_image):
     
     # Verificar que los valores estén entre 0 y 1
     assert np.min(processed_image) >= 0.0
-    assert np.max(processed_image) <= 1.0
\ No newline at end of file
+    assert np.max(processed_image) <= 1.0
+
+
+def test_preprocess_into_fills_batch_in_place(sample_image):
+    """Prueba que preprocess_into escriba float32 en la posición indicada."""
+    preprocessor = XRayPreprocessor()
+    batch = preprocessor.empty_batch(3)
+    batch[:] = -1
+    
+    preprocessor.preprocess_into(batch, 1, sample_image)
+    
+    assert batch.dtype == np.float32
+    np.testing.assert_allclose(batch[1:2], preprocessor.preprocess(sample_image))
+    assert np.all(batch[0] == -1) and np.all(batch[2] == -1)
@@ -2,8 +2,12 @@
 Tests para el módulo de lectura de imágenes.
 """
 
+import cv2
+import numpy as np
 import pytest
-from src.read_img import ImageReaderFactory, DicomReader, JpgReader
+from benchmarks.common import write_synthetic_dicom
+from src.preprocess_img import XRayPreprocessor
+from src.read_img import ImageReaderFactory, DicomReader, JpgReader, HighBitDepthReader
 
 
 def test_factory_returns_correct_reader():
@@ -22,4 +26,143 @@ def test_factory_raises_error_for_unsupported_format():
     factory = ImageReaderFactory()
     
     with pytest.raises(ValueError):
-        factory.get_reader('unsupported')
\ No newline at end of file
+        factory.get_reader('unsupported')
+
+
+@pytest.mark.parametrize("extension", ["dcm", "png", "jpg"])
+def test_read_grayscale_gives_same_model_input(tmp_path, extension):
+    """Prueba que leer en un canal produzca el mismo tensor para radiografías."""
+    path = str(tmp_path / f"estudio.{extension}")
+    if extension == "dcm":
+        write_synthetic_dicom(path, shape=(600, 500))
+    else:
+        gray = cv2.GaussianBlur(np.random.randint(0, 256, (600, 500), dtype=np.uint8), (0, 0), 8)
+        cv2.imwrite(path, cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR))
+    reader = ImageReaderFactory.get_reader(extension)
+    preprocessor = XRayPreprocessor()
+    
+    image_rgb, _ = reader.read(path)
+    image_gray = reader.read_grayscale(path)
+    
+    assert image_gray.ndim == 2
+    np.testing.assert_array_equal(preprocessor.preprocess(image_gray),
+                                  preprocessor.preprocess(image_rgb))
+
+
+def test_dicom_normalization_matches_float_formula(tmp_path):
+    """Prueba que la tabla de búsqueda reproduzca la normalización en float64."""
+    import pydicom
+    path = str(tmp_path / "estudio.dcm")
+    write_synthetic_dicom(path, shape=(300, 257), bits=16)
+    pixels = pydicom.dcmread(path).pixel_array.astype(float)
+    expected = ((pixels - pixels.min()) * 255.0 / (pixels.max() - pixels.min())).astype(np.uint8)
+    
+    np.testing.assert_array_equal(DicomReader().read_grayscale(path), expected)
+
+
+def test_dicom_window_and_downsample_on_read(tmp_path):
+    """Prueba la ventana VOI y el submuestreo al leer."""
+    import pydicom
+    path = str(tmp_path / "estudio.dcm")
+    write_synthetic_dicom(path, shape=(1000, 600), bits=16)
+    dcm = pydicom.dcmread(path)
+    dcm.WindowCenter, dcm.WindowWidth = 20000, 10000
+    dcm.save_as(path)
+    
+    windowed = DicomReader(apply_window=True).read_grayscale(path)
+    small = DicomReader(max_size=256).read_grayscale(path)
+    
+    pixels = dcm.pixel_array
+    assert np.all(windowed[pixels <= 15000] == 0)
+    assert np.all(windowed[pixels >= 25000] == 255)
+    assert small.dtype == np.uint8 and max(small.shape) <= 256
+
+
+def test_dicom_window_on_wide_range_without_lut(tmp_path, monkeypatch):
+    """Prueba que la ventana de un DICOM de 32 bits no construya una tabla enorme."""
+    import pydicom
+    import src.read_img
+    path = str(tmp_path / "estudio.dcm")
+    write_synthetic_dicom(path, shape=(64, 64), bits=16)
+    dcm = pydicom.dcmread(path)
+    pixels = np.linspace(0, 2 ** 31, 64 * 64).reshape(64, 64).astype(np.uint32)
+    dcm.BitsAllocated = dcm.BitsStored = 32
+    dcm.HighBit = 31
+    dcm.PixelData = pixels.tobytes()
+    dcm.WindowCenter, dcm.WindowWidth = 2 ** 30, 2 ** 29
+    dcm.save_as(path)
+    
+    def no_lut(*args, **kwargs):
+        raise AssertionError("no se debe usar una tabla de búsqueda")
+    
+    monkeypatch.setattr(src.read_img, '_apply_lut', no_lut)
+    windowed = DicomReader(apply_window=True).read_grayscale(path)
+    
+    values = pixels.astype(np.float64)
+    expected = np.clip(((values - (2 ** 30 - 0.5)) / (2 ** 29 - 1) + 0.5) * 255.0, 0, 255)
+    assert windowed.dtype == np.uint8
+    np.testing.assert_allclose(windowed, expected.astype(np.uint8), atol=1)
+
+
+def test_factory_reuses_reader_instances():
+    """Prueba que la fábrica no cree un lector nuevo en cada llamada."""
+    assert ImageReaderFactory.get_reader('dcm') is ImageReaderFactory.get_reader('DCM')
+    assert ImageReaderFactory.get_reader('jpg') is ImageReaderFactory.get_reader('png')
+    assert isinstance(ImageReaderFactory.get_reader('tiff'), HighBitDepthReader)
+
+
+def test_factory_sniffs_misnamed_files(tmp_path):
+    """Prueba que se use la firma del archivo en lugar de la extensión."""
+    dicom_as_png = tmp_path / "estudio.png"
+    write_synthetic_dicom(dicom_as_png, shape=(64, 64))
+    png_as_dcm = tmp_path / "imagen.dcm"
+    cv2.imwrite(str(tmp_path / "imagen.png"), np.zeros((8, 8), dtype=np.uint8))
+    (tmp_path / "imagen.png").rename(png_as_dcm)
+    
+    assert ImageReaderFactory.sniff(str(dicom_as_png)) == 'dicom'
+    assert isinstance(ImageReaderFactory.get_reader_for_file(str(dicom_as_png)), DicomReader)
+    assert isinstance(ImageReaderFactory.get_reader_for_file(str(png_as_dcm)), JpgReader)
+
+
+def test_high_bit_depth_reader_normalizes_16_bit(tmp_path):
+    """Prueba que los TIFF de 16 bits se normalicen a todo el rango uint8."""
+    path = str(tmp_path / "imagen.tiff")
+    image = np.linspace(1000, 5000, 64 * 64).reshape(64, 64).astype(np.uint16)
+    cv2.imwrite(path, image)
+    
+    gray = ImageReaderFactory.get_reader_for_file(path).read_grayscale(path)
+    
+    assert gray.dtype == np.uint8
+    assert gray.min() == 0 and gray.max() == 255
+
+
+def test_factory_routes_16_bit_png_to_high_bit_depth_reader(tmp_path):
+    """Prueba que los PNG de 16 bits no se lean como 8 bits."""
+    path_16 = str(tmp_path / "imagen16.png")
+    path_8 = str(tmp_path / "imagen8.png")
+    image = np.linspace(1000, 1200, 64 * 64).reshape(64, 64).astype(np.uint16)
+    cv2.imwrite(path_16, image)
+    cv2.imwrite(path_8, (image // 256).astype(np.uint8))
+    
+    reader = ImageReaderFactory.get_reader_for_file(path_16)
+    gray = reader.read_grayscale(path_16)
+    
+    assert ImageReaderFactory.sniff(path_16) == 'png16'
+    assert isinstance(reader, HighBitDepthReader)
+    assert gray.min() == 0 and gray.max() == 255
+    assert isinstance(ImageReaderFactory.get_reader_for_file(path_8), JpgReader)
+
+
+def test_factory_registers_extra_readers(tmp_path):
+    """Prueba que se puedan registrar lectores adicionales."""
+    class CustomReader(JpgReader):
+        pass
+    
+    reader = CustomReader()
+    ImageReaderFactory.register('custom', reader, ('xyz',))
+    try:
+        assert ImageReaderFactory.get_reader('xyz') is reader
+        assert 'xyz' in ImageReaderFactory.supported_extensions()
+    finally:
+        ImageReaderFactory._readers.pop('custom')
+        ImageReaderFactory._extensions.pop('xyz')
@@ -0,0 +1,52 @@
+"""
+Tests para la generación de reportes en PDF.
+"""
+
+import cv2
+import numpy as np
+from src.integrator import DetectionResult
+from src.report import PAGE_SIZE, build_report, generate_reports, write_report
+from src.results_store import ResultStore
+
+
+def make_result(source=None, cam=True):
+    """Crea un resultado con probabilidades y, opcionalmente, un mapa Grad-CAM."""
+    return DetectionResult(source=source, label="viral", probability=80.0,
+                           probabilities=np.array([0.1, 0.1, 0.8], dtype=np.float32),
+                           cam=np.full((8, 8), 255, dtype=np.uint8) if cam else None)
+
+
+def test_build_report_renders_heatmap_from_cam():
+    """Prueba que sin heatmap explícito se use el mapa Grad-CAM del resultado."""
+    original = np.full((300, 200, 3), 128, dtype=np.uint8)
+    
+    with_cam = np.asarray(build_report(make_result(), original, patient_id="1-2"))
+    without_cam = np.asarray(build_report(make_result(cam=False), original, patient_id="1-2"))
+    
+    assert with_cam.shape == (PAGE_SIZE[1], PAGE_SIZE[0], 3)
+    assert not np.array_equal(with_cam, without_cam)
+
+
+def test_write_report_creates_pdf(tmp_path):
+    """Prueba que el reporte se guarde como PDF sin necesitar imagen."""
+    path = write_report(tmp_path / "reporte.pdf", make_result(), model_version="abc")
+    
+    assert path.read_bytes().startswith(b"%PDF")
+
+
+def test_generate_reports_from_store(tmp_path):
+    """Prueba la generación en varios procesos a partir del historial."""
+    image_path = tmp_path / "estudio.png"
+    cv2.imwrite(str(image_path), np.random.default_rng(0).integers(0, 256, (64, 48, 3),
+                                                                   dtype=np.uint8))
+    with ResultStore(tmp_path / "historial.db") as store:
+        store.add(make_result(str(image_path)), patient_id="1-2", created_at=1.0)
+        store.add(make_result(str(tmp_path / "borrado.png"), cam=False), created_at=2.0)
+        store.add(DetectionResult(source="roto.png", error="archivo dañado"), created_at=3.0)
+        rows = list(store.query(newest_first=False))
+    
+    outcomes = generate_reports(rows, tmp_path / "reportes", workers=2)
+    
+    assert [row_id for row_id, _, _ in outcomes] == [row.id for row in rows]
+    assert all(error is None for _, _, error in outcomes)
+    assert all(path.read_bytes().startswith(b"%PDF") for _, path, _ in outcomes)
@@ -0,0 +1,105 @@
+"""
+Tests para el historial de resultados.
+"""
+
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+from src.integrator import DetectionResult
+from src.results_store import ResultStore, read_results
+
+
+def make_result(source="a.dcm", label="normal"):
+    """Crea un resultado con un vector de probabilidades conocido."""
+    return DetectionResult(source=source, label=label, probability=90.0,
+                           probabilities=np.array([0.05, 0.9, 0.05], dtype=np.float32))
+
+
+def count_rows(path):
+    """Cuenta las filas escritas en disco."""
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+def test_store_round_trips_results(tmp_path):
+    """Prueba que se guarden el vector de probabilidades, el paciente y el modelo."""
+    path = tmp_path / "historial.db"
+    with ResultStore(path) as store:
+        store.add(make_result(), patient_id="1-234-567", model_version="abc", created_at=10.0)
+        store.add(DetectionResult(source="roto.png", error="archivo dañado"), created_at=11.0)
+    
+    rows = read_results(path, newest_first=False)
+    
+    assert [row.source for row in rows] == ["a.dcm", "roto.png"]
+    assert rows[0].patient_id == "1-234-567"
+    assert rows[0].model_version == "abc"
+    np.testing.assert_array_equal(rows[0].probabilities, make_result().probabilities)
+    assert rows[1].probabilities is None
+    assert rows[1].error == "archivo dañado"
+
+
+def test_store_buffers_until_batch_is_full(tmp_path):
+    """Prueba que las filas se escriban por lotes y con flush."""
+    path = tmp_path / "historial.db"
+    store = ResultStore(path, batch_size=3, flush_interval=3600)
+    
+    store.add_many([make_result(), make_result()])
+    assert count_rows(path) == 0
+    store.add(make_result())
+    assert count_rows(path) == 3
+    store.add(make_result())
+    store.close()
+    assert count_rows(path) == 4
+
+
+def test_store_flushes_pending_rows_after_interval(tmp_path):
+    """Prueba que una fila aislada se escriba sin esperar a otra ni a close."""
+    path = tmp_path / "historial.db"
+    store = ResultStore(path, batch_size=100, flush_interval=0.05)
+    try:
+        store.add(make_result(), patient_id="1")
+        deadline = time.monotonic() + 5
+        while count_rows(path) == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        
+        assert count_rows(path) == 1
+    finally:
+        store.close()
+
+
+def test_store_filters_by_patient_and_time(tmp_path):
+    """Prueba las consultas por paciente y rango de fechas."""
+    with ResultStore(tmp_path / "historial.db") as store:
+        for i in range(10):
+            store.add(make_result(f"{i}.dcm"), patient_id=f"P{i % 2}", created_at=float(i))
+        
+        assert store.count() == 10
+        assert store.count(patient_id="P1") == 5
+        assert [row.source for row in store.query("P0", since=2, until=8)] == \
+            ["6.dcm", "4.dcm", "2.dcm"]
+        assert store.latest("P1").source == "9.dcm"
+        assert store.latest("P9") is None
+        plan = " ".join(str(row) for row in sqlite3.connect(store.path).execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM results WHERE patient_id = 'P0'"))
+        assert "idx_results_patient" in plan
+
+
+def test_store_rejects_invalid_batch_size(tmp_path):
+    """Prueba que el tamaño de lote deba ser positivo."""
+    with pytest.raises(ValueError):
+        ResultStore(tmp_path / "historial.db", batch_size=0)
+
+
+def test_store_keeps_cam(tmp_path):
+    """Prueba que el mapa Grad-CAM se guarde con su forma y tipo."""
+    result = make_result()
+    result.cam = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    
+    with ResultStore(tmp_path / "historial.db") as store:
+        store.add(result)
+        row = next(store.query())
+    
+    np.testing.assert_array_equal(row.cam, result.cam)
+    assert row.cam.dtype == np.uint8
@@ -0,0 +1,107 @@
+"""
+Tests para el servidor local de inferencia.
+"""
+
+import base64
+import json
+import threading
+import urllib.error
+import urllib.request
+import cv2
+import numpy as np
+import pytest
+from src.server import InferenceServer
+
+
+@pytest.fixture
+def server(detector):
+    """Fixture que inicia el servidor en un puerto libre."""
+    server = InferenceServer(detector, port=0, max_batch_size=4, max_wait_ms=20)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, data, query=""):
+    """Envía un estudio al servidor y retorna la respuesta decodificada."""
+    url = f"http://127.0.0.1:{server.server_address[1]}/predict{query}"
+    request = urllib.request.Request(url, data=data, method="POST")
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.loads(response.read())
+
+
+def png_bytes(seed):
+    """Genera una imagen PNG aleatoria."""
+    image = np.random.default_rng(seed).integers(0, 256, (300, 200), dtype=np.uint8)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+def test_predict_matches_detector(server, detector):
+    """Prueba que la respuesta coincida con process_image y traiga el heatmap."""
+    data = png_bytes(0)
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)[:, :, ::-1]
+    label, probability, _ = detector.process_image(np.ascontiguousarray(image))
+    
+    payload = post(server, data, "?heatmap=1")
+    
+    assert payload["label"] == label
+    assert payload["probability"] == pytest.approx(probability, rel=1e-4)
+    assert set(payload["probabilities"]) == {"bacteriana", "normal", "viral"}
+    heatmap = cv2.imdecode(np.frombuffer(base64.b64decode(payload["heatmap_png"]),
+                                         np.uint8), cv2.IMREAD_COLOR)
+    assert heatmap.shape == (300, 200, 3)
+
+
+def test_concurrent_requests_share_batches(server):
+    """Prueba que las solicitudes concurrentes se agrupen."""
+    payloads = [None] * 8
+    
+    def send(i):
+        payloads[i] = post(server, png_bytes(i))
+    
+    threads = [threading.Thread(target=send, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert all("heatmap_png" not in payload for payload in payloads)
+    assert server.batcher.items == 8
+    assert server.batcher.batches < 8
+
+
+def test_invalid_upload_returns_400(server):
+    """Prueba que un archivo no soportado se rechace sin detener el servidor."""
+    with pytest.raises(urllib.error.HTTPError) as error:
+        post(server, b"no es una imagen")
+    assert error.value.code == 400
+
+
+def test_server_rejects_non_loopback_host(detector):
+    """Prueba que el servidor solo escuche en localhost."""
+    with pytest.raises(ValueError):
+        InferenceServer(detector, host="0.0.0.0", port=0)
+
+
+def test_server_accepts_ipv6_loopback(detector):
+    """Prueba que el servidor pueda escuchar en la dirección de loopback IPv6."""
+    server = InferenceServer(detector, host="::1", port=0)
+    try:
+        assert server.server_address[0] == "::1"
+    finally:
+        server.server_close()
+    with pytest.raises(ValueError):
+        InferenceServer(detector, host="::", port=0)
+
+
+def test_heatmap_size_and_cam(server):
+    """Prueba que el heatmap se renderice al tamaño pedido y el mapa sea compacto."""
+    payload = post(server, png_bytes(1), "?heatmap=1&cam=1&size=64x48")
+    
+    heatmap = cv2.imdecode(np.frombuffer(base64.b64decode(payload["heatmap_png"]),
+                                         np.uint8), cv2.IMREAD_COLOR)
+    cam = cv2.imdecode(np.frombuffer(base64.b64decode(payload["cam_png"]), np.uint8),
+                       cv2.IMREAD_UNCHANGED)
+    assert heatmap.shape == (48, 64, 3)
+    assert cam.shape == (32, 32)
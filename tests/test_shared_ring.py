@@ -0,0 +1,42 @@
+"""
+Tests para el anillo de memoria compartida.
+"""
+
+import cv2
+import numpy as np
+import pytest
+from src.shared_ring import SharedRing
+
+
+def test_ring_round_trips_tensors_and_originals():
+    """Prueba que otro objeto conectado al bloque vea lo escrito."""
+    ring = SharedRing(2, (4, 4, 1), original_size=(100, 100))
+    try:
+        other = SharedRing(**ring.spec)
+        image = np.random.default_rng(0).integers(0, 256, (30, 40, 3), dtype=np.uint8)
+        other.tensors[1] = 0.5
+        shape = other.write_original(1, image)
+        other.close()
+        
+        assert shape == image.shape
+        np.testing.assert_array_equal(ring.original(1, shape), image)
+        assert (ring.tensors[1] == 0.5).all()
+    finally:
+        ring.close()
+
+
+def test_ring_downscales_large_originals():
+    """Prueba que las imágenes grandes se reduzcan dentro de la posición."""
+    ring = SharedRing(1, (4, 4, 1), original_size=(100, 100), channels=1)
+    try:
+        image = np.random.default_rng(0).integers(0, 256, (300, 200), dtype=np.uint8)
+        
+        shape = ring.write_original(0, image)
+        
+        assert shape == (100, 66)
+        expected = cv2.resize(image, (66, 100), interpolation=cv2.INTER_AREA)
+        np.testing.assert_array_equal(ring.original(0, shape), expected)
+        with pytest.raises(ValueError):
+            ring.write_original(0, np.zeros((10, 10, 3), dtype=np.uint8))
+    finally:
+        ring.close()
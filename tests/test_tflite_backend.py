@@ -0,0 +1,52 @@
+"""
+Tests para el backend TFLite.
+"""
+
+import numpy as np
+import pytest
+from src.integrator import PneumoniaDetector
+from src.tflite_backend import TFLiteModel, export_tflite
+
+
+@pytest.fixture(scope="module")
+def batch():
+    """Fixture con un lote preprocesado aleatorio."""
+    return np.random.default_rng(0).random((3, 512, 512, 1), dtype=np.float32)
+
+
+@pytest.mark.parametrize("quantization, atol", [(None, 1e-5), ("float16", 1e-3),
+                                                ("int8", 2e-2)])
+def test_tflite_matches_keras(stand_in_model, batch, tmp_path, quantization, atol):
+    """Prueba la paridad de las predicciones de TFLite con las de Keras."""
+    calibration = list(batch) if quantization == "int8" else None
+    path = export_tflite(stand_in_model, tmp_path / "modelo.tflite", quantization, calibration)
+    
+    expected = stand_in_model.predict(batch, verbose=0)
+    actual = TFLiteModel(path).predict(batch)
+    
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, atol=atol)
+
+
+def test_int8_requires_calibration(stand_in_model, tmp_path):
+    """Prueba que la cuantización int8 exija datos de calibración."""
+    with pytest.raises(ValueError):
+        export_tflite(stand_in_model, tmp_path / "modelo.tflite", "int8")
+
+
+def test_detector_with_tflite_backend(stand_in_model, detector, tmp_path):
+    """Prueba que el detector con TFLite dé las mismas etiquetas sin heatmap."""
+    path = export_tflite(stand_in_model, tmp_path / "modelo.tflite")
+    tflite_detector = PneumoniaDetector(str(path), backend="tflite")
+    images = [np.random.default_rng(i).integers(0, 256, (200, 300, 3), dtype=np.uint8)
+              for i in range(3)]
+    
+    results = tflite_detector.process_batch(images)
+    
+    for image, result in zip(images, results):
+        label, probability, _ = detector.process_image(image)
+        assert result.label == label
+        assert result.probability == pytest.approx(probability, abs=1e-3)
+        assert result.heatmap is None
+    with pytest.raises(ValueError):
+        PneumoniaDetector(str(path), backend="onnx")